@@ -1,15 +1,30 @@
 from flask import Flask, jsonify
 import logging
-from flasgger import Swagger
 from database import init_db
+import docs
+import json_provider
+import metricas
+import perfil_sql
+import replica
 from routes import bp as routes_bp
+from controllers import atividades_controller
+import comandos
 import os
 app = Flask(__name__)
+app.json = json_provider.criar(app)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
 logger = logging.getLogger(__name__)
-Swagger(app)
+docs.registrar(app)
 db_file = os.environ.get('DB_FILE','atividades.db')
 init_db(app, db_file)
+metricas.instalar(app, 'atividades')
+perfil_sql.instalar(app)
+replica.instalar(app)
+with app.app_context():
+    atividades_controller.preparar_boletim()
+app.cli.add_command(comandos.boletim)
+app.cli.add_command(comandos.notas)
+app.cli.add_command(comandos.orfaos_cli)
 app.register_blueprint(routes_bp, url_prefix='/')
 @app.route('/')
 def index():
@@ -0,0 +1,75 @@
+import time
+import click
+import requests
+from flask.cli import AppGroup
+from controllers import atividades_controller as controller
+import orfaos
+import gerenciamento_client as ger
+
+boletim = AppGroup('boletim', help='Agregado materializado do boletim.')
+
+@boletim.command('reconstruir')
+@click.option('--verificar', is_flag=True, help='Só compara o agregado com nota JOIN atividade, sem reconstruir.')
+def reconstruir(verificar):
+    """Recalcula a tabela boletim a partir das notas e confere o resultado."""
+    divergencias = controller.divergencias_boletim()
+    for d in divergencias[:20]:
+        click.echo(f"divergente aluno={d['aluno_id']} turma={d['turma_id']} esperado={d['esperado']} atual={d['atual']}")
+    click.echo(f'{len(divergencias)} divergência(s) antes da reconstrução' if not verificar else f'{len(divergencias)} divergência(s)')
+    if verificar:
+        raise SystemExit(1 if divergencias else 0)
+    linhas = controller.reconstruir_boletim()
+    restantes = len(controller.divergencias_boletim())
+    click.echo(f'boletim reconstruído: {linhas} linha(s), {restantes} divergência(s)')
+    raise SystemExit(1 if restantes else 0)
+
+notas = AppGroup('notas', help='Importação de notas.')
+
+@notas.command('importar')
+@click.argument('arquivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--lote', type=int, default=controller.LOTE_IMPORTACAO, show_default=True, help='Linhas por transação.')
+def importar_notas(arquivo, lote):
+    """Importa notas de um CSV (aluno_id, atividade_id, nota), como POST /notas/import."""
+    relatorio = controller.novo_relatorio()
+    interrompida = False
+    inicio = time.perf_counter()
+    try:
+        with open(arquivo, encoding='utf-8-sig', newline='') as texto:
+            controller.importar_notas_csv(texto, lambda ids: ger.validar_lote(alunos=ids)['alunos'], relatorio, lote)
+    except controller.CSVInvalido as e:
+        raise click.ClickException(str(e))
+    except requests.RequestException as e:
+        click.echo(f'importação interrompida (gerenciamento): {e}', err=True)
+        interrompida = True
+    segundos = time.perf_counter() - inicio
+    click.echo(f"{relatorio['linhas']} linha(s): {relatorio['importadas']} importada(s), {relatorio['rejeitadas']} rejeitada(s) "
+               f"em {segundos:.1f}s ({relatorio['linhas'] / segundos if segundos else 0:.0f} linhas/s); última linha {relatorio['ultima_linha']}")
+    for erro, grupo in relatorio['erros'].items():
+        click.echo(f"  {erro}: {grupo['total']} (linhas {', '.join(map(str, grupo['linhas']))}{', ...' if grupo['total'] > len(grupo['linhas']) else ''})")
+    # sai com 1 se parou no meio ou se nenhuma linha do arquivo entrou
+    if interrompida or (relatorio['linhas'] and not relatorio['importadas']): raise SystemExit(1)
+
+orfaos_cli = AppGroup('orfaos', help='Reconciliação de registros órfãos com o Gerenciamento.')
+
+@orfaos_cli.command('reconciliar')
+@click.option('--arquivar', is_flag=True, help='Copia as linhas para arquivo_orfao antes de remover.')
+@click.option('--simular', is_flag=True, help='Só conta os órfãos, sem remover.')
+@click.option('--lote', type=int, default=orfaos.LOTE, show_default=True, help='Linhas por transação.')
+@click.option('--pausa-ms', type=float, default=orfaos.PAUSA_MS, show_default=True, help='Pausa entre transações.')
+@click.option('--forcar', is_flag=True, help=f'Prossegue mesmo com mais de {orfaos.MAX_FRACAO:.0%} de valores órfãos.')
+@click.option('--a-cada', type=float, help='Repete a cada N segundos (agendamento), sem sair em caso de falha.')
+def reconciliar_orfaos(arquivar, simular, lote, pausa_ms, forcar, a_cada):
+    """Remove ou arquiva linhas que apontam para registros inexistentes no Gerenciamento."""
+    while True:
+        try:
+            relatorio = controller.reconciliar_orfaos(forcar=forcar, arquivar=arquivar, simular=simular, lote=lote, pausa_ms=pausa_ms)
+        except (requests.RequestException, orfaos.ReconciliacaoAbortada) as e:
+            click.echo(f'reconciliação não concluída: {e}', err=True)
+            if not a_cada: raise SystemExit(1)
+        else:
+            for p in relatorio['passos']:
+                click.echo(f"{p['tabela']}.{p['coluna']}: {p['valores_orfaos']} valor(es) órfão(s), {p['linhas']} linha(s) "
+                           f"({p['acao']}, {p['lotes']} lote(s)) - {p['motivo']}")
+            click.echo(f"valores locais examinados: {relatorio['valores_locais']}; {relatorio['segundos']}s")
+        if not a_cada: return
+        time.sleep(a_cada)
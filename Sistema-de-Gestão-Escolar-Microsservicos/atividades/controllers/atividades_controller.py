@@ -1,45 +1,320 @@
-from models.models import Atividade, Nota
+import csv
+import math
+import os
+import time
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models.models import Atividade, Nota, Boletim
 from database import db
+import listagem
+import versoes
+import orfaos
 
-def _commit():
+MAX_ITENS_LOTE = 5000
+
+class DadosInvalidos(ValueError):
+    pass
+
+def _commit(*tabelas):
+    # a versão das tabelas alteradas sobe na mesma transação (ETag dos GETs, ver versoes.py)
+    versoes.incrementar(*tabelas)
     db.session.commit()
 
-def listar_atividades():
-    return Atividade.query.all()
+def listar_atividades(**params):
+    return listagem.listar(Atividade, **params)
+def stream_atividades(**params):
+    return listagem.stream(Atividade, **params)
 
 def get_atividade_by_id(aid):
-    return Atividade.query.get(aid)
+    return listagem.obter(Atividade, aid)
+
+def _numero(valor, tipo, campo):
+    # número ou texto numérico (aceito desde sempre), convertido antes de entrar nas contas do boletim
+    if valor is None: return None
+    try:
+        if isinstance(valor, bool): raise ValueError
+        numero = tipo(valor)
+        if not math.isfinite(numero) or (tipo is int and numero != float(valor)): raise ValueError
+    except (TypeError, ValueError):
+        raise DadosInvalidos(f"{campo} deve ser {'inteiro' if tipo is int else 'numérica'}")
+    return numero
 
 def criar_atividade(data):
-    a = Atividade(titulo=data.get('titulo'), descricao=data.get('descricao'), peso_porcento=data.get('peso_porcento'), data_entrega=data.get('data_entrega'), turma_id=data.get('turma_id'), professor_id=data.get('professor_id'))
+    a = Atividade(titulo=data.get('titulo'), descricao=data.get('descricao'), peso_porcento=_numero(data.get('peso_porcento'), int, 'peso_porcento'), data_entrega=data.get('data_entrega'), turma_id=data.get('turma_id'), professor_id=data.get('professor_id'))
     db.session.add(a)
-    _commit()
+    _commit('atividade')
     return a
 
 def atualizar_atividade(aid, data):
     a = Atividade.query.get(aid)
     if not a: return None
+    peso = _numero(data.get('peso_porcento', a.peso_porcento), int, 'peso_porcento')
+    antes = (a.turma_id, a.peso_porcento)
     a.titulo = data.get('titulo', a.titulo)
     a.descricao = data.get('descricao', a.descricao)
-    a.peso_porcento = data.get('peso_porcento', a.peso_porcento)
+    a.peso_porcento = peso
     a.data_entrega = data.get('data_entrega', a.data_entrega)
     a.turma_id = data.get('turma_id', a.turma_id)
     a.professor_id = data.get('professor_id', a.professor_id)
-    _commit()
+    if (a.turma_id, a.peso_porcento) != antes:
+        # as notas da atividade saem do agregado com o peso/turma antigos e entram com os novos
+        _somar_no_boletim(_contribuicoes(aid, *antes, sinal=-1) + _contribuicoes(aid, a.turma_id, a.peso_porcento), remover_vazios=True)
+    _commit('atividade', 'boletim')
     return a
 
 def deletar_atividade(aid):
     a = Atividade.query.get(aid)
     if not a: return False
+    _somar_no_boletim(_contribuicoes(aid, a.turma_id, a.peso_porcento, sinal=-1), remover_vazios=True)
+    # as notas vão junto: o SQLite reaproveita o maior id removido, e uma atividade nova com o mesmo id
+    # herdaria notas que o boletim não conta
+    db.session.execute(db.delete(Nota).where(Nota.atividade_id == aid))
     db.session.delete(a)
-    _commit()
+    _commit('atividade', 'nota', 'boletim')
     return True
 
 # Notas
-def listar_notas():
-    return Nota.query.all()
+def listar_notas(**params):
+    return listagem.listar(Nota, **params)
+def stream_notas(**params):
+    return listagem.stream(Nota, **params)
 def criar_nota(data):
-    n = Nota(nota=data.get('nota'), aluno_id=data.get('aluno_id'), atividade_id=data.get('atividade_id'))
+    n = Nota(nota=_numero(data.get('nota'), float, 'nota'), aluno_id=data.get('aluno_id'), atividade_id=_numero(data.get('atividade_id'), int, 'atividade_id'))
+    # como no lote e na importação: uma nota sem atividade ficaria fora do boletim
+    a = db.session.get(Atividade, n.atividade_id) if n.atividade_id is not None else None
+    if a is None: raise DadosInvalidos('Atividade inexistente')
     db.session.add(n)
-    _commit()
+    _somar_no_boletim([_parcela(n.aluno_id, a.turma_id, a.peso_porcento, n.nota)])
+    _commit('nota', 'boletim')
     return n
+def atividades_existentes(ids):
+    # {id: (turma_id, peso_porcento)} das atividades que existem
+    ids = set(ids)
+    if not ids: return {}
+    return {row.id: (row.turma_id, row.peso_porcento) for row in db.session.execute(
+        db.select(Atividade.id, Atividade.turma_id, Atividade.peso_porcento).where(Atividade.id.in_(ids)))}
+def _erro_nota(item, atividades, alunos_inexistentes):
+    if not isinstance(item, dict): return 'item deve ser um objeto'
+    if not isinstance(item.get('nota'), (int, float)) or isinstance(item.get('nota'), bool): return 'nota deve ser numérica'
+    if not item.get('aluno_id') or not item.get('atividade_id'): return 'aluno_id e atividade_id obrigatórios'
+    if not all(isinstance(item[c], int) and not isinstance(item[c], bool) for c in ('aluno_id', 'atividade_id')): return 'aluno_id e atividade_id devem ser inteiros'
+    if item['atividade_id'] not in atividades: return 'Atividade inexistente'
+    if item['aluno_id'] in alunos_inexistentes: return 'Aluno inexistente'
+    return None
+def _inserir_notas(linhas, atividades, retornar_ids=True):
+    # executemany das notas já validadas e as parcelas do boletim, numa transação; pela Table (Core),
+    # sem o bulk insert do ORM montar um comando por linha
+    tabela = Nota.__table__
+    if retornar_ids:
+        ids = db.session.execute(db.insert(tabela).returning(tabela.c.id, sort_by_parameter_order=True), linhas).scalars().all()
+    else:
+        db.session.execute(db.insert(tabela), linhas)
+        ids = None
+    parcelas = {}
+    for linha in linhas:
+        turma_id, peso = atividades[linha['atividade_id']]
+        p = _parcela(linha['aluno_id'], turma_id, peso, linha['nota'])
+        acumulado = parcelas.setdefault((p['aluno_id'], turma_id), dict(p, soma_ponderada=0, soma_pesos=0, notas=0))
+        for campo in CAMPOS_BOLETIM: acumulado[campo] += p[campo]
+    _somar_no_boletim(list(parcelas.values()))
+    _commit('nota', 'boletim')
+    return ids
+def criar_notas_lote(itens, alunos_inexistentes=()):
+    # alunos_inexistentes já vem validado no gerenciamento numa única chamada
+    atividades = atividades_existentes(i.get('atividade_id') for i in itens if isinstance(i, dict) and isinstance(i.get('atividade_id'), int))
+    resultados = [None] * len(itens)
+    validos = []
+    for indice, item in enumerate(itens):
+        erro = _erro_nota(item, atividades, alunos_inexistentes)
+        if erro:
+            resultados[indice] = {'indice': indice, 'status': 400, 'error': erro}
+        else:
+            validos.append((indice, {'nota': item['nota'], 'aluno_id': item['aluno_id'], 'atividade_id': item['atividade_id']}))
+    if validos:
+        ids = _inserir_notas([linha for _, linha in validos], atividades)
+        for (indice, _), nid in zip(validos, ids):
+            resultados[indice] = {'indice': indice, 'status': 201, 'id': nid}
+    return resultados
+
+# Importação de notas (CSV)
+COLUNAS_CSV = ('aluno_id', 'atividade_id', 'nota')
+LOTE_IMPORTACAO = int(os.environ.get('IMPORTACAO_LOTE', '5000'))
+MAX_LINHAS_POR_ERRO = 20
+
+class CSVInvalido(ValueError):
+    pass
+
+def _numero_csv(valor, tipo, decimal_virgula):
+    valor = (valor or '').strip()
+    if decimal_virgula and tipo is float: valor = valor.replace(',', '.')
+    try:
+        numero = tipo(valor)
+    except ValueError:
+        return valor or None
+    return numero if math.isfinite(numero) else valor
+
+def _ler_csv(texto):
+    # gerador de (número da linha, item) lendo o arquivo aos poucos; aceita ',' ou ';' (com vírgula decimal)
+    cabecalho = texto.readline()
+    delimitador = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+    colunas = [c.strip().lower() for c in next(csv.reader([cabecalho], delimiter=delimitador), [])]
+    faltando = [c for c in COLUNAS_CSV if c not in colunas]
+    if faltando: raise CSVInvalido(f"cabeçalho sem a(s) coluna(s): {', '.join(faltando)}")
+    posicoes = [colunas.index(c) for c in COLUNAS_CSV]
+    for numero, campos in enumerate(csv.reader(texto, delimiter=delimitador), start=2):
+        if not campos: continue
+        aluno_id, atividade_id, nota = (campos[i] if i < len(campos) else None for i in posicoes)
+        yield numero, {'aluno_id': _numero_csv(aluno_id, int, False), 'atividade_id': _numero_csv(atividade_id, int, False),
+                       'nota': _numero_csv(nota, float, delimitador == ';')}
+
+def novo_relatorio():
+    return {'linhas': 0, 'importadas': 0, 'rejeitadas': 0, 'ultima_linha': None, 'erros': {}}
+
+def _rejeitar(relatorio, numero, erro):
+    relatorio['rejeitadas'] += 1
+    grupo = relatorio['erros'].setdefault(erro, {'total': 0, 'linhas': []})
+    grupo['total'] += 1
+    if len(grupo['linhas']) < MAX_LINHAS_POR_ERRO: grupo['linhas'].append(numero)
+
+def _importar_lote(lote, atividades, validar_alunos, relatorio):
+    alunos_inexistentes = validar_alunos(sorted({item['aluno_id'] for _, item in lote if isinstance(item['aluno_id'], int)}))
+    validos = []
+    for numero, item in lote:
+        erro = _erro_nota(item, atividades, alunos_inexistentes)
+        if erro: _rejeitar(relatorio, numero, erro)
+        else: validos.append(item)
+    if validos: _inserir_notas(validos, atividades, retornar_ids=False)
+    relatorio['importadas'] += len(validos)
+    relatorio['linhas'] += len(lote)
+    relatorio['ultima_linha'] = lote[-1][0]
+
+def importar_notas_csv(texto, validar_alunos, relatorio=None, lote=None):
+    # texto: arquivo em modo texto, lido em fluxo; validar_alunos(ids) devolve os inexistentes (no gerenciamento)
+    # cada lote de `lote` linhas é validado e gravado na sua própria transação; `relatorio` reflete o que já foi
+    # gravado mesmo se a importação parar no meio
+    relatorio = novo_relatorio() if relatorio is None else relatorio
+    lote = lote or LOTE_IMPORTACAO
+    # as atividades numa única consulta; o boletim precisa da turma e do peso de cada uma
+    atividades = {row.id: (row.turma_id, row.peso_porcento) for row in db.session.execute(
+        db.select(Atividade.id, Atividade.turma_id, Atividade.peso_porcento))}
+    pendentes = []
+    for numero, item in _ler_csv(texto):
+        pendentes.append((numero, item))
+        if len(pendentes) >= lote:
+            _importar_lote(pendentes, atividades, validar_alunos, relatorio)
+            pendentes = []
+    if pendentes: _importar_lote(pendentes, atividades, validar_alunos, relatorio)
+    return relatorio
+
+def exportar_notas(turma_id=None, atividade_id=None, aluno_id=None):
+    # consulta do GET /export/notas.csv, ordenada pelo índice que a filtra, sem ordenar em memória: só com turma,
+    # (atividade, id) pelos índices de turma_id da atividade e de atividade_id da nota; nos outros casos, id
+    stmt = (db.select(Nota.id, Nota.aluno_id, Nota.atividade_id, Atividade.titulo, Atividade.turma_id, Nota.nota)
+            .join(Atividade, Atividade.id == Nota.atividade_id))
+    if turma_id is not None: stmt = stmt.where(Atividade.turma_id == turma_id)
+    if turma_id is not None and aluno_id is None and atividade_id is None: stmt = stmt.order_by(Atividade.id, Nota.id)
+    else: stmt = stmt.order_by(Nota.id)
+    if atividade_id is not None: stmt = stmt.where(Nota.atividade_id == atividade_id)
+    if aluno_id is not None: stmt = stmt.where(Nota.aluno_id == aluno_id)
+    return stmt
+
+# Boletim: média ponderada SUM(nota * peso) / SUM(peso), lida do agregado materializado
+CAMPOS_BOLETIM = ('soma_ponderada', 'soma_pesos', 'notas')
+
+def _parcela(aluno_id, turma_id, peso, nota, notas=1, sinal=1):
+    # contribuição de `notas` notas (somando `nota`) de uma atividade; nulos contam como no SUM do SQL
+    peso = peso or 0
+    return {'aluno_id': aluno_id, 'turma_id': turma_id, 'soma_ponderada': sinal * (nota or 0) * peso,
+            'soma_pesos': sinal * peso * notas, 'notas': sinal * notas}
+
+def _contribuicoes(aid, turma_id, peso, sinal=1):
+    stmt = (db.select(Nota.aluno_id, db.func.sum(Nota.nota), db.func.count(Nota.id))
+            .where(Nota.atividade_id == aid).group_by(Nota.aluno_id))
+    return [_parcela(aluno_id, turma_id, peso, soma, notas, sinal) for aluno_id, soma, notas in db.session.execute(stmt)]
+
+def _somar_no_boletim(parcelas, remover_vazios=False):
+    if not parcelas: return
+    stmt = sqlite_insert(Boletim.__table__)
+    stmt = stmt.on_conflict_do_update(index_elements=['aluno_id', 'turma_id'],
+                                      set_={c: Boletim.__table__.c[c] + stmt.excluded[c] for c in CAMPOS_BOLETIM})
+    db.session.execute(stmt, parcelas)
+    if remover_vazios: db.session.execute(db.delete(Boletim).where(Boletim.notas <= 0))
+
+def _boletim(grupo, *filtros):
+    stmt = (db.select(grupo, (Boletim.soma_ponderada / db.func.nullif(Boletim.soma_pesos, 0)).label('media'),
+                      Boletim.soma_pesos, Boletim.notas)
+            .where(*filtros).order_by(grupo))
+    return [dict(row._mapping) for row in db.session.execute(stmt)]
+
+def boletim_turma(tid):
+    return _boletim(Boletim.aluno_id, Boletim.turma_id == tid)
+
+def boletim_aluno(aid):
+    return _boletim(Boletim.turma_id, Boletim.aluno_id == aid)
+
+def _boletim_bruto():
+    # o mesmo agregado calculado direto de nota JOIN atividade
+    peso = db.func.coalesce(Atividade.peso_porcento, 0)
+    return (db.select(Nota.aluno_id, Atividade.turma_id,
+                      db.func.coalesce(db.func.sum(Nota.nota * peso), 0).label('soma_ponderada'),
+                      db.func.sum(peso).label('soma_pesos'), db.func.count(Nota.id).label('notas'))
+            .join(Atividade, Atividade.id == Nota.atividade_id)
+            .group_by(Nota.aluno_id, Atividade.turma_id))
+
+def reconstruir_boletim():
+    db.session.execute(db.delete(Boletim))
+    bruto = _boletim_bruto()
+    db.session.execute(db.insert(Boletim).from_select([c.name for c in bruto.selected_columns], bruto))
+    _commit('boletim')
+    return db.session.scalar(db.select(db.func.count()).select_from(Boletim))
+
+def divergencias_boletim(tolerancia=1e-6):
+    esperado = {(r.aluno_id, r.turma_id): r for r in db.session.execute(_boletim_bruto())}
+    atual = {(r.aluno_id, r.turma_id): r for r in db.session.execute(db.select(*Boletim.__table__.c))}
+    valores = lambda r: {c: getattr(r, c) for c in CAMPOS_BOLETIM} if r is not None else None
+    divergencias = []
+    for chave in esperado.keys() | atual.keys():
+        e, a = esperado.get(chave), atual.get(chave)
+        if e is None or a is None or e.soma_pesos != a.soma_pesos or e.notas != a.notas \
+                or abs(e.soma_ponderada - a.soma_ponderada) > tolerancia * max(1, abs(e.soma_ponderada)):
+            divergencias.append({'aluno_id': chave[0], 'turma_id': chave[1], 'esperado': valores(e), 'atual': valores(a)})
+    return sorted(divergencias, key=lambda d: (d['aluno_id'], d['turma_id']))
+
+def preparar_boletim():
+    # bancos anteriores ao agregado: monta a tabela uma vez a partir das notas existentes
+    if db.session.scalar(db.select(Boletim.aluno_id).limit(1)) is None and db.session.scalar(db.select(Nota.id).limit(1)) is not None:
+        reconstruir_boletim()
+
+# Reconciliação de órfãos (ver orfaos.py)
+def _tirar_atividades_do_boletim(linhas):
+    # como em deletar_atividade: as notas saem do agregado (e são removidas depois, sem atividade)
+    pesos = {l['id']: (l['turma_id'], l['peso_porcento']) for l in linhas}
+    stmt = (db.select(Nota.atividade_id, Nota.aluno_id, db.func.sum(Nota.nota), db.func.count(Nota.id))
+            .where(Nota.atividade_id.in_(pesos)).group_by(Nota.atividade_id, Nota.aluno_id))
+    _somar_no_boletim([_parcela(aluno_id, *pesos[aid], soma, notas, sinal=-1) for aid, aluno_id, soma, notas in db.session.execute(stmt)],
+                      remover_vazios=True)
+
+def _tirar_notas_do_boletim(linhas):
+    pesos = atividades_existentes(l['atividade_id'] for l in linhas)
+    _somar_no_boletim([_parcela(l['aluno_id'], *pesos[l['atividade_id']], l['nota'], sinal=-1) for l in linhas if l['atividade_id'] in pesos],
+                      remover_vazios=True)
+
+def reconciliar_orfaos(forcar=False, **opcoes):
+    # valores locais antes dos remotos: um id criado depois da leitura remota não vira órfão
+    inicio = time.perf_counter()
+    locais = {'turmas': orfaos.valores_locais(Atividade.turma_id), 'professores': orfaos.valores_locais(Atividade.professor_id),
+              'alunos': orfaos.valores_locais(Nota.aluno_id)}
+    orfas = {recurso: valores - orfaos.ids_validos(recurso) for recurso, valores in locais.items()}
+    orfaos.conferir(locais, orfas, forcar)
+    passos = [
+        orfaos.processar(Atividade, Atividade.turma_id, orfas['turmas'], 'turma inexistente no gerenciamento',
+                         ('atividade', 'boletim'), antes=_tirar_atividades_do_boletim, **opcoes),
+        orfaos.processar(Atividade, Atividade.professor_id, orfas['professores'], 'professor inexistente no gerenciamento',
+                         ('atividade', 'boletim'), antes=_tirar_atividades_do_boletim, **opcoes),
+        orfaos.processar(Nota, Nota.aluno_id, orfas['alunos'], 'aluno inexistente no gerenciamento',
+                         ('nota', 'boletim'), antes=_tirar_notas_do_boletim, **opcoes),
+    ]
+    # notas de atividades removidas pelos passos acima (ou por deletar_atividade antes de apagar as notas junto)
+    sem_atividade = orfaos.valores_locais(Nota.atividade_id) - orfaos.valores_locais(Atividade.id)
+    passos.append(orfaos.processar(Nota, Nota.atividade_id, sem_atividade, 'atividade inexistente', ('nota',), **opcoes))
+    return {'valores_locais': {k: len(v) for k, v in locais.items()}, 'passos': passos,
+            'segundos': round(time.perf_counter() - inicio, 3)}
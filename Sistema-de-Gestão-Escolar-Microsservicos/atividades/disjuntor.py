@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import deque
+import requests
+
+FECHADO, ABERTO, MEIO_ABERTO = 'fechado', 'aberto', 'meio-aberto'
+
+class CircuitoAberto(requests.RequestException):
+    # subclasse de RequestException: quem já trata falha de conexão (503) trata o circuito aberto igual
+    pass
+
+class Disjuntor:
+    # Circuit breaker por worker. Fechado: as chamadas passam e o resultado entra numa janela de `janela`
+    # segundos; com pelo menos `min_chamadas` na janela, abre se a fração de falhas (conexão, timeout, 5xx)
+    # chegar a `taxa_erro` ou a de chamadas mais lentas que `latencia_ms` chegar a `taxa_lentas`.
+    # Aberto: recusa na hora (CircuitoAberto) por `aberto_s` segundos. Meio-aberto: deixa passar até
+    # `sondas` chamadas de teste; se todas saírem boas fecha, se uma falhar (ou for lenta) abre de novo.
+    def __init__(self, janela=30, min_chamadas=10, taxa_erro=0.5, latencia_ms=1000, taxa_lentas=0.5, aberto_s=10, sondas=1):
+        self.janela = janela
+        self.min_chamadas = min_chamadas
+        self.taxa_erro = taxa_erro
+        self.latencia_ms = latencia_ms
+        self.taxa_lentas = taxa_lentas
+        self.aberto_s = aberto_s
+        self.sondas = sondas
+        self.estado = FECHADO
+        self._chamadas = deque()
+        self._aberto_ate = 0.0
+        self._sondas_em_curso = 0
+        self._sondas_ok = 0
+        self._lock = threading.Lock()
+        self.aberturas = 0
+        self.rejeitadas = 0
+
+    def permitir(self):
+        with self._lock:
+            if self.estado == ABERTO:
+                if time.monotonic() < self._aberto_ate:
+                    self.rejeitadas += 1
+                    raise CircuitoAberto('Circuito aberto: gerenciamento indisponível')
+                self.estado = MEIO_ABERTO
+                self._sondas_em_curso = self._sondas_ok = 0
+            if self.estado == MEIO_ABERTO:
+                if self._sondas_em_curso >= self.sondas:
+                    self.rejeitadas += 1
+                    raise CircuitoAberto('Circuito meio-aberto: aguardando sondagem do gerenciamento')
+                self._sondas_em_curso += 1
+
+    def registrar(self, segundos, falhou):
+        lenta = segundos * 1000 > self.latencia_ms
+        agora = time.monotonic()
+        with self._lock:
+            if self.estado == MEIO_ABERTO:
+                self._sondas_em_curso = max(0, self._sondas_em_curso - 1)
+                if falhou or lenta: return self._abrir(agora)
+                self._sondas_ok += 1
+                if self._sondas_ok >= self.sondas:
+                    self.estado = FECHADO
+                    self._chamadas.clear()
+                return
+            # chamadas que começaram antes de abrir não mudam nada
+            if self.estado == ABERTO: return
+            self._chamadas.append((agora, falhou, lenta))
+            self._descartar_antigas(agora)
+            total = len(self._chamadas)
+            if total < self.min_chamadas: return
+            falhas = sum(1 for _, f, _ in self._chamadas if f)
+            lentas = sum(1 for _, _, l in self._chamadas if l)
+            if falhas / total >= self.taxa_erro or lentas / total >= self.taxa_lentas: self._abrir(agora)
+
+    def _abrir(self, agora):
+        self.estado = ABERTO
+        self._aberto_ate = agora + self.aberto_s
+        self._chamadas.clear()
+        self.aberturas += 1
+
+    def _descartar_antigas(self, agora):
+        while self._chamadas and self._chamadas[0][0] <= agora - self.janela:
+            self._chamadas.popleft()
+
+    def resetar(self):
+        with self._lock:
+            self.estado = FECHADO
+            self._chamadas.clear()
+            self._sondas_em_curso = self._sondas_ok = 0
+
+    def stats(self):
+        agora = time.monotonic()
+        with self._lock:
+            self._descartar_antigas(agora)
+            estado = self.estado
+            # aberto com o prazo vencido: a próxima chamada já é a sondagem
+            if estado == ABERTO and agora >= self._aberto_ate: estado = MEIO_ABERTO
+            total = len(self._chamadas)
+            return {'estado': estado, 'chamadas_na_janela': total,
+                    'taxa_erro': round(sum(1 for _, f, _ in self._chamadas if f) / total, 4) if total else None,
+                    'taxa_lentas': round(sum(1 for _, _, l in self._chamadas if l) / total, 4) if total else None,
+                    'reabre_em_s': round(self._aberto_ate - agora, 3) if estado == ABERTO else None,
+                    'aberturas': self.aberturas, 'rejeitadas': self.rejeitadas,
+                    'limites': {'janela_s': self.janela, 'min_chamadas': self.min_chamadas, 'taxa_erro': self.taxa_erro,
+                                'latencia_ms': self.latencia_ms, 'taxa_lentas': self.taxa_lentas,
+                                'aberto_s': self.aberto_s, 'sondas': self.sondas}}
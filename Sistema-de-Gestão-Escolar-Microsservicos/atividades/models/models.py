@@ -6,16 +6,29 @@ class Atividade(db.Model):
     descricao = db.Column(db.String(500))
     peso_porcento = db.Column(db.Integer)
     data_entrega = db.Column(db.String(50))
-    turma_id = db.Column(db.Integer, nullable=False)
-    professor_id = db.Column(db.Integer, nullable=False)
+    turma_id = db.Column(db.Integer, nullable=False, index=True)
+    professor_id = db.Column(db.Integer, nullable=False, index=True)
     def to_dict(self):
         return {"id":self.id,"titulo":self.titulo,"descricao":self.descricao,"peso_porcento":self.peso_porcento,"data_entrega":self.data_entrega,"turma_id":self.turma_id,"professor_id":self.professor_id}
 
 class Nota(db.Model):
     __tablename__ = 'nota'
+    # aluno_id sozinho serve a paginação por aluno (ordem de id); o composto cobre o join aluno -> atividade
+    __table_args__ = (db.Index('ix_nota_aluno_atividade', 'aluno_id', 'atividade_id'),)
     id = db.Column(db.Integer, primary_key=True)
     nota = db.Column(db.Float)
-    aluno_id = db.Column(db.Integer, nullable=False)
-    atividade_id = db.Column(db.Integer, nullable=False)
+    aluno_id = db.Column(db.Integer, nullable=False, index=True)
+    atividade_id = db.Column(db.Integer, nullable=False, index=True)
     def to_dict(self):
         return {"id":self.id,"nota":self.nota,"aluno_id":self.aluno_id,"atividade_id":self.atividade_id}
+
+class Boletim(db.Model):
+    __tablename__ = 'boletim'
+    # agregado por (aluno, turma), mantido na mesma transação das escritas de nota/atividade
+    # (ver atividades_controller); `flask boletim reconstruir` recalcula a partir dos dados brutos
+    __table_args__ = (db.Index('ix_boletim_turma_aluno', 'turma_id', 'aluno_id'),)
+    aluno_id = db.Column(db.Integer, primary_key=True)
+    turma_id = db.Column(db.Integer, primary_key=True)
+    soma_ponderada = db.Column(db.Float, nullable=False, default=0)
+    soma_pesos = db.Column(db.Integer, nullable=False, default=0)
+    notas = db.Column(db.Integer, nullable=False, default=0)
@@ -1,13 +1,31 @@
+import io
 from flask import Blueprint, request, jsonify
 from controllers import atividades_controller as controller
-import os
+import listagem
+import versoes
 import requests
+import gerenciamento_client as ger
+import replica
+import exportacao
 bp = Blueprint('atividades', __name__)
-GER_URL = os.environ.get('GERENCIAMENTO_URL','http://gerenciamento:5000')
 
 def json_error(message, code):
     return jsonify({'error': message}), code
 
+def resumo_lote(resultados):
+    criados = sum(1 for r in resultados if r['status'] == 201)
+    return {'criados': criados, 'rejeitados': len(resultados) - criados, 'resultados': resultados}
+
+INEXISTENTE = {'turmas': 'Turma inexistente', 'professores': 'Professor inexistente'}
+
+def validar_referencias(turma_id=None, professor_id=None):
+    try:
+        recurso = ger.verificar_referencias(turmas=turma_id, professores=professor_id)
+    except requests.RequestException:
+        return json_error('Falha ao contactar gerenciamento', 503)
+    if recurso: return json_error(INEXISTENTE[recurso], 400)
+    return None
+
 @bp.route('/status', methods=['GET'])
 def status():
     """Status do serviço de Atividades
@@ -23,13 +41,136 @@ def status():
             status:
               type: string
               example: ok
+              description: "degradado enquanto o circuito do Gerenciamento não estiver fechado"
+            gerenciamento:
+              type: object
+              description: Estado do circuit breaker das chamadas ao Gerenciamento (neste worker)
+              properties:
+                estado:
+                  type: string
+                  enum: [fechado, aberto, meio-aberto]
+                chamadas_na_janela:
+                  type: integer
+                taxa_erro:
+                  type: number
+                taxa_lentas:
+                  type: number
+                reabre_em_s:
+                  type: number
+                aberturas:
+                  type: integer
+                rejeitadas:
+                  type: integer
+                limites:
+                  type: object
+                politica_degradada:
+                  type: string
+                  enum: [falhar, cache]
+            replica:
+              type: object
+              description: Réplica local dos ids do Gerenciamento (REPLICA_GERENCIAMENTO=1)
+              properties:
+                ativa:
+                  type: boolean
+                seq:
+                  type: integer
+                em_dia:
+                  type: boolean
+                sincronizado_ha_s:
+                  type: number
+                consumidor:
+                  type: string
+    """
+    disjuntor = ger.estado_disjuntor()
+    estado = 'ok' if disjuntor['estado'] == 'fechado' else 'degradado'
+    return jsonify({'service':'atividades','status':estado,'gerenciamento':disjuntor,'replica':replica.estado()}),200
+
+@bp.route('/cache/validacao', methods=['GET'])
+def cache_validacao():
+    """Estatísticas do cache local de ids validados no Gerenciamento
+    ---
+    responses:
+      200:
+        description: Contadores do cache
+        schema:
+          type: object
+          properties:
+            entradas:
+              type: integer
+            hits:
+              type: integer
+            misses:
+              type: integer
+            hit_ratio:
+              type: number
+    """
+    return jsonify(ger.cache_validacao.stats()),200
+
+@bp.route('/cache/validacao', methods=['DELETE'])
+def purgar_cache_validacao():
+    """Remove entradas do cache local de ids validados
+    ---
+    parameters:
+      - name: recurso
+        in: query
+        type: string
+        enum: [turmas, professores]
+        required: false
+        description: Recurso da entrada a remover (sem ele o cache inteiro é limpo)
+      - name: id
+        in: query
+        type: integer
+        required: false
+        description: ID da entrada a remover
+    responses:
+      200:
+        description: Quantidade de entradas removidas
+      400:
+        description: recurso informado sem id
     """
-    return jsonify({'service':'atividades','status':'ok'}),200
+    recurso = request.args.get('recurso'); rid = request.args.get('id')
+    if recurso and not rid: return json_error('id obrigatório quando recurso é informado', 400)
+    return jsonify({'removidas': ger.purgar_cache(recurso, rid)}),200
 
 @bp.route('/atividades', methods=['GET'])
+@versoes.condicional('atividade')
 def listar():
     """Lista todas as atividades cadastradas
     ---
+    parameters:
+      - name: after_id
+        in: query
+        type: integer
+        required: false
+        description: Retorna apenas registros com id maior que este (cursor da página anterior)
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Tamanho máximo da página (até 1000); havendo mais registros o cursor vem no header X-Next-After-Id
+      - name: turma_id
+        in: query
+        type: integer
+        required: false
+        description: Filtra pela turma
+      - name: professor_id
+        in: query
+        type: integer
+        required: false
+        description: Filtra pelo professor
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: Lista de campos separados por vírgula a incluir na resposta (ex. id,nome)
+      - name: stream
+        in: query
+        type: boolean
+        required: false
+        description: Envia todos os registros como NDJSON em blocos (o mesmo que Accept application/x-ndjson)
+    produces:
+      - application/json
+      - application/x-ndjson
     responses:
       200:
         description: Lista de atividades
@@ -52,10 +193,20 @@ def listar():
                 type: integer
               professor_id:
                 type: integer
+      400:
+        description: Parâmetros de listagem inválidos
     """
-    return jsonify([a.to_dict() for a in controller.listar_atividades()]),200
+    try:
+        params = listagem.parametros(request.args, {'turma_id': int, 'professor_id': int})
+        if listagem.quer_stream(request):
+            return listagem.resposta_stream(controller.stream_atividades(**params)), 200
+        linhas, proximo = controller.listar_atividades(**params)
+    except listagem.ParametroInvalido as e:
+        return json_error(str(e), 400)
+    return listagem.resposta(linhas, proximo), 200
 
 @bp.route('/atividades/<int:aid>', methods=['GET'])
+@versoes.condicional('atividade')
 def obter(aid):
     """Obter uma atividade específica pelo ID
     ---
@@ -90,7 +241,7 @@ def obter(aid):
     """
     a = controller.get_atividade_by_id(aid)
     if not a: return json_error('Atividade não encontrada', 404)
-    return jsonify(a.to_dict()),200
+    return jsonify(a),200
 
 @bp.route('/atividades', methods=['POST'])
 def criar():
@@ -129,14 +280,12 @@ def criar():
     data = request.get_json() or {}
     turma_id = data.get('turma_id'); professor_id = data.get('professor_id')
     if not turma_id or not professor_id: return json_error('turma_id e professor_id obrigatórios', 400)
+    erro = validar_referencias(turma_id, professor_id)
+    if erro: return erro
     try:
-        resp_t = requests.get(f"{GER_URL}/turmas/{turma_id}", timeout=3)
-        resp_p = requests.get(f"{GER_URL}/professores/{professor_id}", timeout=3)
-    except requests.RequestException:
-        return json_error('Falha ao contactar gerenciamento', 503)
-    if resp_t.status_code != 200: return jsonify({'error':'Turma inexistente'}),400
-    if resp_p.status_code != 200: return jsonify({'error':'Professor inexistente'}),400
-    a = controller.criar_atividade(data)
+        a = controller.criar_atividade(data)
+    except controller.DadosInvalidos as e:
+        return json_error(str(e), 400)
     return jsonify(a.to_dict()),201
 
 @bp.route('/atividades/<int:aid>', methods=['PUT'])
@@ -178,26 +327,54 @@ def atualizar(aid):
     """
     data = request.get_json() or {}
     turma_id = data.get('turma_id'); professor_id = data.get('professor_id')
-    if turma_id:
-        try:
-            resp_t = requests.get(f"{GER_URL}/turmas/{turma_id}", timeout=3)
-        except requests.RequestException:
-            return json_error('Falha ao contactar gerenciamento', 503)
-        if resp_t.status_code != 200: return json_error('Turma inexistente', 400)
-    if professor_id:
-        try:
-            resp_p = requests.get(f"{GER_URL}/professores/{professor_id}", timeout=3)
-        except requests.RequestException:
-            return json_error('Falha ao contactar gerenciamento', 503)
-        if resp_p.status_code != 200: return json_error('Professor inexistente', 400)
-    a = controller.atualizar_atividade(aid, data)
+    erro = validar_referencias(turma_id, professor_id)
+    if erro: return erro
+    try:
+        a = controller.atualizar_atividade(aid, data)
+    except controller.DadosInvalidos as e:
+        return json_error(str(e), 400)
     if not a: return json_error('Atividade não encontrada', 404)
     return jsonify(a.to_dict()),200
 
 @bp.route('/notas', methods=['GET'])
+@versoes.condicional('nota')
 def listar_notas_route():
     """Lista todas as notas cadastradas
     ---
+    parameters:
+      - name: after_id
+        in: query
+        type: integer
+        required: false
+        description: Retorna apenas registros com id maior que este (cursor da página anterior)
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Tamanho máximo da página (até 1000); havendo mais registros o cursor vem no header X-Next-After-Id
+      - name: aluno_id
+        in: query
+        type: integer
+        required: false
+        description: Filtra pelo aluno
+      - name: atividade_id
+        in: query
+        type: integer
+        required: false
+        description: Filtra pela atividade
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: Lista de campos separados por vírgula a incluir na resposta (ex. id,nome)
+      - name: stream
+        in: query
+        type: boolean
+        required: false
+        description: Envia todos os registros como NDJSON em blocos (o mesmo que Accept application/x-ndjson)
+    produces:
+      - application/json
+      - application/x-ndjson
     responses:
       200:
         description: Lista de notas
@@ -215,8 +392,17 @@ def listar_notas_route():
                 type: integer
               atividade_id:
                 type: integer
+      400:
+        description: Parâmetros de listagem inválidos
     """
-    return jsonify([n.to_dict() for n in controller.listar_notas()]),200
+    try:
+        params = listagem.parametros(request.args, {'aluno_id': int, 'atividade_id': int})
+        if listagem.quer_stream(request):
+            return listagem.resposta_stream(controller.stream_notas(**params)), 200
+        linhas, proximo = controller.listar_notas(**params)
+    except listagem.ParametroInvalido as e:
+        return json_error(str(e), 400)
+    return listagem.resposta(linhas, proximo), 200
 
 @bp.route('/notas', methods=['POST'])
 def criar_nota_route():
@@ -256,15 +442,190 @@ def criar_nota_route():
             atividade_id:
               type: integer
       400:
-        description: Dados inválidos
+        description: Dados inválidos ou atividade inexistente
     """
     data = request.get_json() or {}
-    n = controller.criar_nota(data)
+    try:
+        n = controller.criar_nota(data)
+    except controller.DadosInvalidos as e:
+        return json_error(str(e), 400)
     return jsonify(n.to_dict()),201
 
+@bp.route('/notas/bulk', methods=['POST'])
+def criar_notas_lote_route():
+    """Criar várias notas numa única transação
+    ---
+    parameters:
+      - in: body
+        name: body
+        schema:
+          type: array
+          maxItems: 5000
+          items:
+            type: object
+            required:
+              - nota
+              - aluno_id
+              - atividade_id
+            properties:
+              nota:
+                type: number
+              aluno_id:
+                type: integer
+              atividade_id:
+                type: integer
+    responses:
+      200:
+        description: Resultado por item (status 201 com o id criado ou 400 com o erro)
+        schema:
+          type: object
+          properties:
+            criados:
+              type: integer
+            rejeitados:
+              type: integer
+            resultados:
+              type: array
+              items:
+                type: object
+                properties:
+                  indice:
+                    type: integer
+                  status:
+                    type: integer
+                  id:
+                    type: integer
+                  error:
+                    type: string
+      400:
+        description: Corpo não é uma lista ou excede o tamanho máximo
+      503:
+        description: Erro ao contactar serviço de gerenciamento
+    """
+    itens = request.get_json(silent=True)
+    if not isinstance(itens, list) or not itens: return json_error('envie uma lista não vazia', 400)
+    if len(itens) > controller.MAX_ITENS_LOTE: return json_error(f'máximo de {controller.MAX_ITENS_LOTE} itens por lote', 400)
+    try:
+        inexistentes = ger.validar_lote(alunos=[i.get('aluno_id') for i in itens if isinstance(i, dict) and isinstance(i.get('aluno_id'), int)])
+    except requests.RequestException:
+        return json_error('Falha ao contactar gerenciamento', 503)
+    return jsonify(resumo_lote(controller.criar_notas_lote(itens, inexistentes['alunos']))),200
+
+@bp.route('/notas/import', methods=['POST'])
+def importar_notas_route():
+    """Importar notas de um CSV (planilha), lido em fluxo
+    ---
+    description: |
+      Cabeçalho com as colunas aluno_id, atividade_id e nota (em qualquer ordem; outras são ignoradas),
+      separadas por vírgula ou por ponto e vírgula (neste caso a nota pode usar vírgula decimal).
+      O corpo é o próprio CSV (Content-Type text/csv) ou um upload multipart no campo "arquivo".
+      As linhas são gravadas em transações de até `lote` linhas; as já gravadas permanecem se a importação parar.
+    consumes:
+      - text/csv
+      - multipart/form-data
+    parameters:
+      - in: formData
+        name: arquivo
+        type: file
+        required: false
+      - name: lote
+        in: query
+        type: integer
+        description: Linhas por transação (padrão IMPORTACAO_LOTE, 5000)
+    responses:
+      200:
+        description: Relatório da importação
+        schema:
+          type: object
+          properties:
+            linhas:
+              type: integer
+            importadas:
+              type: integer
+            rejeitadas:
+              type: integer
+            ultima_linha:
+              type: integer
+              description: Última linha do arquivo processada (1 é o cabeçalho)
+            erros:
+              type: object
+              description: "Por mensagem de erro: total e as primeiras linhas afetadas"
+              example: {"Aluno inexistente": {"total": 2, "linhas": [7, 19]}}
+      400:
+        description: CSV sem as colunas obrigatórias
+      503:
+        description: Falha ao contactar gerenciamento (o relatório mostra o que já foi gravado)
+    """
+    try:
+        lote = int(request.args.get('lote') or controller.LOTE_IMPORTACAO)
+    except ValueError:
+        return json_error('lote deve ser inteiro', 400)
+    if lote < 1: return json_error('lote deve ser maior que zero', 400)
+    arquivo = request.files.get('arquivo') if request.mimetype == 'multipart/form-data' else None
+    bruto = arquivo.stream if arquivo else request.stream
+    texto = io.TextIOWrapper(bruto, encoding='utf-8-sig', newline='')
+    relatorio = controller.novo_relatorio()
+    try:
+        controller.importar_notas_csv(texto, lambda ids: ger.validar_lote(alunos=ids)['alunos'], relatorio, lote)
+    except controller.CSVInvalido as e:
+        return json_error(str(e), 400)
+    except UnicodeDecodeError:
+        return jsonify({'error': 'arquivo deve estar em UTF-8', **relatorio}), 400
+    except requests.RequestException:
+        return jsonify({'error': 'Falha ao contactar gerenciamento', **relatorio}), 503
+    return jsonify(relatorio), 200
+
+@bp.route('/export/notas.csv', methods=['GET'])
+def exportar_notas_route():
+    """Exporta as notas em CSV, gerado linha a linha (chunked, gzip com Accept-Encoding gzip)
+    ---
+    description: |
+      O arquivo traz as colunas aluno_id, atividade_id e nota e pode voltar por POST /notas/import.
+    parameters:
+      - name: turma_id
+        in: query
+        type: integer
+        required: false
+        description: Apenas notas das atividades desta turma
+      - name: atividade_id
+        in: query
+        type: integer
+        required: false
+        description: Filtra pela atividade
+      - name: aluno_id
+        in: query
+        type: integer
+        required: false
+        description: Filtra pelo aluno
+      - name: separador
+        in: query
+        type: string
+        enum: [",", ";"]
+        required: false
+        description: Separador de campos (com ; as notas usam vírgula decimal)
+      - name: gzip
+        in: query
+        type: string
+        enum: ["0"]
+        required: false
+        description: 0 desliga a compressão mesmo com Accept-Encoding gzip
+    produces:
+      - text/csv
+    responses:
+      200:
+        description: "CSV com as colunas id, aluno_id, atividade_id, titulo, turma_id, nota"
+      400:
+        description: Filtro ou separador inválido
+    """
+    try:
+        filtros = listagem.parametros(request.args, {'turma_id': int, 'atividade_id': int, 'aluno_id': int})['filtros']
+        return exportacao.resposta_csv('notas.csv', controller.exportar_notas(**filtros))
+    except listagem.ParametroInvalido as e:
+        return json_error(str(e), 400)
+
 @bp.route('/atividades/<int:aid>', methods=['DELETE'])
 def deletar(aid):
-    """Deletar uma atividade existente
+    """Deletar uma atividade existente (e as suas notas)
     ---
     parameters:
       - name: aid
@@ -281,4 +642,75 @@ def deletar(aid):
     sucesso = controller.deletar_atividade(aid)
     if not sucesso:
         return json_error('Atividade não encontrada', 404)
-    return '', 204
\ No newline at end of file
+    return '', 204
+@bp.route('/turmas/<int:tid>/boletim', methods=['GET'])
+@versoes.condicional('boletim')
+def boletim_turma(tid):
+    """Boletim de uma turma: média ponderada de cada aluno
+    ---
+    parameters:
+      - name: tid
+        in: path
+        type: integer
+        required: true
+        description: ID da turma
+    responses:
+      200:
+        description: Média ponderada pelo peso_porcento das atividades da turma, por aluno
+        schema:
+          type: object
+          properties:
+            turma_id:
+              type: integer
+            alunos:
+              type: array
+              items:
+                type: object
+                properties:
+                  aluno_id:
+                    type: integer
+                  media:
+                    type: number
+                    description: SUM(nota * peso) / SUM(peso); null se a soma dos pesos for zero
+                  soma_pesos:
+                    type: integer
+                  notas:
+                    type: integer
+    """
+    return jsonify({'turma_id': tid, 'alunos': controller.boletim_turma(tid)}),200
+
+@bp.route('/alunos/<int:aid>/boletim', methods=['GET'])
+@versoes.condicional('boletim')
+def boletim_aluno(aid):
+    """Boletim de um aluno: média ponderada em cada turma
+    ---
+    parameters:
+      - name: aid
+        in: path
+        type: integer
+        required: true
+        description: ID do aluno
+    responses:
+      200:
+        description: Média ponderada pelo peso_porcento das atividades, por turma
+        schema:
+          type: object
+          properties:
+            aluno_id:
+              type: integer
+            turmas:
+              type: array
+              items:
+                type: object
+                properties:
+                  turma_id:
+                    type: integer
+                  media:
+                    type: number
+                    description: SUM(nota * peso) / SUM(peso); null se a soma dos pesos for zero
+                  soma_pesos:
+                    type: integer
+                  notas:
+                    type: integer
+    """
+    return jsonify({'aluno_id': aid, 'turmas': controller.boletim_aluno(aid)}),200
@@ -1,15 +1,24 @@
 from flask import Flask, jsonify
 import logging
-from flasgger import Swagger
 from database import init_db
+import docs
+import json_provider
+import metricas
+import outbox
+import perfil_sql
 from routes import bp as routes_bp
 import os
 app = Flask(__name__)
+app.json = json_provider.criar(app)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
 logger = logging.getLogger(__name__)
-Swagger(app)
+docs.registrar(app)
 db_file = os.environ.get('DB_FILE','gerenciamento.db')
 init_db(app, db_file)
+metricas.instalar(app, 'gerenciamento')
+perfil_sql.instalar(app)
+with app.app_context():
+    outbox.preparar()
 app.register_blueprint(routes_bp, url_prefix='/')
 @app.route('/')
 def index():
@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import OrderedDict
+
+AUSENTE = object()
+
+class TTLCache:
+    # Cache em memória com expiração por entrada e despejo LRU quando cheio. Com manter_expirados=True, uma
+    # entrada vencida conta como miss no get mas continua guardada (até ser sobrescrita ou despejada) para
+    # get_expirado, ex. servir o último valor bom enquanto a origem está fora
+    def __init__(self, maxsize=1024, ttl=60, manter_expirados=False):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.manter_expirados = manter_expirados
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.despejos = 0
+
+    def get(self, chave, padrao=AUSENTE):
+        agora = time.monotonic()
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is None or item[1] <= agora:
+                if item is not None and not self.manter_expirados: del self._dados[chave]
+                self.misses += 1
+                return padrao
+            self._dados.move_to_end(chave)
+            self.hits += 1
+            return item[0]
+
+    def get_expirado(self, chave, padrao=AUSENTE):
+        # valor guardado mesmo vencido, com a idade (s) desde que expirou (0 se ainda válido)
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is None: return padrao, None
+            return item[0], max(0.0, time.monotonic() - item[1])
+
+    def set(self, chave, valor, ttl=None):
+        expira = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._dados[chave] = (valor, expira)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.maxsize:
+                self._dados.popitem(last=False)
+                self.despejos += 1
+
+    def purge(self, chave=None):
+        with self._lock:
+            if chave is None:
+                removidas = len(self._dados)
+                self._dados.clear()
+                return removidas
+            return 1 if self._dados.pop(chave, None) is not None else 0
+
+    def purge_prefixo(self, prefixo):
+        with self._lock:
+            chaves = [c for c in self._dados if c.startswith(prefixo)]
+            for c in chaves: del self._dados[c]
+            return len(chaves)
+
+    def tamanho(self, medir):
+        # soma medir(chave, valor) sobre as entradas (ex. bytes ocupados)
+        with self._lock:
+            return sum(medir(c, item[0]) for c, item in self._dados.items())
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {'entradas': len(self._dados), 'maxsize': self.maxsize, 'ttl': self.ttl,
+                    'hits': self.hits, 'misses': self.misses, 'despejos': self.despejos,
+                    'hit_ratio': round(self.hits / total, 4) if total else None}
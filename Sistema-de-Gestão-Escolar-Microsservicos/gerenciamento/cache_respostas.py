@@ -0,0 +1,99 @@
+import json
+import os
+from functools import wraps
+from flask import Response, make_response, request
+from cache import AUSENTE, TTLCache
+import listagem
+import versoes
+
+# Cache de respostas dos GETs. A chave inclui a versão da tabela (versoes.py): uma escrita em qualquer
+# worker muda a versão e as entradas antigas deixam de ser encontradas, então o cache local vale com vários
+# workers. No cache local, _commit dos controllers também remove na hora as entradas da tabela alterada (libera memória).
+# RESPOSTA_CACHE: "local" (LRU em memória, padrão), "off" ou uma URL redis:// para um cache compartilhado.
+BACKEND = os.environ.get('RESPOSTA_CACHE', 'local')
+MAXSIZE = int(os.environ.get('RESPOSTA_CACHE_MAXSIZE', '10000'))
+TTL = float(os.environ.get('RESPOSTA_CACHE_TTL', '300'))
+
+class Local:
+    def __init__(self, maxsize, ttl):
+        self._cache = TTLCache(maxsize, ttl)
+    def get(self, chave):
+        valor = self._cache.get(chave)
+        return None if valor is AUSENTE else valor
+    def set(self, chave, valor):
+        self._cache.set(chave, valor)
+    def purge(self, prefixo=None):
+        return self._cache.purge() if prefixo is None else self._cache.purge_prefixo(prefixo)
+    def stats(self):
+        return {**self._cache.stats(), 'bytes': self._cache.tamanho(lambda c, v: len(c) + len(v[2]) + sum(len(k) + len(x) for k, x in v[1]))}
+
+class Redis:
+    # compartilhado entre workers e réplicas; qualquer servidor que fale o protocolo do Redis serve
+    # contadores no próprio Redis (INCR): o hit ratio é o de todos os workers e réplicas
+    HITS, MISSES = 'resp_stats:hits', 'resp_stats:misses'
+    def __init__(self, url, ttl):
+        import redis  # dependência opcional, só com RESPOSTA_CACHE=redis://...
+        self._r = redis.Redis.from_url(url)
+        self.ttl = ttl
+    def get(self, chave):
+        bruto = self._r.get('resp:' + chave)
+        if bruto is None:
+            self._r.incr(self.MISSES)
+            return None
+        self._r.incr(self.HITS)
+        cabecalho, corpo = bruto.split(b'\n', 1)
+        status, headers = json.loads(cabecalho)
+        return status, headers, corpo
+    def set(self, chave, valor):
+        status, headers, corpo = valor
+        self._r.set('resp:' + chave, json.dumps([status, headers]).encode() + b'\n' + corpo, ex=int(self.ttl))
+    def purge(self, prefixo=None):
+        chaves = list(self._r.scan_iter(match='resp:' + (prefixo or '') + '*'))
+        return self._r.delete(*chaves) if chaves else 0
+    def stats(self):
+        hits, misses = (int(v or 0) for v in self._r.mget(self.HITS, self.MISSES))
+        total = hits + misses
+        return {'entradas': sum(1 for _ in self._r.scan_iter(match='resp:*')), 'hits': hits, 'misses': misses,
+                'hit_ratio': round(hits / total, 4) if total else None,
+                'bytes': self._r.info('memory').get('used_memory')}
+
+def _criar_backend():
+    if BACKEND == 'off': return None
+    if BACKEND.startswith(('redis://', 'rediss://', 'unix://')): return Redis(BACKEND, TTL)
+    return Local(MAXSIZE, TTL)
+
+backend = _criar_backend()
+
+def invalidar(*tabelas):
+    if backend is None: return 0
+    return sum(backend.purge(f'{t}|') for t in tabelas)
+
+def apos_commit(*tabelas):
+    # a versão na chave já esconde as entradas antigas: o LRU local ainda as remove para liberar memória,
+    # no Redis elas expiram pelo TTL, sem um SCAN no keyspace compartilhado a cada escrita.
+    # `tabelas` inclui as dependentes alteradas na mesma transação (remover um professor muda turma.professor_id,
+    # remover uma turma muda aluno.turma_id): o _commit do controller as passa junto
+    if isinstance(backend, Local): invalidar(*tabelas)
+
+def cacheada(tabela):
+    # guarda status, headers e corpo das respostas 200 em JSON; NDJSON em stream não passa pelo cache
+    def decorador(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if backend is None or listagem.quer_stream(request): return view(*args, **kwargs)
+            etag, _ = versoes.marca((tabela,))
+            chave = f"{tabela}|{etag}|{request.path}?{'&'.join(sorted(request.query_string.decode().split('&')))}"
+            valor = backend.get(chave)
+            if valor is None:
+                resp = make_response(view(*args, **kwargs))
+                if resp.status_code != 200: return resp
+                valor = (resp.status_code, [(k, v) for k, v in resp.headers.items() if k != 'Content-Length'], resp.get_data())
+                backend.set(chave, valor)
+            status, headers, corpo = valor
+            return Response(corpo, status=status, headers=headers)
+        return wrapper
+    return decorador
+
+def stats():
+    if backend is None: return {'backend': 'off'}
+    return {'backend': type(backend).__name__.lower(), **backend.stats()}
@@ -1,41 +1,96 @@
 from models.models import Aluno, Professor, Turma
 from database import db
+import listagem
+import versoes
+import cache_respostas
+import outbox
 
-def _commit():
+MAX_ITENS_LOTE = 5000
+
+def _commit(*tabelas):
+    # a versão das tabelas alteradas sobe na mesma transação (ETag dos GETs, ver versoes.py),
+    # assim como as linhas do outbox registradas antes (ver _mudou)
+    versoes.incrementar(*tabelas)
     db.session.commit()
+    cache_respostas.apos_commit(*tabelas)
+    outbox.notificar()
+def _mudou(registro, operacao):
+    if operacao == outbox.CRIADO: db.session.flush()
+    outbox.registrar(registro.__tablename__, operacao, registro.id)
+def _desvincular(coluna, valor):
+    # remoção de professor/turma: a chave estrangeira dos dependentes vira NULL aqui, e não pelo backref do
+    # ORM, para saber quais linhas mudaram e lançá-las no outbox; a versão da tabela delas sobe no _commit
+    tabela = coluna.table
+    ids = db.session.execute(db.update(tabela).where(coluna == valor).values({coluna.key: None})
+                             .returning(tabela.c.id)).scalars().all()
+    outbox.registrar(tabela.name, outbox.ATUALIZADO, *ids)
 # Alunos
-def listar_alunos():
-    return Aluno.query.all()
+def listar_alunos(**params):
+    return listagem.listar(Aluno, **params)
+def stream_alunos(**params):
+    return listagem.stream(Aluno, **params)
 def get_aluno_by_id(aid):
-    return Aluno.query.get(aid)
+    return listagem.obter(Aluno, aid)
 def criar_aluno(data):
     a = Aluno(nome=data.get('nome'), idade=data.get('idade'), turma_id=data.get('turma_id'))
     db.session.add(a)
-    _commit()
+    _mudou(a, outbox.CRIADO)
+    _commit('aluno')
     return a
+def _inteiro_ou_nulo(valor):
+    return valor is None or (isinstance(valor, int) and not isinstance(valor, bool))
+def criar_alunos_lote(itens):
+    # valida tudo numa passada, insere os válidos com um único executemany e devolve o resultado por linha
+    turmas = {i.get('turma_id') for i in itens if isinstance(i, dict) and isinstance(i.get('turma_id'), int)}
+    turmas_inexistentes = set(ids_inexistentes(Turma, turmas))
+    resultados = [None] * len(itens)
+    validos = []
+    for indice, item in enumerate(itens):
+        if not isinstance(item, dict): erro = 'item deve ser um objeto'
+        elif not item.get('nome'): erro = 'nome obrigatório'
+        elif not _inteiro_ou_nulo(item.get('idade')) or not _inteiro_ou_nulo(item.get('turma_id')): erro = 'idade e turma_id devem ser inteiros'
+        elif item.get('turma_id') in turmas_inexistentes: erro = 'Turma inexistente'
+        else: erro = None
+        if erro:
+            resultados[indice] = {'indice': indice, 'status': 400, 'error': erro}
+        else:
+            validos.append((indice, {'nome': item['nome'], 'idade': item.get('idade'), 'turma_id': item.get('turma_id')}))
+    if validos:
+        stmt = db.insert(Aluno).returning(Aluno.id, sort_by_parameter_order=True)
+        ids = db.session.execute(stmt, [linha for _, linha in validos]).scalars().all()
+        outbox.registrar('aluno', outbox.CRIADO, *ids)
+        _commit('aluno')
+        for (indice, _), aid in zip(validos, ids):
+            resultados[indice] = {'indice': indice, 'status': 201, 'id': aid}
+    return resultados
 def atualizar_aluno(aid, data):
     a = Aluno.query.get(aid)
     if not a: return None
     a.nome = data.get('nome', a.nome)
     a.idade = data.get('idade', a.idade)
     a.turma_id = data.get('turma_id', a.turma_id)
-    _commit()
+    _mudou(a, outbox.ATUALIZADO)
+    _commit('aluno')
     return a
 def deletar_aluno(aid):
     a = Aluno.query.get(aid)
     if not a: return False
     db.session.delete(a)
-    _commit()
+    _mudou(a, outbox.REMOVIDO)
+    _commit('aluno')
     return True
 # Professores
-def listar_professores():
-    return Professor.query.all()
+def listar_professores(**params):
+    return listagem.listar(Professor, **params)
+def stream_professores(**params):
+    return listagem.stream(Professor, **params)
 def get_professor_by_id(pid):
-    return Professor.query.get(pid)
+    return listagem.obter(Professor, pid)
 def criar_professor(data):
     p = Professor(nome=data.get('nome'), idade=data.get('idade'), materia=data.get('materia'))
     db.session.add(p)
-    _commit()
+    _mudou(p, outbox.CRIADO)
+    _commit('professor')
     return p
 def atualizar_professor(pid, data):
     p = Professor.query.get(pid)
@@ -43,23 +98,29 @@ def atualizar_professor(pid, data):
     p.nome = data.get('nome', p.nome)
     p.idade = data.get('idade', p.idade)
     p.materia = data.get('materia', p.materia)
-    _commit()
+    _mudou(p, outbox.ATUALIZADO)
+    _commit('professor')
     return p
 def deletar_professor(pid):
     p = Professor.query.get(pid)
     if not p: return False
+    _desvincular(Turma.__table__.c.professor_id, pid)
     db.session.delete(p)
-    _commit()
+    _mudou(p, outbox.REMOVIDO)
+    _commit('professor', 'turma')
     return True
 # Turmas
-def listar_turmas():
-    return Turma.query.all()
+def listar_turmas(**params):
+    return listagem.listar(Turma, **params)
+def stream_turmas(**params):
+    return listagem.stream(Turma, **params)
 def get_turma_by_id(tid):
-    return Turma.query.get(tid)
+    return listagem.obter(Turma, tid)
 def criar_turma(data):
     t = Turma(descricao=data.get('descricao'), professor_id=data.get('professor_id'), ativo=data.get('ativo', True))
     db.session.add(t)
-    _commit()
+    _mudou(t, outbox.CRIADO)
+    _commit('turma')
     return t
 def atualizar_turma(tid, data):
     t = Turma.query.get(tid)
@@ -67,11 +128,40 @@ def atualizar_turma(tid, data):
     t.descricao = data.get('descricao', t.descricao)
     t.professor_id = data.get('professor_id', t.professor_id)
     t.ativo = data.get('ativo', t.ativo)
-    _commit()
+    _mudou(t, outbox.ATUALIZADO)
+    _commit('turma')
     return t
 def deletar_turma(tid):
     t = Turma.query.get(tid)
     if not t: return False
+    _desvincular(Aluno.__table__.c.turma_id, tid)
     db.session.delete(t)
-    _commit()
+    _mudou(t, outbox.REMOVIDO)
+    _commit('turma', 'aluno')
     return True
+# Exportação
+def exportar_alunos(turma_id=None):
+    # consulta do GET /export/alunos.csv (lista de chamada): aluno com turma e professor; a ordem (turma_id, id)
+    # segue o índice de turma_id do aluno, sem ordenar em memória
+    stmt = (db.select(Aluno.turma_id, Turma.descricao.label('turma'), Turma.professor_id, Professor.nome.label('professor'),
+                      Aluno.id.label('aluno_id'), Aluno.nome, Aluno.idade)
+            .outerjoin(Turma, Turma.id == Aluno.turma_id).outerjoin(Professor, Professor.id == Turma.professor_id)
+            .order_by(Aluno.turma_id, Aluno.id))
+    if turma_id is not None: stmt = stmt.where(Aluno.turma_id == turma_id)
+    return stmt
+# Feed de mudanças
+def mudancas(since, limit, espera=0):
+    lista = outbox.aguardar(since, limit, espera) if espera else outbox.listar(since, limit)
+    return lista, outbox.ultimo_seq()
+# Validação em lote
+MAX_IDS_VALIDACAO = 10000
+def ids_inexistentes(model, ids):
+    ids = set(ids)
+    if not ids: return []
+    encontrados = {row[0] for row in db.session.query(model.id).filter(model.id.in_(ids))}
+    return sorted(ids - encontrados)
+def validar_ids(turmas=None, professores=None, alunos=None):
+    result = {}
+    for nome, model, ids in (('turmas', Turma, turmas), ('professores', Professor, professores), ('alunos', Aluno, alunos)):
+        if ids is not None: result[nome] = ids_inexistentes(model, ids)
+    return result
@@ -1,8 +1,63 @@
+import os
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect
+from sqlalchemy.schema import CreateColumn, CreateIndex
+from sqlalchemy.exc import OperationalError
 db = SQLAlchemy()
+
+# Perfil do SQLite: "producao" aplica os PRAGMAs abaixo em toda conexão nova; "padrao" mantém os defaults
+DB_PROFILE = os.environ.get('DB_PROFILE', 'producao')
+PRAGMAS = {
+    'journal_mode': os.environ.get('DB_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.environ.get('DB_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': os.environ.get('DB_BUSY_TIMEOUT_MS', '5000'),
+    'mmap_size': os.environ.get('DB_MMAP_SIZE', str(256 * 1024 * 1024)),
+    'cache_size': os.environ.get('DB_CACHE_SIZE', '-16000'),
+    'temp_store': os.environ.get('DB_TEMP_STORE', 'MEMORY'),
+}
+ENGINE_OPTIONS = {
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', '5')),
+    'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', '10')),
+    'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
+}
+
+def aplicar_pragmas(dbapi_conn, _registro=None):
+    cursor = dbapi_conn.cursor()
+    for nome, valor in PRAGMAS.items():
+        cursor.execute(f"PRAGMA {nome}={valor}")
+    cursor.close()
+
+def _adicionar_colunas(conn, tabela):
+    existentes = {c['name'] for c in inspect(conn).get_columns(tabela.name)}
+    for coluna in tabela.columns:
+        if coluna.name in existentes: continue
+        ddl = CreateColumn(coluna).compile(dialect=conn.dialect)
+        try:
+            conn.exec_driver_sql(f"ALTER TABLE {tabela.name} ADD COLUMN {ddl}")
+        except OperationalError as e:
+            # outro worker adicionou a coluna primeiro
+            if 'duplicate column' not in str(e): raise
+
+def atualizar_schema():
+    # create_all só cria tabelas novas; colunas (anuláveis) e índices declarados depois são adicionados aqui aos bancos existentes
+    with db.engine.begin() as conn:
+        for tabela in db.metadata.sorted_tables:
+            _adicionar_colunas(conn, tabela)
+            for indice in tabela.indexes:
+                conn.execute(CreateIndex(indice, if_not_exists=True))
+
 def init_db(app, sqlite_file):
     app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{sqlite_file}"
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if DB_PROFILE == 'producao':
+        app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', ENGINE_OPTIONS)
     db.init_app(app)
     with app.app_context():
-        db.create_all()
+        if DB_PROFILE == 'producao':
+            event.listen(db.engine, 'connect', aplicar_pragmas)
+        try:
+            db.create_all()
+        except OperationalError:
+            # outro worker do gunicorn criou as tabelas ao mesmo tempo
+            db.create_all()
+        atualizar_schema()
@@ -0,0 +1,96 @@
+from flask import Response, current_app, jsonify, stream_with_context
+from database import db
+
+# Listagens paginadas por chave (?after_id=&limit=), com filtros por coluna e projeção (?fields=)
+LIMITE_MAXIMO = 1000
+LOTE_STREAM = 1000
+NDJSON = 'application/x-ndjson'
+
+class ParametroInvalido(ValueError):
+    pass
+
+def _inteiro(args, nome):
+    valor = args.get(nome)
+    if valor in (None, ''): return None
+    try:
+        return int(valor)
+    except ValueError:
+        raise ParametroInvalido(f'{nome} deve ser inteiro')
+
+def parametros(args, filtros=None):
+    after_id = _inteiro(args, 'after_id')
+    limit = _inteiro(args, 'limit')
+    if limit is not None:
+        if limit < 1: raise ParametroInvalido('limit deve ser maior que zero')
+        limit = min(limit, LIMITE_MAXIMO)
+    valores = {}
+    for nome, tipo in (filtros or {}).items():
+        if args.get(nome) in (None, ''): continue
+        valores[nome] = _inteiro(args, nome) if tipo is int else args.get(nome)
+    fields = [f.strip() for f in args.get('fields', '').split(',') if f.strip()] or None
+    return {'after_id': after_id, 'limit': limit, 'filtros': valores, 'fields': fields}
+
+def consulta(model, after_id=None, limit=None, filtros=None, fields=None):
+    colunas = model.__table__.columns
+    if fields:
+        invalidos = [f for f in fields if f not in colunas]
+        if invalidos: raise ParametroInvalido(f"campos inexistentes: {', '.join(invalidos)}")
+        # o id entra sempre: é a chave do cursor
+        selecionadas = [colunas.id] + [colunas[f] for f in fields if f != 'id']
+    else:
+        selecionadas = list(colunas)
+    stmt = db.select(*selecionadas).order_by(colunas.id)
+    if after_id is not None: stmt = stmt.where(colunas.id > after_id)
+    for nome, valor in (filtros or {}).items():
+        stmt = stmt.where(colunas[nome] == valor)
+    if limit: stmt = stmt.limit(limit)
+    return stmt
+
+def _sem_id(fields):
+    return bool(fields) and 'id' not in fields
+
+def _dicts(resultado):
+    # tuplas do Core direto para dicts, sem instâncias do ORM nem identity map
+    chaves = list(resultado.keys())
+    return [dict(zip(chaves, row)) for row in resultado]
+
+def obter(model, rid):
+    linhas = _dicts(db.session.execute(consulta(model).where(model.__table__.columns.id == rid)))
+    return linhas[0] if linhas else None
+
+def listar(model, after_id=None, limit=None, filtros=None, fields=None):
+    stmt = consulta(model, after_id, limit, filtros, fields)
+    linhas = _dicts(db.session.execute(stmt))
+    proximo = linhas[-1]['id'] if limit and len(linhas) == limit else None
+    if _sem_id(fields):
+        for linha in linhas: del linha['id']
+    return linhas, proximo
+
+def stream(model, after_id=None, limit=None, filtros=None, fields=None):
+    # monta a consulta já (erros de parâmetro viram 400) e devolve um gerador de blocos NDJSON
+    stmt = consulta(model, after_id, limit, filtros, fields).execution_options(yield_per=LOTE_STREAM)
+    sem_id = _sem_id(fields)
+    def gerar():
+        dumps = current_app.json.dumps
+        resultado = db.session.execute(stmt)
+        chaves = list(resultado.keys())
+        for lote in resultado.partitions():
+            bloco = []
+            for row in lote:
+                linha = dict(zip(chaves, row))
+                if sem_id: del linha['id']
+                bloco.append(dumps(linha))
+            yield '\n'.join(bloco) + '\n'
+    return gerar()
+
+def quer_stream(req):
+    if req.args.get('stream') in ('1', 'true'): return True
+    return req.accept_mimetypes.best_match(['application/json', NDJSON]) == NDJSON
+
+def resposta(linhas, proximo):
+    resp = jsonify(linhas)
+    if proximo is not None: resp.headers['X-Next-After-Id'] = str(proximo)
+    return resp
+
+def resposta_stream(gerador):
+    return Response(stream_with_context(gerador), mimetype=NDJSON)
@@ -0,0 +1,219 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from database import db
+
+# Métricas no formato texto do Prometheus em GET /metrics. Cada worker do gunicorn acumula as suas em memória e
+# grava um arquivo <pid do master>-<pid>.json em METRICAS_DIR (padrão: <tmp>/metricas-<serviço>) a cada
+# METRICAS_INTERVALO segundos; o /metrics de qualquer worker soma os arquivos dos workers do mesmo master
+# (os de masters que já morreram são apagados).
+DIR = os.environ.get('METRICAS_DIR')
+INTERVALO = float(os.environ.get('METRICAS_INTERVALO', '1'))
+
+BUCKETS = {
+    'http_requisicao_segundos': (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10),
+    'db_consultas_por_requisicao': (0, 1, 2, 5, 10, 20, 50, 100, 500),
+    'db_segundos_por_requisicao': (.001, .005, .01, .025, .05, .1, .25, .5, 1, 5),
+    'gerenciamento_requisicao_segundos': (.005, .01, .025, .05, .1, .25, .5, 1, 3, 5),
+}
+AJUDA = {
+    'http_requisicao_segundos': ('histogram', 'Latência das requisições por rota, método e status'),
+    'db_consultas_por_requisicao': ('histogram', 'Comandos SQL executados por requisição'),
+    'db_segundos_por_requisicao': ('histogram', 'Tempo gasto no SQLite por requisição'),
+    'db_consultas_total': ('counter', 'Comandos SQL executados'),
+    'db_segundos_total': ('counter', 'Tempo total gasto em comandos SQL'),
+    'gerenciamento_requisicao_segundos': ('histogram', 'Latência das chamadas ao serviço de Gerenciamento (GER_URL)'),
+    'gerenciamento_erros_total': ('counter', 'Chamadas ao Gerenciamento que falharam (conexão, timeout ou status 5xx)'),
+    'gerenciamento_rejeitadas_total': ('counter', 'Chamadas ao Gerenciamento recusadas pelo circuito aberto'),
+    'gerenciamento_degradadas_total': ('counter', 'Validações respondidas com o último valor conhecido (GER_POLITICA_DEGRADADA=cache)'),
+    'replica_mudancas_total': ('counter', 'Mudanças do feed do Gerenciamento aplicadas na réplica local'),
+}
+
+_lock = threading.Lock()
+_contadores = {}
+_histogramas = {}
+_estado = {'pid': None, 'alterado': False}
+_servico = 'app'
+
+def _dir():
+    return DIR or os.path.join(tempfile.gettempdir(), f'metricas-{_servico}')
+
+def _rotulos(**rotulos):
+    return tuple(sorted(rotulos.items()))
+
+def contar(nome, valor=1, **rotulos):
+    chave = (nome, _rotulos(**rotulos))
+    with _lock:
+        _contadores[chave] = _contadores.get(chave, 0) + valor
+        _estado['alterado'] = True
+    _iniciar_gravacao()
+
+def observar(nome, valor, **rotulos):
+    chave = (nome, _rotulos(**rotulos))
+    limites = BUCKETS[nome]
+    with _lock:
+        h = _histogramas.get(chave)
+        if h is None: h = _histogramas[chave] = [[0] * len(limites), 0.0, 0]
+        for i, limite in enumerate(limites):
+            if valor <= limite:
+                h[0][i] += 1
+                break
+        h[1] += valor
+        h[2] += 1
+        _estado['alterado'] = True
+    _iniciar_gravacao()
+
+def observar_upstream(metodo, path, segundos, status=None):
+    # ids viram <id> para não criar uma série por recurso
+    rota = re.sub(r'/\d+', '/<id>', path)
+    resultado = 'erro' if status is None else str(status)
+    observar('gerenciamento_requisicao_segundos', segundos, metodo=metodo, rota=rota, status=resultado)
+    if status is None or status >= 500: contar('gerenciamento_erros_total', metodo=metodo, rota=rota)
+
+# Gravação por worker
+def _arquivo(master, pid):
+    return os.path.join(_dir(), f'{master}-{pid}.json')
+
+def _vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _iniciar_gravacao():
+    # depois do fork: cada worker tem sua thread de gravação e apaga arquivos de execuções anteriores
+    pid = os.getpid()
+    if _estado['pid'] == pid: return
+    with _lock:
+        if _estado['pid'] == pid: return
+        _estado['pid'] = pid
+    os.makedirs(_dir(), exist_ok=True)
+    for nome in os.listdir(_dir()):
+        master = nome.split('-', 1)[0]
+        if nome.endswith('.json') and master.isdigit() and int(master) != os.getppid() and not _vivo(int(master)):
+            try:
+                os.remove(os.path.join(_dir(), nome))
+            except FileNotFoundError:
+                pass
+    threading.Thread(target=_gravar_periodicamente, name='metricas', daemon=True).start()
+
+def _instantaneo(gravando=False):
+    with _lock:
+        if gravando: _estado['alterado'] = False
+        return {'c': [[n, r, v] for (n, r), v in _contadores.items()],
+                'h': [[n, r, h[0][:], h[1], h[2]] for (n, r), h in _histogramas.items()]}
+
+def _gravar():
+    dados = _instantaneo(gravando=True)
+    destino = _arquivo(os.getppid(), os.getpid())
+    temporario = destino + '.tmp'
+    with open(temporario, 'w') as f:
+        json.dump(dados, f)
+    os.replace(temporario, destino)
+
+def _gravar_periodicamente():
+    while True:
+        time.sleep(INTERVALO)
+        if _estado['alterado']:
+            try:
+                _gravar()
+            except OSError:
+                pass
+
+# Agregação e exposição
+def _somar(total, dados):
+    for nome, rotulos, valor in dados['c']:
+        chave = (nome, tuple(map(tuple, rotulos)))
+        total['c'][chave] = total['c'].get(chave, 0) + valor
+    for nome, rotulos, contagens, soma, quantidade in dados['h']:
+        chave = (nome, tuple(map(tuple, rotulos)))
+        h = total['h'].setdefault(chave, [[0] * len(contagens), 0.0, 0])
+        h[0] = [a + b for a, b in zip(h[0], contagens)]
+        h[1] += soma
+        h[2] += quantidade
+
+def agregar():
+    total = {'c': {}, 'h': {}}
+    _somar(total, _instantaneo())
+    proprio = os.path.basename(_arquivo(os.getppid(), os.getpid()))
+    prefixo = f'{os.getppid()}-'
+    if os.path.isdir(_dir()):
+        for nome in os.listdir(_dir()):
+            if not nome.startswith(prefixo) or not nome.endswith('.json') or nome == proprio: continue
+            try:
+                with open(os.path.join(_dir(), nome)) as f:
+                    _somar(total, json.load(f))
+            except (OSError, ValueError):
+                continue
+    return total
+
+def _formatar_rotulos(rotulos, **extra):
+    pares = list(rotulos) + sorted(extra.items())
+    if not pares: return ''
+    escapar = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{escapar(v)}"' for k, v in pares) + '}'
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+def texto():
+    total = agregar()
+    series = {}
+    for (nome, rotulos), valor in sorted(total['c'].items()):
+        series.setdefault(nome, []).append(f'{nome}{_formatar_rotulos(rotulos, servico=_servico)} {_numero(valor)}')
+    for (nome, rotulos), (contagens, soma, quantidade) in sorted(total['h'].items()):
+        linhas = series.setdefault(nome, [])
+        acumulado = 0
+        for limite, contagem in zip(BUCKETS[nome], contagens):
+            acumulado += contagem
+            linhas.append(f'{nome}_bucket{_formatar_rotulos(rotulos, servico=_servico, le=_numero(float(limite)))} {acumulado}')
+        linhas.append(f'{nome}_bucket{_formatar_rotulos(rotulos, servico=_servico, le="+Inf")} {quantidade}')
+        linhas.append(f'{nome}_sum{_formatar_rotulos(rotulos, servico=_servico)} {_numero(soma)}')
+        linhas.append(f'{nome}_count{_formatar_rotulos(rotulos, servico=_servico)} {quantidade}')
+    saida = []
+    for nome in sorted(series):
+        tipo, ajuda = AJUDA.get(nome, ('untyped', nome))
+        saida += [f'# HELP {nome} {ajuda}', f'# TYPE {nome} {tipo}'] + series[nome]
+    return '\n'.join(saida) + '\n'
+
+# Instalação no app
+def _antes_do_sql(conn, cursor, statement, parameters, context, executemany):
+    conn.info['metricas_inicio'] = time.perf_counter()
+
+def _depois_do_sql(conn, cursor, statement, parameters, context, executemany):
+    segundos = time.perf_counter() - conn.info.pop('metricas_inicio', time.perf_counter())
+    contar('db_consultas_total')
+    contar('db_segundos_total', segundos)
+    if has_request_context():
+        g.metricas_sql = getattr(g, 'metricas_sql', 0) + 1
+        g.metricas_sql_segundos = getattr(g, 'metricas_sql_segundos', 0.0) + segundos
+
+def _inicio_requisicao():
+    g.metricas_inicio = time.perf_counter()
+
+def _fim_requisicao(resp):
+    inicio = g.pop('metricas_inicio', None)
+    if inicio is None: return resp
+    rota = request.url_rule.rule if request.url_rule else 'desconhecida'
+    observar('http_requisicao_segundos', time.perf_counter() - inicio, rota=rota, metodo=request.method, status=str(resp.status_code))
+    observar('db_consultas_por_requisicao', getattr(g, 'metricas_sql', 0), rota=rota)
+    observar('db_segundos_por_requisicao', getattr(g, 'metricas_sql_segundos', 0.0), rota=rota)
+    return resp
+
+def instalar(app, servico):
+    global _servico
+    _servico = servico
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _antes_do_sql)
+        event.listen(db.engine, 'after_cursor_execute', _depois_do_sql)
+    app.before_request(_inicio_requisicao)
+    app.after_request(_fim_requisicao)
+    app.add_url_rule('/metrics', 'metrics', lambda: Response(texto(), mimetype='text/plain; version=0.0.4'))
@@ -13,7 +13,7 @@ class Turma(db.Model):
     __tablename__ = 'turma'
     id = db.Column(db.Integer, primary_key=True)
     descricao = db.Column(db.String(120))
-    professor_id = db.Column(db.Integer, db.ForeignKey('professor.id'), nullable=True)
+    professor_id = db.Column(db.Integer, db.ForeignKey('professor.id'), nullable=True, index=True)
     ativo = db.Column(db.Boolean, default=True)
     alunos = db.relationship('Aluno', backref='turma', lazy=True)
     def to_dict(self):
@@ -24,6 +24,6 @@ class Aluno(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(120), nullable=False)
     idade = db.Column(db.Integer)
-    turma_id = db.Column(db.Integer, db.ForeignKey('turma.id'), nullable=True)
+    turma_id = db.Column(db.Integer, db.ForeignKey('turma.id'), nullable=True, index=True)
     def to_dict(self):
         return {"id":self.id, "nome":self.nome, "idade":self.idade, "turma_id":self.turma_id}
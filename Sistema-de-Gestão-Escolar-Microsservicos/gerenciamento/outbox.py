@@ -0,0 +1,70 @@
+import os
+import threading
+import time
+from database import db
+
+# Outbox: cada criação/alteração/remoção de turma, professor e aluno vira uma linha, gravada na mesma transação
+# da escrita (ver _commit do controller), com seq crescente. GET /changes?since=<seq> devolve as linhas
+# seguintes; com ?wait=<s> e nada novo, a requisição espera (long-poll) até chegar mudança ou o prazo acabar.
+# O SQLite serializa as transações de escrita, então a ordem de seq é a ordem de commit: um consumidor que
+# guarda o último seq lido não pula mudanças. Os serviços dependentes consomem o feed para manter a réplica
+# local de ids (ver replica.py deles).
+ESPERA_MAXIMA = float(os.environ.get('OUTBOX_ESPERA_MAX_S', '25'))
+INTERVALO = float(os.environ.get('OUTBOX_INTERVALO', '0.5'))
+LIMITE_MAXIMO = 1000
+CRIADO, ATUALIZADO, REMOVIDO = 'criado', 'atualizado', 'removido'
+PREENCHER_SQL = db.text("""
+INSERT INTO mudanca (tabela, registro_id, operacao, em)
+SELECT tabela, id, 'criado', :agora FROM (
+    SELECT 'aluno' AS tabela, id FROM aluno
+    UNION ALL SELECT 'professor', id FROM professor
+    UNION ALL SELECT 'turma', id FROM turma
+)
+WHERE NOT EXISTS (SELECT 1 FROM mudanca)
+""")
+
+class Mudanca(db.Model):
+    __tablename__ = 'mudanca'
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    tabela = db.Column(db.String(20), nullable=False)
+    registro_id = db.Column(db.Integer, nullable=False)
+    operacao = db.Column(db.String(10), nullable=False)
+    em = db.Column(db.Float, nullable=False)
+    __table_args__ = {'sqlite_autoincrement': True}
+
+# acorda os long-polls deste worker logo após um commit; os dos outros workers percebem em até INTERVALO
+_novidade = threading.Condition()
+
+def registrar(tabela, operacao, *ids):
+    if not ids: return
+    agora = time.time()
+    db.session.execute(db.insert(Mudanca), [{'tabela': tabela, 'registro_id': rid, 'operacao': operacao, 'em': agora} for rid in ids])
+
+def notificar():
+    with _novidade:
+        _novidade.notify_all()
+
+def ultimo_seq():
+    return db.session.scalar(db.select(db.func.max(Mudanca.seq))) or 0
+
+def listar(since, limit):
+    stmt = (db.select(Mudanca.seq, Mudanca.tabela, Mudanca.registro_id, Mudanca.operacao, Mudanca.em)
+            .where(Mudanca.seq > since).order_by(Mudanca.seq).limit(limit))
+    return [{'seq': r.seq, 'tabela': r.tabela, 'id': r.registro_id, 'operacao': r.operacao, 'em': r.em}
+            for r in db.session.execute(stmt)]
+
+def aguardar(since, limit, espera):
+    limite = time.monotonic() + min(espera, ESPERA_MAXIMA)
+    while True:
+        mudancas = listar(since, limit)
+        restante = limite - time.monotonic()
+        if mudancas or restante <= 0: return mudancas
+        # devolve a conexão ao pool enquanto espera
+        db.session.rollback()
+        with _novidade:
+            _novidade.wait(min(restante, INTERVALO))
+
+def preparar():
+    # bancos anteriores ao outbox: os registros existentes entram como 'criado', uma única vez
+    db.session.execute(PREENCHER_SQL, {'agora': time.time()})
+    db.session.commit()
@@ -0,0 +1,61 @@
+import logging
+import os
+import time
+from collections import Counter
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from database import db
+
+# Perfil de SQL por requisição (SQL_PERFIL=1, para depuração): conta os comandos de cada requisição e devolve
+# o total nos headers X-DB-Queries / X-DB-Time-Ms, registra com o plano os comandos mais lentos que SQL_LENTO_MS
+# e avisa quando o mesmo comando se repete SQL_N_MAIS_1 vezes ou mais numa requisição (provável N+1, ex. um
+# relacionamento lazy percorrido dentro de um loop).
+ATIVO = os.environ.get('SQL_PERFIL', '0') == '1'
+LENTO_MS = float(os.environ.get('SQL_LENTO_MS', '100'))
+N_MAIS_1 = int(os.environ.get('SQL_N_MAIS_1', '5'))
+
+logger = logging.getLogger('sql')
+
+def _plano(conn, statement, parameters):
+    # cursor próprio: o do comando ainda pode ter linhas a ler
+    cursor = conn.connection.cursor()
+    try:
+        return ' | '.join(row[-1] for row in cursor.execute(f'EXPLAIN QUERY PLAN {statement}', parameters or ())) or '-'
+    except Exception as e:
+        return f'(sem plano: {e})'
+    finally:
+        cursor.close()
+
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    conn.info['perfil_inicio'] = time.perf_counter()
+
+def _depois(conn, cursor, statement, parameters, context, executemany):
+    ms = (time.perf_counter() - conn.info.pop('perfil_inicio', time.perf_counter())) * 1000
+    if ms >= LENTO_MS:
+        plano = 'executemany' if executemany else _plano(conn, statement, parameters)
+        rota = f' [{request.method} {request.path}]' if has_request_context() else ''
+        logger.warning('SQL lento (%.1f ms)%s: %s | plano: %s', ms, rota, ' '.join(statement.split()), plano)
+    if has_request_context():
+        perfil = g.setdefault('perfil_sql', {'consultas': 0, 'ms': 0.0, 'comandos': Counter()})
+        perfil['consultas'] += 1
+        perfil['ms'] += ms
+        perfil['comandos'][statement] += 1
+
+def _fim_requisicao(resp):
+    perfil = g.pop('perfil_sql', None)
+    if perfil is None:
+        resp.headers['X-DB-Queries'] = '0'
+        return resp
+    resp.headers['X-DB-Queries'] = str(perfil['consultas'])
+    resp.headers['X-DB-Time-Ms'] = f"{perfil['ms']:.2f}"
+    for statement, vezes in perfil['comandos'].most_common():
+        if vezes < N_MAIS_1: break
+        logger.warning('Provável N+1 em %s %s: comando repetido %d vezes: %s', request.method, request.path, vezes, ' '.join(statement.split()))
+    return resp
+
+def instalar(app):
+    if not ATIVO: return
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _antes)
+        event.listen(db.engine, 'after_cursor_execute', _depois)
+    app.after_request(_fim_requisicao)
@@ -1,11 +1,20 @@
 from flask import Blueprint, request, jsonify
 from controllers import gerenciamento_controller as controller
+import listagem
+import versoes
+import cache_respostas
+import outbox
+import exportacao
 import os
 bp = Blueprint('gerenciamento', __name__)
 
 def json_error(message, code):
     return jsonify({'error': message}), code
 
+def resumo_lote(resultados):
+    criados = sum(1 for r in resultados if r['status'] == 201)
+    return {'criados': criados, 'rejeitados': len(resultados) - criados, 'resultados': resultados}
+
 @bp.route('/status', methods=['GET'])
 def status():
     """Status do serviço de Gerenciamento
@@ -16,11 +25,87 @@ def status():
     """
     return jsonify({'service':'gerenciamento','status':'ok'}), 200
 
+@bp.route('/cache/respostas', methods=['GET'])
+def cache_respostas_stats():
+    """Estatísticas do cache de respostas dos GETs
+    ---
+    responses:
+      200:
+        description: Contadores e memória ocupada pelo cache
+        schema:
+          type: object
+          properties:
+            backend:
+              type: string
+              example: local
+            entradas:
+              type: integer
+            hits:
+              type: integer
+            misses:
+              type: integer
+            hit_ratio:
+              type: number
+            bytes:
+              type: integer
+    """
+    return jsonify(cache_respostas.stats()), 200
+
+@bp.route('/cache/respostas', methods=['DELETE'])
+def purgar_cache_respostas():
+    """Remove entradas do cache de respostas
+    ---
+    parameters:
+      - name: tabela
+        in: query
+        type: string
+        enum: [aluno, professor, turma]
+        required: false
+        description: Remove só as respostas desta tabela (sem ela o cache inteiro é limpo)
+    responses:
+      200:
+        description: Quantidade de entradas removidas
+    """
+    tabela = request.args.get('tabela')
+    removidas = cache_respostas.invalidar(tabela) if tabela else (cache_respostas.backend.purge() if cache_respostas.backend else 0)
+    return jsonify({'removidas': removidas}), 200
+
 # Alunos CRUD
 @bp.route('/alunos', methods=['GET'])
+@versoes.condicional('aluno')
+@cache_respostas.cacheada('aluno')
 def listar_alunos_route():
     """Lista todos os alunos
     ---
+    parameters:
+      - name: after_id
+        in: query
+        type: integer
+        required: false
+        description: Retorna apenas registros com id maior que este (cursor da página anterior)
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Tamanho máximo da página (até 1000); havendo mais registros o cursor vem no header X-Next-After-Id
+      - name: turma_id
+        in: query
+        type: integer
+        required: false
+        description: Filtra pela turma
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: Lista de campos separados por vírgula a incluir na resposta (ex. id,nome)
+      - name: stream
+        in: query
+        type: boolean
+        required: false
+        description: Envia todos os registros como NDJSON em blocos (o mesmo que Accept application/x-ndjson)
+    produces:
+      - application/json
+      - application/x-ndjson
     responses:
       200:
         description: Lista de alunos
@@ -37,11 +122,21 @@ def listar_alunos_route():
                 type: integer
               turma_id:
                 type: integer
+      400:
+        description: Parâmetros de listagem inválidos
     """
-    result = [a.to_dict() for a in controller.listar_alunos()]
-    return jsonify(result), 200
+    try:
+        params = listagem.parametros(request.args, {'turma_id': int})
+        if listagem.quer_stream(request):
+            return listagem.resposta_stream(controller.stream_alunos(**params)), 200
+        linhas, proximo = controller.listar_alunos(**params)
+    except listagem.ParametroInvalido as e:
+        return json_error(str(e), 400)
+    return listagem.resposta(linhas, proximo), 200
 
 @bp.route('/alunos/<int:aid>', methods=['GET'])
+@versoes.condicional('aluno')
+@cache_respostas.cacheada('aluno')
 def get_aluno_route(aid):
     """Obter um aluno específico pelo ID
     ---
@@ -70,7 +165,7 @@ def get_aluno_route(aid):
     """
     a = controller.get_aluno_by_id(aid)
     if not a: return json_error('Aluno não encontrado', 404)
-    return jsonify(a.to_dict()), 200
+    return jsonify(a), 200
 
 @bp.route('/alunos', methods=['POST'])
 def criar_aluno_route():
@@ -111,6 +206,58 @@ def criar_aluno_route():
     a = controller.criar_aluno(data)
     return jsonify(a.to_dict()), 201
 
+@bp.route('/alunos/bulk', methods=['POST'])
+def criar_alunos_lote_route():
+    """Criar vários alunos numa única transação
+    ---
+    parameters:
+      - in: body
+        name: body
+        schema:
+          type: array
+          maxItems: 5000
+          items:
+            type: object
+            required:
+              - nome
+            properties:
+              nome:
+                type: string
+              idade:
+                type: integer
+              turma_id:
+                type: integer
+    responses:
+      200:
+        description: Resultado por item (status 201 com o id criado ou 400 com o erro)
+        schema:
+          type: object
+          properties:
+            criados:
+              type: integer
+            rejeitados:
+              type: integer
+            resultados:
+              type: array
+              items:
+                type: object
+                properties:
+                  indice:
+                    type: integer
+                  status:
+                    type: integer
+                  id:
+                    type: integer
+                  error:
+                    type: string
+      400:
+        description: Corpo não é uma lista ou excede o tamanho máximo
+    """
+    itens = request.get_json(silent=True)
+    if not isinstance(itens, list) or not itens: return json_error('envie uma lista não vazia', 400)
+    if len(itens) > controller.MAX_ITENS_LOTE: return json_error(f'máximo de {controller.MAX_ITENS_LOTE} itens por lote', 400)
+    return jsonify(resumo_lote(controller.criar_alunos_lote(itens))), 200
+
 @bp.route('/alunos/<int:aid>', methods=['PUT'])
 def atualizar_aluno_route(aid):
     """Atualizar um aluno existente
@@ -176,9 +323,40 @@ def deletar_aluno_route(aid):
 
 # Professores CRUD
 @bp.route('/professores', methods=['GET'])
+@versoes.condicional('professor')
+@cache_respostas.cacheada('professor')
 def listar_professores_route():
     """Lista todos os professores
     ---
+    parameters:
+      - name: after_id
+        in: query
+        type: integer
+        required: false
+        description: Retorna apenas registros com id maior que este (cursor da página anterior)
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Tamanho máximo da página (até 1000); havendo mais registros o cursor vem no header X-Next-After-Id
+      - name: materia
+        in: query
+        type: string
+        required: false
+        description: Filtra pela matéria
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: Lista de campos separados por vírgula a incluir na resposta (ex. id,nome)
+      - name: stream
+        in: query
+        type: boolean
+        required: false
+        description: Envia todos os registros como NDJSON em blocos (o mesmo que Accept application/x-ndjson)
+    produces:
+      - application/json
+      - application/x-ndjson
     responses:
       200:
         description: Lista de professores
@@ -195,11 +373,21 @@ def listar_professores_route():
                 type: integer
               materia:
                 type: string
+      400:
+        description: Parâmetros de listagem inválidos
     """
-    result = [p.to_dict() for p in controller.listar_professores()]
-    return jsonify(result), 200
+    try:
+        params = listagem.parametros(request.args, {'materia': str})
+        if listagem.quer_stream(request):
+            return listagem.resposta_stream(controller.stream_professores(**params)), 200
+        linhas, proximo = controller.listar_professores(**params)
+    except listagem.ParametroInvalido as e:
+        return json_error(str(e), 400)
+    return listagem.resposta(linhas, proximo), 200
 
 @bp.route('/professores/<int:pid>', methods=['GET'])
+@versoes.condicional('professor')
+@cache_respostas.cacheada('professor')
 def get_professor_route(pid):
     """Obter um professor específico pelo ID
     ---
@@ -228,7 +416,7 @@ def get_professor_route(pid):
     """
     p = controller.get_professor_by_id(pid)
     if not p: return json_error('Professor não encontrado', 404)
-    return jsonify(p.to_dict()), 200
+    return jsonify(p), 200
 
 @bp.route('/professores', methods=['POST'])
 def criar_professor_route():
@@ -334,9 +522,40 @@ def deletar_professor_route(pid):
 
 # Turmas CRUD
 @bp.route('/turmas', methods=['GET'])
+@versoes.condicional('turma')
+@cache_respostas.cacheada('turma')
 def listar_turmas_route():
     """Lista todas as turmas
     ---
+    parameters:
+      - name: after_id
+        in: query
+        type: integer
+        required: false
+        description: Retorna apenas registros com id maior que este (cursor da página anterior)
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Tamanho máximo da página (até 1000); havendo mais registros o cursor vem no header X-Next-After-Id
+      - name: professor_id
+        in: query
+        type: integer
+        required: false
+        description: Filtra pelo professor
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: Lista de campos separados por vírgula a incluir na resposta (ex. id,nome)
+      - name: stream
+        in: query
+        type: boolean
+        required: false
+        description: Envia todos os registros como NDJSON em blocos (o mesmo que Accept application/x-ndjson)
+    produces:
+      - application/json
+      - application/x-ndjson
     responses:
       200:
         description: Lista de turmas
@@ -353,11 +572,21 @@ def listar_turmas_route():
                 type: integer
               ativo:
                 type: boolean
+      400:
+        description: Parâmetros de listagem inválidos
     """
-    result = [t.to_dict() for t in controller.listar_turmas()]
-    return jsonify(result), 200
+    try:
+        params = listagem.parametros(request.args, {'professor_id': int})
+        if listagem.quer_stream(request):
+            return listagem.resposta_stream(controller.stream_turmas(**params)), 200
+        linhas, proximo = controller.listar_turmas(**params)
+    except listagem.ParametroInvalido as e:
+        return json_error(str(e), 400)
+    return listagem.resposta(linhas, proximo), 200
 
 @bp.route('/turmas/<int:tid>', methods=['GET'])
+@versoes.condicional('turma')
+@cache_respostas.cacheada('turma')
 def get_turma_route(tid):
     """Obter uma turma específica pelo ID
     ---
@@ -386,7 +615,7 @@ def get_turma_route(tid):
     """
     t = controller.get_turma_by_id(tid)
     if not t: return json_error('Turma não encontrada', 404)
-    return jsonify(t.to_dict()), 200
+    return jsonify(t), 200
 
 @bp.route('/turmas', methods=['POST'])
 def criar_turma_route():
@@ -490,4 +719,158 @@ def deletar_turma_route(tid):
     """
     ok = controller.deletar_turma(tid)
     if not ok: return jsonify({'error':'Turma não encontrada'}), 404
-    return jsonify({}), 204
\ No newline at end of file
+    return jsonify({}), 204
+
+@bp.route('/export/alunos.csv', methods=['GET'])
+def exportar_alunos_route():
+    """Exporta a lista de chamada (alunos com turma e professor) em CSV, gerado linha a linha (chunked, gzip com Accept-Encoding gzip)
+    ---
+    parameters:
+      - name: turma_id
+        in: query
+        type: integer
+        required: false
+        description: Apenas os alunos desta turma
+      - name: separador
+        in: query
+        type: string
+        enum: [",", ";"]
+        required: false
+        description: Separador de campos
+      - name: gzip
+        in: query
+        type: string
+        enum: ["0"]
+        required: false
+        description: 0 desliga a compressão mesmo com Accept-Encoding gzip
+    produces:
+      - text/csv
+    responses:
+      200:
+        description: "CSV com as colunas turma_id, turma, professor_id, professor, aluno_id, nome, idade, ordenado por turma"
+      400:
+        description: Filtro ou separador inválido
+    """
+    try:
+        filtros = listagem.parametros(request.args, {'turma_id': int})['filtros']
+        return exportacao.resposta_csv('alunos.csv', controller.exportar_alunos(**filtros))
+    except listagem.ParametroInvalido as e:
+        return json_error(str(e), 400)
+
+@bp.route('/changes', methods=['GET'])
+def mudancas_route():
+    """Feed de mudanças (outbox) de turmas, professores e alunos
+    ---
+    parameters:
+      - name: since
+        in: query
+        type: integer
+        description: Último seq já processado (0 para ler desde o início)
+      - name: limit
+        in: query
+        type: integer
+        description: Máximo de mudanças devolvidas (até 1000)
+      - name: wait
+        in: query
+        type: number
+        description: "Long-poll: sem mudanças depois de since, espera até wait segundos (máximo OUTBOX_ESPERA_MAX_S)"
+    responses:
+      200:
+        description: Mudanças com seq maior que since, em ordem
+        schema:
+          type: object
+          properties:
+            mudancas:
+              type: array
+              items:
+                type: object
+                properties:
+                  seq:
+                    type: integer
+                  tabela:
+                    type: string
+                    enum: [aluno, professor, turma]
+                  id:
+                    type: integer
+                  operacao:
+                    type: string
+                    enum: [criado, atualizado, removido]
+                  em:
+                    type: number
+            ultimo_seq:
+              type: integer
+              description: Maior seq do outbox (menor que since indica que o banco foi recriado)
+      400:
+        description: Parâmetros inválidos
+    """
+    try:
+        since = int(request.args.get('since') or 0)
+        limit = int(request.args.get('limit') or outbox.LIMITE_MAXIMO)
+        espera = float(request.args.get('wait') or 0)
+    except ValueError:
+        return json_error('since e limit devem ser inteiros e wait um número', 400)
+    if since < 0 or limit < 1 or not espera >= 0: return json_error('since, limit e wait não podem ser negativos (limit maior que zero)', 400)
+    lista, ultimo = controller.mudancas(since, min(limit, outbox.LIMITE_MAXIMO), espera)
+    return jsonify({'mudancas': lista, 'ultimo_seq': ultimo}), 200
+
+@bp.route('/validate', methods=['POST'])
+def validar_route():
+    """Verifica em lote a existência de turmas, professores e alunos
+    ---
+    parameters:
+      - in: body
+        name: body
+        schema:
+          type: object
+          properties:
+            turmas:
+              type: array
+              items:
+                type: integer
+            professores:
+              type: array
+              items:
+                type: integer
+            alunos:
+              type: array
+              items:
+                type: integer
+    responses:
+      200:
+        description: IDs inexistentes por recurso (somente os recursos enviados)
+        schema:
+          type: object
+          properties:
+            valido:
+              type: boolean
+            inexistentes:
+              type: object
+              properties:
+                turmas:
+                  type: array
+                  items:
+                    type: integer
+                professores:
+                  type: array
+                  items:
+                    type: integer
+                alunos:
+                  type: array
+                  items:
+                    type: integer
+      400:
+        description: Dados inválidos
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict): return json_error('envie um objeto com as listas turmas, professores e/ou alunos', 400)
+    ids = {}
+    for recurso in ('turmas', 'professores', 'alunos'):
+        valores = data.get(recurso)
+        if valores is None: continue
+        if not isinstance(valores, list) or not all(isinstance(v, int) and not isinstance(v, bool) for v in valores):
+            return json_error(f'{recurso} deve ser uma lista de inteiros', 400)
+        if len(valores) > controller.MAX_IDS_VALIDACAO:
+            return json_error(f'{recurso}: máximo de {controller.MAX_IDS_VALIDACAO} ids por requisição', 400)
+        ids[recurso] = valores
+    inexistentes = controller.validar_ids(**ids)
+    return jsonify({'valido': not any(inexistentes.values()), 'inexistentes': inexistentes}), 200
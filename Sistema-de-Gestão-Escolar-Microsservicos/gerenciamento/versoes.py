@@ -0,0 +1,60 @@
+import time
+from functools import wraps
+from flask import Response, g, make_response, request
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from database import db
+import listagem
+
+# Contador de versão por tabela, incrementado na mesma transação da escrita (ver _commit dos controllers).
+# Fica no banco para valer entre todos os workers; ler é uma busca por chave, sem ORM.
+class Versao(db.Model):
+    __tablename__ = 'versao'
+    tabela = db.Column(db.String(50), primary_key=True)
+    versao = db.Column(db.Integer, nullable=False, default=0)
+    atualizado_em = db.Column(db.Float)
+
+def incrementar(*tabelas):
+    if not tabelas: return
+    agora = time.time()
+    stmt = sqlite_insert(Versao.__table__)
+    stmt = stmt.on_conflict_do_update(index_elements=['tabela'],
+                                      set_={'versao': Versao.__table__.c.versao + 1, 'atualizado_em': stmt.excluded.atualizado_em})
+    db.session.execute(stmt, [{'tabela': t, 'versao': 1, 'atualizado_em': agora} for t in sorted(set(tabelas))])
+
+def marca(tabelas):
+    # (etag, última modificação); o timestamp na etag a diferencia se o banco for recriado e a versão recomeçar.
+    # Lida uma vez por requisição (o GET condicional e o cache de respostas usam a mesma)
+    marcas = g.setdefault('marcas', {})
+    if tabelas not in marcas: marcas[tabelas] = _ler_marca(tabelas)
+    return marcas[tabelas]
+
+def _ler_marca(tabelas):
+    stmt = db.select(Versao.tabela, Versao.versao, Versao.atualizado_em).where(Versao.tabela.in_(tabelas))
+    linhas = {r.tabela: r for r in db.session.execute(stmt)}
+    partes, modificado = [], 0
+    for t in tabelas:
+        r = linhas.get(t)
+        partes.append(f'{r.versao}.{int(r.atualizado_em * 1000)}' if r else '0')
+        if r: modificado = max(modificado, r.atualizado_em)
+    return '-'.join(partes), modificado
+
+def condicional(*tabelas):
+    # GET condicional: responde 304 a If-None-Match (ou If-Modified-Since) antes de executar a view
+    def decorador(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag, modificado = marca(tabelas)
+            if listagem.quer_stream(request): etag += '-nd'
+            if request.if_none_match:
+                inalterado = request.if_none_match.contains_weak(etag)
+            else:
+                inalterado = bool(request.if_modified_since and modificado and int(modificado) <= request.if_modified_since.timestamp())
+            resp = Response(status=304) if inalterado else make_response(view(*args, **kwargs))
+            if resp.status_code in (200, 304):
+                resp.set_etag(etag)
+                if modificado: resp.last_modified = int(modificado)
+                resp.headers['Cache-Control'] = 'no-cache'
+                resp.vary.add('Accept')
+            return resp
+        return wrapper
+    return decorador
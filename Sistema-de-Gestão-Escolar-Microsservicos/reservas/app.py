@@ -1,16 +1,29 @@
 from flask import Flask, jsonify
 import logging
-from flasgger import Swagger
 from database import init_db
+import docs
+import json_provider
+import metricas
+import perfil_sql
+import replica
 from routes import bp as routes_bp
+from controllers import reservas_controller
+import comandos
 import os
 
 app = Flask(__name__)
+app.json = json_provider.criar(app)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
 logger = logging.getLogger(__name__)
-Swagger(app)
+docs.registrar(app)
 db_file = os.environ.get('DB_FILE','reservas.db')
 init_db(app, db_file)
+metricas.instalar(app, 'reservas')
+perfil_sql.instalar(app)
+replica.instalar(app)
+with app.app_context():
+    reservas_controller.preparar_intervalos()
+app.cli.add_command(comandos.orfaos_cli)
 app.register_blueprint(routes_bp, url_prefix='/')
 @app.route('/')
 def index():
@@ -0,0 +1,31 @@
+import time
+import click
+import requests
+from flask.cli import AppGroup
+from controllers import reservas_controller as controller
+import orfaos
+
+orfaos_cli = AppGroup('orfaos', help='Reconciliação de registros órfãos com o Gerenciamento.')
+
+@orfaos_cli.command('reconciliar')
+@click.option('--arquivar', is_flag=True, help='Copia as linhas para arquivo_orfao antes de remover.')
+@click.option('--simular', is_flag=True, help='Só conta os órfãos, sem remover.')
+@click.option('--lote', type=int, default=orfaos.LOTE, show_default=True, help='Linhas por transação.')
+@click.option('--pausa-ms', type=float, default=orfaos.PAUSA_MS, show_default=True, help='Pausa entre transações.')
+@click.option('--forcar', is_flag=True, help=f'Prossegue mesmo com mais de {orfaos.MAX_FRACAO:.0%} de valores órfãos.')
+@click.option('--a-cada', type=float, help='Repete a cada N segundos (agendamento), sem sair em caso de falha.')
+def reconciliar_orfaos(arquivar, simular, lote, pausa_ms, forcar, a_cada):
+    """Remove ou arquiva linhas que apontam para registros inexistentes no Gerenciamento."""
+    while True:
+        try:
+            relatorio = controller.reconciliar_orfaos(forcar=forcar, arquivar=arquivar, simular=simular, lote=lote, pausa_ms=pausa_ms)
+        except (requests.RequestException, orfaos.ReconciliacaoAbortada) as e:
+            click.echo(f'reconciliação não concluída: {e}', err=True)
+            if not a_cada: raise SystemExit(1)
+        else:
+            for p in relatorio['passos']:
+                click.echo(f"{p['tabela']}.{p['coluna']}: {p['valores_orfaos']} valor(es) órfão(s), {p['linhas']} linha(s) "
+                           f"({p['acao']}, {p['lotes']} lote(s)) - {p['motivo']}")
+            click.echo(f"valores locais examinados: {relatorio['valores_locais']}; {relatorio['segundos']}s")
+        if not a_cada: return
+        time.sleep(a_cada)
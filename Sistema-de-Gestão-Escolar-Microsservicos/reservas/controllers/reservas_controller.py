@@ -1,34 +1,294 @@
+import time
+from datetime import date, datetime, timedelta
 from models.models import Reserva
 from database import db
+import listagem
+import versoes
+import ocupacao
+import orfaos
 
-def _commit():
+MAX_ITENS_LOTE = 5000
+MAX_JANELA = timedelta(days=31)
+# salas distintas por saltos no índice (num_sala, lab): O(salas * log n) em vez de varrer a tabela
+SALAS_SQL = db.text("""
+WITH RECURSIVE salas(num_sala) AS (
+    SELECT min(num_sala) FROM reserva
+    UNION ALL
+    SELECT (SELECT min(num_sala) FROM reserva WHERE num_sala > salas.num_sala) FROM salas WHERE num_sala IS NOT NULL
+)
+SELECT num_sala, (SELECT max(lab) FROM reserva WHERE reserva.num_sala = salas.num_sala) AS lab
+FROM salas WHERE num_sala IS NOT NULL
+""")
+
+# mesmo formato de texto em que o SQLAlchemy grava DateTime no SQLite
+PREENCHER_INTERVALOS_SQL = db.text("""
+UPDATE reserva SET inicio = data || ' 00:00:00.000000', fim = date(data, '+1 day') || ' 00:00:00.000000'
+WHERE inicio IS NULL AND date(data) = data
+""")
+ALINHAR_DATAS_SQL = db.text("UPDATE reserva SET data = date(inicio) WHERE inicio IS NOT NULL AND data IS NOT date(inicio)")
+
+class DadosInvalidos(ValueError):
+    pass
+
+class ConflitoDeReserva(Exception):
+    def __init__(self, reserva_id):
+        super().__init__('Sala já reservada neste horário')
+        self.reserva_id = reserva_id
+
+def _commit(*tabelas):
+    # a versão das tabelas alteradas sobe na mesma transação (ETag dos GETs, ver versoes.py)
+    versoes.incrementar(*tabelas)
+    db.session.commit()
+
+def data_hora(valor, campo):
+    if isinstance(valor, datetime): return valor
+    try:
+        dh = datetime.fromisoformat(valor)
+    except (TypeError, ValueError):
+        raise DadosInvalidos(f'{campo} deve ser data/hora ISO 8601 (ex. 2025-11-20T08:00)')
+    if dh.tzinfo is not None: raise DadosInvalidos(f'{campo} deve estar no horário local, sem fuso')
+    return dh
+
+def _intervalo(data, inicio=None, fim=None):
+    # inicio/fim do corpo sobrescrevem os atuais; os dois juntos ou nenhum
+    if 'inicio' in data: inicio = data_hora(data['inicio'], 'inicio') if data['inicio'] is not None else None
+    if 'fim' in data: fim = data_hora(data['fim'], 'fim') if data['fim'] is not None else None
+    if (inicio is None) != (fim is None): raise DadosInvalidos('inicio e fim devem ser informados juntos')
+    if inicio is not None and fim <= inicio: raise DadosInvalidos('fim deve ser posterior a inicio')
+    return inicio, fim
+
+def _dia_inteiro(dia):
+    # reserva só com data ocupa o dia todo, [00:00, 24:00)
+    try:
+        inicio = datetime.combine(date.fromisoformat(dia), datetime.min.time())
+    except (TypeError, ValueError):
+        raise DadosInvalidos('data deve ser AAAA-MM-DD')
+    return inicio, inicio + timedelta(days=1)
+
+def _sala(valor):
+    # texto; um número (ex. 202) vira texto, como a coluna já o gravaria
+    if isinstance(valor, int) and not isinstance(valor, bool): valor = str(valor)
+    if not isinstance(valor, str) or not valor.strip(): raise DadosInvalidos('num_sala deve ser um texto não vazio')
+    return valor
+
+def _periodo(data):
+    inicio, fim = _intervalo(data)
+    if inicio is not None: return inicio, fim
+    if not data.get('data'): raise DadosInvalidos('data ou inicio/fim obrigatórios')
+    return _dia_inteiro(data['data'])
+
+def _dia_de(data, inicio):
+    # `data` é sempre o dia de `inicio` (filtros de data e exportação dependem disso); informada, precisa coincidir
+    if data.get('data') is not None:
+        try:
+            dia = date.fromisoformat(data['data'])
+        except (TypeError, ValueError):
+            raise DadosInvalidos('data deve ser AAAA-MM-DD')
+        if dia != inicio.date(): raise DadosInvalidos('data deve ser o dia de inicio')
+    return inicio.date().isoformat()
+
+def preparar_intervalos():
+    # bancos com reservas só de data (anteriores a inicio/fim): passam a ocupar o dia todo, uma única vez;
+    # e `data` gravada diferente do dia de `inicio` (antes da validação) é corrigida
+    db.session.execute(PREENCHER_INTERVALOS_SQL)
+    db.session.execute(ALINHAR_DATAS_SQL)
     db.session.commit()
 
-def listar_reservas():
-    return Reserva.query.all()
+def _bloquear_escrita():
+    # no SQLite a primeira escrita da transação pega o lock RESERVED: daqui até o commit os outros
+    # escritores (de qualquer worker) esperam, então a verificação de conflito não tem corrida
+    db.session.execute(db.text('UPDATE reserva SET id = id WHERE 0'))
+
+def consulta_conflito(num_sala, fim, ignorar_id=None):
+    # as reservas de uma sala não se sobrepõem entre si; entre as que começam antes de `fim`,
+    # a de início mais tardio é também a de fim mais tardio, então basta olhar uma (busca no índice)
+    stmt = (db.select(Reserva.id, Reserva.fim)
+            .where(Reserva.num_sala == num_sala, Reserva.inicio < fim)
+            .order_by(Reserva.inicio.desc()).limit(1))
+    if ignorar_id is not None: stmt = stmt.where(Reserva.id != ignorar_id)
+    return stmt
+
+def conflito(num_sala, inicio, fim, ignorar_id=None):
+    row = db.session.execute(consulta_conflito(num_sala, fim, ignorar_id)).first()
+    return row.id if row is not None and row.fim > inicio else None
+
+def _verificar_conflito(num_sala, inicio, fim, ignorar_id=None):
+    _bloquear_escrita()
+    outra = conflito(num_sala, inicio, fim, ignorar_id)
+    if outra is not None:
+        db.session.rollback()
+        raise ConflitoDeReserva(outra)
+
+def listar_reservas(**params):
+    return listagem.listar(Reserva, **params)
+def stream_reservas(**params):
+    return listagem.stream(Reserva, **params)
+
+def _dia(valor, campo):
+    try:
+        return date.fromisoformat(valor).isoformat()
+    except (TypeError, ValueError):
+        raise DadosInvalidos(f'{campo} inválido (use AAAA-MM-DD)')
+
+def exportar_reservas(de=None, ate=None, num_sala=None):
+    # consulta do GET /export/reservas.csv; a ordem (data, id) segue o índice de data, sem ordenar em memória
+    stmt = db.select(Reserva.id, Reserva.num_sala, Reserva.lab, Reserva.data, Reserva.inicio, Reserva.fim,
+                     Reserva.turma_id).order_by(Reserva.data, Reserva.id)
+    if de: stmt = stmt.where(Reserva.data >= _dia(de, 'de'))
+    if ate: stmt = stmt.where(Reserva.data <= _dia(ate, 'ate'))
+    if num_sala: stmt = stmt.where(Reserva.num_sala == num_sala)
+    return stmt
 
 def get_reserva_by_id(rid):
-    return Reserva.query.get(rid)
+    return listagem.obter(Reserva, rid)
 
 def criar_reserva(data):
-    r = Reserva(num_sala=data.get('num_sala'), lab=data.get('lab', False), data=data.get('data'), turma_id=data.get('turma_id'))
+    inicio, fim = _periodo(data)
+    dia = _dia_de(data, inicio)
+    r = Reserva(num_sala=_sala(data.get('num_sala')), lab=data.get('lab', False), data=dia, inicio=inicio, fim=fim, turma_id=data.get('turma_id'))
+    _verificar_conflito(r.num_sala, inicio, fim)
     db.session.add(r)
-    _commit()
+    _commit('reserva')
+    ocupacao.marcar(r.num_sala, inicio, fim)
     return r
 
+def criar_reservas_lote(itens, turmas_inexistentes=()):
+    # turmas_inexistentes já vem validado no gerenciamento numa única chamada
+    resultados = [None] * len(itens)
+    validos = []
+    for indice, item in enumerate(itens):
+        erro, inicio, fim = None, None, None
+        if not isinstance(item, dict): erro = 'item deve ser um objeto'
+        elif not item.get('num_sala') or not item.get('turma_id'): erro = 'num_sala e turma_id obrigatórios'
+        elif not isinstance(item['turma_id'], int) or isinstance(item['turma_id'], bool): erro = 'turma_id deve ser inteiro'
+        elif item['turma_id'] in turmas_inexistentes: erro = 'Turma inexistente'
+        else:
+            try:
+                num_sala = _sala(item['num_sala'])
+                inicio, fim = _periodo(item)
+                dia = _dia_de(item, inicio)
+            except DadosInvalidos as e:
+                erro = str(e)
+        if erro:
+            resultados[indice] = {'indice': indice, 'status': 400, 'error': erro}
+        else:
+            validos.append((indice, {'num_sala': num_sala, 'lab': item.get('lab', False), 'data': dia, 'inicio': inicio, 'fim': fim, 'turma_id': item['turma_id']}))
+    por_sala = sorted(validos, key=lambda v: (v[1]['num_sala'], v[1]['inicio']))
+    if por_sala:
+        _bloquear_escrita()
+        rejeitados = set()
+        ultimo = {}
+        for indice, linha in por_sala:
+            # conflito com outro item do próprio lote (ordenado por sala e início) ou com o banco
+            anterior = ultimo.get(linha['num_sala'])
+            if anterior and anterior[1] > linha['inicio']:
+                conflito_com = {'conflito_com_indice': anterior[0]}
+            else:
+                outra = conflito(linha['num_sala'], linha['inicio'], linha['fim'])
+                conflito_com = {'conflito_com': outra} if outra is not None else None
+            if conflito_com:
+                rejeitados.add(indice)
+                resultados[indice] = {'indice': indice, 'status': 409, 'error': 'Sala já reservada neste horário', **conflito_com}
+            else:
+                ultimo[linha['num_sala']] = (indice, linha['fim'])
+        validos = [v for v in validos if v[0] not in rejeitados]
+    if validos:
+        stmt = db.insert(Reserva).returning(Reserva.id, sort_by_parameter_order=True)
+        ids = db.session.execute(stmt, [linha for _, linha in validos]).scalars().all()
+        for (indice, _), rid in zip(validos, ids):
+            resultados[indice] = {'indice': indice, 'status': 201, 'id': rid}
+        _commit('reserva')
+    else:
+        db.session.rollback()
+    for _, linha in validos:
+        ocupacao.marcar(linha['num_sala'], linha['inicio'], linha['fim'])
+    return resultados
+
 def atualizar_reserva(rid, data):
     r = Reserva.query.get(rid)
     if not r: return None
-    r.num_sala = data.get('num_sala', r.num_sala)
+    inicio, fim = _intervalo(data, r.inicio, r.fim)
+    if inicio is None:
+        inicio, fim = _dia_inteiro(data.get('data') or r.data)
+    elif data.get('data') is not None and 'inicio' not in data and 'fim' not in data:
+        # só a data mudou: a reserva vai para o novo dia com os mesmos horários (a do dia todo segue do dia todo)
+        novo, _ = _dia_inteiro(data['data'])
+        deslocamento = novo - datetime.combine(inicio.date(), datetime.min.time())
+        inicio, fim = inicio + deslocamento, fim + deslocamento
+    dia = _dia_de(data, inicio)
+    num_sala = _sala(data['num_sala']) if 'num_sala' in data else r.num_sala
+    anterior = (r.inicio, r.fim)
+    if (inicio, fim, num_sala) != (r.inicio, r.fim, r.num_sala):
+        _verificar_conflito(num_sala, inicio, fim, ignorar_id=rid)
+    r.num_sala = num_sala
     r.lab = data.get('lab', r.lab)
-    r.data = data.get('data', r.data)
+    r.inicio, r.fim = inicio, fim
+    r.data = dia
     r.turma_id = data.get('turma_id', r.turma_id)
-    _commit()
+    _commit('reserva')
+    ocupacao.invalidar(*anterior)
+    ocupacao.invalidar(inicio, fim)
     return r
 
 def deletar_reserva(rid):
     r = Reserva.query.get(rid)
     if not r: return False
+    intervalo = (r.inicio, r.fim)
     db.session.delete(r)
-    _commit()
+    _commit('reserva')
+    ocupacao.invalidar(*intervalo)
     return True
+
+# Disponibilidade de salas
+def listar_salas(lab=None):
+    salas = [(row.num_sala, bool(row.lab)) for row in db.session.execute(SALAS_SQL)]
+    return [s for s in salas if lab is None or s[1] == lab]
+
+def reservas_no_periodo(inicio, fim, salas):
+    # reservas que cruzam [inicio, fim) de todas as salas numa única consulta: por sala, busca no índice
+    # (num_sala, fim, inicio) a partir de fim > inicio, então as reservas já encerradas nem são lidas
+    if not salas: return
+    stmt = (db.select(Reserva.num_sala, Reserva.inicio, Reserva.fim)
+            .where(Reserva.num_sala.in_(salas), Reserva.fim > inicio, Reserva.inicio < fim))
+    yield from db.session.execute(stmt)
+
+def _livres(inicio, fim, ocupados):
+    livres, cursor = [], inicio
+    for comeco, termino in sorted(ocupados):
+        if comeco > cursor: livres.append((cursor, min(comeco, fim)))
+        cursor = max(cursor, termino)
+        if cursor >= fim: break
+    if cursor < fim: livres.append((cursor, fim))
+    return livres
+
+def disponibilidade(inicio, fim, lab=None):
+    inicio, fim = data_hora(inicio, 'inicio'), data_hora(fim, 'fim')
+    if fim <= inicio: raise DadosInvalidos('fim deve ser posterior a inicio')
+    if fim - inicio > MAX_JANELA: raise DadosInvalidos(f'janela máxima de {MAX_JANELA.days} dias')
+    todas = listar_salas()
+    nomes = [s[0] for s in todas]
+    if ocupacao.ATIVO:
+        ocupados = ocupacao.ocupadas(inicio, fim, lambda a, b: reservas_no_periodo(a, b, nomes))
+    else:
+        ocupados = {}
+        for num_sala, comeco, termino in reservas_no_periodo(inicio, fim, nomes):
+            ocupados.setdefault(num_sala, []).append((comeco, termino))
+    resultado = []
+    for num_sala, eh_lab in todas:
+        if lab is not None and eh_lab != lab: continue
+        livres = _livres(inicio, fim, ocupados.get(num_sala, []))
+        if not livres: continue
+        resultado.append({'num_sala': num_sala, 'lab': eh_lab, 'livre': livres == [(inicio, fim)],
+                          'intervalos_livres': [{'inicio': a, 'fim': b} for a, b in livres]})
+    return resultado
+
+# Reconciliação de órfãos (ver orfaos.py)
+def reconciliar_orfaos(forcar=False, **opcoes):
+    # valores locais antes dos remotos: uma turma criada depois da leitura remota não vira órfã
+    inicio = time.perf_counter()
+    locais = {'turmas': orfaos.valores_locais(Reserva.turma_id)}
+    orfas = {'turmas': locais['turmas'] - orfaos.ids_validos('turmas')}
+    orfaos.conferir(locais, orfas, forcar)
+    passos = [orfaos.processar(Reserva, Reserva.turma_id, orfas['turmas'], 'turma inexistente no gerenciamento', ('reserva',), **opcoes)]
+    return {'valores_locais': {k: len(v) for k, v in locais.items()}, 'passos': passos,
+            'segundos': round(time.perf_counter() - inicio, 3)}
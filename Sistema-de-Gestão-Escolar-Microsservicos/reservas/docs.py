@@ -0,0 +1,53 @@
+import importlib.util
+import os
+from flask import Blueprint, Response, send_from_directory
+
+# Documentação da API (DOCS_MODO):
+#   flasgger - monta a spec a partir das docstrings das rotas em cada processo (padrão, desenvolvimento)
+#   estatico - serve o openapi.json pré-compilado por scripts/gerar_openapi.py, sem importar o flasgger
+#   off      - sem /apidocs nem spec
+MODO = os.environ.get('DOCS_MODO', 'flasgger')
+SPEC = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'openapi.json')
+ROTA_SPEC = '/apispec_1.json'
+ROTA_UI = '/apidocs/'
+
+PAGINA = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>API</title><link rel="stylesheet" href="static/swagger-ui.css"></head>
+<body>
+<div id="swagger-ui"></div>
+<script src="static/swagger-ui-bundle.js"></script>
+<script>SwaggerUIBundle({url: "%s", dom_id: "#swagger-ui"});</script>
+</body>
+</html>
+""" % ROTA_SPEC
+
+def registrar(app):
+    if MODO == 'flasgger':
+        from flasgger import Swagger
+        Swagger(app)
+    elif MODO == 'estatico':
+        app.register_blueprint(_estatico())
+
+def _estatico():
+    with open(SPEC, 'rb') as f:
+        spec = f.read()
+    bp = Blueprint('docs', __name__)
+
+    @bp.route(ROTA_SPEC)
+    def apispec():
+        return Response(spec, mimetype='application/json')
+
+    # o swagger-ui vem nos arquivos estáticos do pacote flasgger, localizados sem importá-lo
+    origem = importlib.util.find_spec('flasgger')
+    if origem is not None:
+        estaticos = os.path.join(origem.submodule_search_locations[0], 'ui3', 'static')
+
+        @bp.route(ROTA_UI)
+        def apidocs():
+            return PAGINA
+
+        @bp.route(ROTA_UI + 'static/<path:arquivo>')
+        def apidocs_estatico(arquivo):
+            return send_from_directory(estaticos, arquivo)
+    return bp
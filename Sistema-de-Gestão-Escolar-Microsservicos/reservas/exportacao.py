@@ -0,0 +1,57 @@
+import csv
+import io
+import os
+import zlib
+from datetime import datetime
+from flask import Response, request, stream_with_context
+from database import db
+import listagem
+
+# Exportação CSV em fluxo (GET /export/...): as linhas saem do cursor em blocos de EXPORTACAO_LOTE (yield_per),
+# viram texto CSV e seguem na resposta em chunked transfer encoding; com Accept-Encoding: gzip cada bloco é
+# comprimido na hora. A memória fica no tamanho de um bloco, qualquer que seja o total de linhas.
+# O arquivo começa com BOM (o Excel reconhece o UTF-8); ?separador=; usa ponto e vírgula e vírgula decimal,
+# o formato que o Excel em português abre direto (e que POST /notas/import aceita).
+LOTE = int(os.environ.get('EXPORTACAO_LOTE', '1000'))
+NIVEL_GZIP = int(os.environ.get('EXPORTACAO_GZIP_NIVEL', '6'))
+SEPARADORES = (',', ';')
+
+def _formatar(valor, decimal_virgula):
+    # mesmos formatos do JSON da API: datas ISO 8601 e booleanos true/false
+    if isinstance(valor, bool): return 'true' if valor else 'false'
+    if isinstance(valor, datetime): return valor.isoformat()
+    if decimal_virgula and isinstance(valor, float): return str(valor).replace('.', ',')
+    return valor
+
+def _blocos_csv(stmt, cabecalho, separador):
+    decimal_virgula = separador == ';'
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=separador, lineterminator='\r\n')
+    buffer.write('\ufeff')
+    escritor.writerow(cabecalho)
+    yield buffer.getvalue().encode('utf-8')
+    resultado = db.session.execute(stmt.execution_options(yield_per=LOTE))
+    for bloco in resultado.partitions():
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerows([_formatar(v, decimal_virgula) for v in row] for row in bloco)
+        yield buffer.getvalue().encode('utf-8')
+
+def _gzip(blocos):
+    compressor = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for bloco in blocos:
+        dados = compressor.compress(bloco)
+        if dados: yield dados
+    yield compressor.flush()
+
+def resposta_csv(nome, stmt):
+    # stmt: select com as colunas na ordem do arquivo (os rótulos viram o cabeçalho)
+    separador = request.args.get('separador') or ','
+    if separador not in SEPARADORES: raise listagem.ParametroInvalido("separador deve ser ',' ou ';'")
+    comprimir = request.args.get('gzip') != '0' and request.accept_encodings['gzip'] > 0
+    blocos = _blocos_csv(stmt, list(stmt.selected_columns.keys()), separador)
+    resp = Response(stream_with_context(_gzip(blocos) if comprimir else blocos), mimetype='text/csv')
+    resp.headers['Content-Disposition'] = f'attachment; filename="{nome}"'
+    if comprimir: resp.headers['Content-Encoding'] = 'gzip'
+    resp.vary.add('Accept-Encoding')
+    return resp
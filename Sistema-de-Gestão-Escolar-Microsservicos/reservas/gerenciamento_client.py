@@ -0,0 +1,227 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from requests.adapters import HTTPAdapter
+from cache import TTLCache, AUSENTE
+from disjuntor import Disjuntor, CircuitoAberto
+import metricas
+import replica
+
+# Cliente HTTP do serviço de Gerenciamento: uma Session com keep-alive por worker
+GER_URL = os.environ.get('GERENCIAMENTO_URL','http://gerenciamento:5000')
+POOL_SIZE = int(os.environ.get('GER_POOL_SIZE', '10'))
+CONNECT_TIMEOUT = float(os.environ.get('GER_CONNECT_TIMEOUT', '1'))
+READ_TIMEOUT = float(os.environ.get('GER_READ_TIMEOUT', '3'))
+LATENCY_SAMPLES = int(os.environ.get('GER_LATENCY_SAMPLES', '1000'))
+VALIDACAO_THREADS = int(os.environ.get('GER_VALIDACAO_THREADS', '4'))
+CACHE_MAXSIZE = int(os.environ.get('VALIDACAO_CACHE_MAXSIZE', '4096'))
+CACHE_TTL = float(os.environ.get('VALIDACAO_CACHE_TTL', '60'))
+CACHE_TTL_NEGATIVO = float(os.environ.get('VALIDACAO_CACHE_TTL_NEGATIVO', '10'))
+# limite de ids por recurso numa chamada a POST /validate (MAX_IDS_VALIDACAO do Gerenciamento)
+MAX_IDS_VALIDACAO = 10000
+# com o Gerenciamento fora (falha ou circuito aberto): 'falhar' responde 503; 'cache' aceita a última
+# validação conhecida do id, vencida há no máximo GER_CACHE_OBSOLETO_MAX_S segundos
+POLITICA_DEGRADADA = os.environ.get('GER_POLITICA_DEGRADADA', 'falhar')
+CACHE_OBSOLETO_MAX_S = float(os.environ.get('GER_CACHE_OBSOLETO_MAX_S', '3600'))
+
+_lock = threading.Lock()
+_session = None
+_session_pid = None
+_executor = None
+_executor_pid = None
+_latencias = deque(maxlen=LATENCY_SAMPLES)
+_contadores = {'chamadas': 0, 'erros': 0, 'degradadas': 0}
+# ids já validados (True) ou sabidamente inexistentes (False), por recurso
+cache_validacao = TTLCache(maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL, manter_expirados=True)
+disjuntor = Disjuntor(janela=float(os.environ.get('GER_DISJUNTOR_JANELA_S', '30')),
+                      min_chamadas=int(os.environ.get('GER_DISJUNTOR_MIN_CHAMADAS', '10')),
+                      taxa_erro=float(os.environ.get('GER_DISJUNTOR_TAXA_ERRO', '0.5')),
+                      latencia_ms=float(os.environ.get('GER_DISJUNTOR_LATENCIA_MS', '1000')),
+                      taxa_lentas=float(os.environ.get('GER_DISJUNTOR_TAXA_LENTAS', '0.5')),
+                      aberto_s=float(os.environ.get('GER_DISJUNTOR_ABERTO_S', '10')),
+                      sondas=int(os.environ.get('GER_DISJUNTOR_SONDAS', '1')))
+
+def _nova_sessao():
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=0)
+    s.mount('http://', adapter)
+    s.mount('https://', adapter)
+    return s
+
+def get_session():
+    # o gunicorn faz fork dos workers depois do import: cada processo abre o seu pool
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _lock:
+            if _session is None or _session_pid != pid:
+                _session = _nova_sessao()
+                _session_pid = pid
+    return _session
+
+def _registrar(metodo, path, inicio, status=None):
+    segundos = time.perf_counter() - inicio
+    with _lock:
+        _latencias.append(segundos * 1000)
+        _contadores['chamadas'] += 1
+        if status is None: _contadores['erros'] += 1
+    metricas.observar_upstream(metodo, path, segundos, status)
+    disjuntor.registrar(segundos, status is None or status >= 500)
+
+def _requisitar(metodo, path, **kwargs):
+    kwargs.setdefault('timeout', (CONNECT_TIMEOUT, READ_TIMEOUT))
+    try:
+        disjuntor.permitir()
+    except CircuitoAberto:
+        metricas.contar('gerenciamento_rejeitadas_total')
+        raise
+    inicio = time.perf_counter()
+    try:
+        resp = get_session().request(metodo, f"{GER_URL}{path}", **kwargs)
+    except requests.RequestException:
+        _registrar(metodo, path, inicio)
+        raise
+    _registrar(metodo, path, inicio, resp.status_code)
+    return resp
+
+def get(path, **kwargs):
+    return _requisitar('GET', path, **kwargs)
+
+def post(path, **kwargs):
+    return _requisitar('POST', path, **kwargs)
+
+def _ultimo_conhecido(chave):
+    # política 'cache': última validação guardada do id, se não for velha demais
+    if POLITICA_DEGRADADA != 'cache': return AUSENTE
+    existe, vencido_ha = cache_validacao.get_expirado(chave)
+    if existe is AUSENTE or vencido_ha > CACHE_OBSOLETO_MAX_S: return AUSENTE
+    return existe
+
+def _contar_degradadas(n=1):
+    with _lock:
+        _contadores['degradadas'] += n
+    metricas.contar('gerenciamento_degradadas_total', n)
+
+def _esquecer(removidos):
+    # ids removidos no Gerenciamento (feed da réplica) saem do cache de validação deste worker
+    for recurso, rid in removidos: cache_validacao.purge((recurso, str(rid)))
+
+replica.ao_remover.append(_esquecer)
+
+def _existe(recurso, rid):
+    chave = (recurso, str(rid))
+    presentes, em_dia = replica.situacao(recurso, [rid])
+    if presentes: return True
+    existe = cache_validacao.get(chave)
+    # com a réplica em dia, o "existe" em cache de um id fora dela pode ser de antes da remoção
+    if existe is not AUSENTE and not (existe and em_dia): return existe
+    try:
+        resp = get(f"/{recurso}/{rid}")
+        if resp.status_code >= 500: resp.raise_for_status()
+    except requests.RequestException:
+        existe = _ultimo_conhecido(chave)
+        if existe is AUSENTE: raise
+        _contar_degradadas()
+        return existe
+    status = resp.status_code
+    existe = status == 200
+    # só 200/404 são respostas definitivas; erros do gerenciamento não ficam em cache
+    if status in (200, 404):
+        cache_validacao.set(chave, existe, ttl=CACHE_TTL if existe else CACHE_TTL_NEGATIVO)
+    return existe
+
+def turma_existe(tid):
+    return _existe('turmas', tid)
+
+def professor_existe(pid):
+    return _existe('professores', pid)
+
+def _validar_remoto(pendentes, inexistentes):
+    try:
+        resp = post('/validate', json=pendentes)
+        resp.raise_for_status()
+    except requests.RequestException:
+        # degradado: só segue se todos os ids pendentes tiverem validação conhecida
+        conhecidos = {(recurso, rid): _ultimo_conhecido((recurso, str(rid))) for recurso, ids in pendentes.items() for rid in ids}
+        if AUSENTE in conhecidos.values(): raise
+        _contar_degradadas(len(conhecidos))
+        for (recurso, rid), existe in conhecidos.items():
+            if not existe: inexistentes[recurso].add(rid)
+        return
+    faltando = resp.json()['inexistentes']
+    for recurso, ids in pendentes.items():
+        ausentes = set(faltando.get(recurso, ()))
+        inexistentes[recurso] |= ausentes
+        for rid in ids:
+            existe = rid not in ausentes
+            cache_validacao.set((recurso, str(rid)), existe, ttl=CACHE_TTL if existe else CACHE_TTL_NEGATIVO)
+
+def validar_lote(turmas=(), professores=(), alunos=()):
+    # devolve {recurso: ids inexistentes}; só consulta o gerenciamento (POST /validate) para ids fora do cache
+    inexistentes = {}
+    pendentes = {}
+    for recurso, ids in (('turmas', turmas), ('professores', professores), ('alunos', alunos)):
+        inexistentes[recurso] = set()
+        ids = set(ids)
+        presentes, em_dia = replica.situacao(recurso, ids)
+        for rid in ids - presentes:
+            existe = cache_validacao.get((recurso, str(rid)))
+            if existe is AUSENTE or (existe and em_dia): pendentes.setdefault(recurso, []).append(rid)
+            elif not existe: inexistentes[recurso].add(rid)
+    # POST /validate aceita até MAX_IDS_VALIDACAO ids por recurso: listas maiores vão em várias chamadas
+    maior = max((len(ids) for ids in pendentes.values()), default=0)
+    for i in range(0, maior, MAX_IDS_VALIDACAO):
+        _validar_remoto({recurso: ids[i:i + MAX_IDS_VALIDACAO] for recurso, ids in pendentes.items() if ids[i:i + MAX_IDS_VALIDACAO]}, inexistentes)
+    return inexistentes
+
+def _get_executor():
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ThreadPoolExecutor(max_workers=VALIDACAO_THREADS, thread_name_prefix='ger-validacao')
+                _executor_pid = pid
+    return _executor
+
+def verificar_referencias(**referencias):
+    # dispara as verificações em paralelo e devolve o primeiro recurso inexistente (ou None) assim que ele aparece
+    pendentes = [(recurso, rid) for recurso, rid in referencias.items() if rid and not replica.contem(recurso, rid)]
+    if not pendentes: return None
+    if len(pendentes) == 1:
+        recurso, rid = pendentes[0]
+        return None if _existe(recurso, rid) else recurso
+    futuros = {_get_executor().submit(_existe, recurso, rid): recurso for recurso, rid in pendentes}
+    for futuro in as_completed(futuros):
+        if not futuro.result():
+            for outro in futuros: outro.cancel()
+            return futuros[futuro]
+    return None
+
+def purgar_cache(recurso=None, rid=None):
+    if recurso is None: return cache_validacao.purge()
+    return cache_validacao.purge((recurso, str(rid)))
+
+def _percentil(ordenadas, p):
+    if not ordenadas: return None
+    return ordenadas[min(len(ordenadas) - 1, int(round(p / 100 * (len(ordenadas) - 1))))]
+
+def estatisticas():
+    with _lock:
+        amostras = sorted(_latencias)
+        contadores = dict(_contadores)
+    return {**contadores, 'pool_size': POOL_SIZE,
+            'timeout': {'connect': CONNECT_TIMEOUT, 'read': READ_TIMEOUT}, 'politica_degradada': POLITICA_DEGRADADA,
+            'latencia_ms': {'p50': _percentil(amostras, 50), 'p95': _percentil(amostras, 95),
+                            'p99': _percentil(amostras, 99), 'max': amostras[-1] if amostras else None}}
+
+def resetar_estatisticas():
+    with _lock:
+        _latencias.clear()
+        _contadores.update(chamadas=0, erros=0, degradadas=0)
+
+def estado_disjuntor():
+    return {**disjuntor.stats(), 'politica_degradada': POLITICA_DEGRADADA}
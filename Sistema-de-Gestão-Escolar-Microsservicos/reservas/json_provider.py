@@ -0,0 +1,41 @@
+import os
+from datetime import date
+from flask.json.provider import DefaultJSONProvider
+try:
+    import orjson
+except ImportError:  # dependência opcional: sem ela fica o json da stdlib
+    orjson = None
+
+# JSON_RAPIDO=0 força o json da stdlib mesmo com orjson instalado
+RAPIDO = orjson is not None and os.environ.get('JSON_RAPIDO', '1') == '1'
+
+class JSONProvider(DefaultJSONProvider):
+    # datas e horários em ISO 8601 (o padrão do Flask usa o formato de data HTTP)
+    @staticmethod
+    def default(o):
+        if isinstance(o, date): return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+class JSONProviderRapido(JSONProvider):
+    # orjson serializa direto para bytes, sem passar por str; chamadas com opções da stdlib caem no pai
+    def _opcoes(self):
+        opcoes = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys: opcoes |= orjson.OPT_SORT_KEYS
+        if self.compact is False or (self.compact is None and self._app.debug): opcoes |= orjson.OPT_INDENT_2
+        return opcoes
+
+    def dumps(self, obj, **kwargs):
+        if kwargs: return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._opcoes()).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs: return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        corpo = orjson.dumps(obj, default=self.default, option=self._opcoes() | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(corpo, mimetype=self.mimetype)
+
+def criar(app):
+    return JSONProviderRapido(app) if RAPIDO else JSONProvider(app)
@@ -1,10 +1,21 @@
 from database import db
 class Reserva(db.Model):
     __tablename__ = 'reserva'
+    __table_args__ = (
+        db.Index('ix_reserva_sala_data', 'num_sala', 'data'),
+        # verificação de conflito: busca por sala + início, com o fim coberto pelo próprio índice
+        db.Index('ix_reserva_sala_intervalo', 'num_sala', 'inicio', 'fim'),
+        # reservas que cruzam uma janela (salas disponíveis): busca por sala + fim, com o início coberto
+        db.Index('ix_reserva_sala_fim', 'num_sala', 'fim', 'inicio'),
+        # catálogo de salas (varredura de num_sala distintos) e se a sala é laboratório
+        db.Index('ix_reserva_sala_lab', 'num_sala', 'lab'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    num_sala = db.Column(db.String(50))
+    num_sala = db.Column(db.String(50), index=True)
     lab = db.Column(db.Boolean, default=False)
-    data = db.Column(db.String(50))
-    turma_id = db.Column(db.Integer, nullable=False)
+    data = db.Column(db.String(50), index=True)
+    inicio = db.Column(db.DateTime)
+    fim = db.Column(db.DateTime)
+    turma_id = db.Column(db.Integer, nullable=False, index=True)
     def to_dict(self):
-        return {"id":self.id,"num_sala":self.num_sala,"lab":self.lab,"data":self.data,"turma_id":self.turma_id}
+        return {"id":self.id,"num_sala":self.num_sala,"lab":self.lab,"data":self.data,"inicio":self.inicio,"fim":self.fim,"turma_id":self.turma_id}
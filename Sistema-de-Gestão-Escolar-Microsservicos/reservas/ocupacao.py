@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+from datetime import datetime, time as dtime, timedelta
+
+# Mapa de ocupação por dia: {sala: bits}, um bit por faixa de SLOT_MINUTOS (opcional, por worker)
+ATIVO = os.environ.get('OCUPACAO_BITMAP', '0') == '1'
+SLOT_MINUTOS = int(os.environ.get('OCUPACAO_SLOT_MINUTOS', '15'))
+TTL = float(os.environ.get('OCUPACAO_BITMAP_TTL', '30'))
+MAX_DIAS = int(os.environ.get('OCUPACAO_MAX_DIAS', '62'))
+SLOTS_DIA = 24 * 60 // SLOT_MINUTOS
+SLOT = timedelta(minutes=SLOT_MINUTOS)
+
+_lock = threading.Lock()
+_dias = {}
+
+def _dias_entre(inicio, fim):
+    dia = inicio.date()
+    while datetime.combine(dia, dtime()) < fim:
+        yield dia
+        dia += timedelta(days=1)
+
+def _mascara(dia, inicio, fim):
+    # faixas tocadas, mesmo que parcialmente, contam como ocupadas
+    base = datetime.combine(dia, dtime())
+    primeiro = max(0, int((inicio - base) / SLOT))
+    ultimo = min(SLOTS_DIA, -int(-(fim - base) // SLOT))
+    if ultimo <= primeiro: return 0
+    return ((1 << (ultimo - primeiro)) - 1) << primeiro
+
+def marcar(num_sala, inicio, fim):
+    # nova reserva: atualiza só os dias já carregados, sem recarregar do banco
+    if not ATIVO or inicio is None: return
+    with _lock:
+        for dia in _dias_entre(inicio, fim):
+            if dia in _dias:
+                salas = _dias[dia][1]
+                salas[num_sala] = salas.get(num_sala, 0) | _mascara(dia, inicio, fim)
+
+def invalidar(inicio, fim):
+    # reserva removida ou alterada: bits de faixas parciais podem ser de outra reserva, então o dia é recarregado
+    if not ATIVO or inicio is None: return
+    with _lock:
+        for dia in _dias_entre(inicio, fim):
+            _dias.pop(dia, None)
+
+def limpar():
+    with _lock:
+        _dias.clear()
+
+def _mapa_do_dia(dia, carregar):
+    agora = time.monotonic()
+    with _lock:
+        item = _dias.get(dia)
+        if item and item[0] > agora: return item[1]
+    base = datetime.combine(dia, dtime())
+    salas = {}
+    for num_sala, inicio, fim in carregar(base, base + timedelta(days=1)):
+        salas[num_sala] = salas.get(num_sala, 0) | _mascara(dia, inicio, fim)
+    with _lock:
+        if len(_dias) >= MAX_DIAS: _dias.pop(min(_dias))
+        _dias[dia] = (agora + TTL, salas)
+    return salas
+
+def ocupadas(inicio, fim, carregar):
+    # {sala: [(inicio, fim), ...]} em faixas de SLOT_MINUTOS, a partir dos mapas diários
+    resultado = {}
+    for dia in _dias_entre(inicio, fim):
+        base = datetime.combine(dia, dtime())
+        for num_sala, bits in _mapa_do_dia(dia, carregar).items():
+            bits &= _mascara(dia, inicio, fim)
+            slot = 0
+            while bits:
+                if bits & 1:
+                    comeco = slot
+                    while bits & 1:
+                        bits >>= 1
+                        slot += 1
+                    resultado.setdefault(num_sala, []).append((base + comeco * SLOT, base + slot * SLOT))
+                else:
+                    bits >>= 1
+                    slot += 1
+    return resultado
@@ -0,0 +1,87 @@
+import json
+import os
+import time
+from database import db
+import gerenciamento_client as ger
+import versoes
+
+# Reconciliação de órfãos: linhas locais que apontam para turmas/professores/alunos que não existem mais no
+# Gerenciamento (ex. removidos depois). Os ids válidos vêm do Gerenciamento em páginas (?fields=id), os valores
+# das chaves locais de um SELECT DISTINCT no índice, e os órfãos são a diferença dos dois conjuntos. As linhas
+# são removidas (ou arquivadas em arquivo_orfao e removidas) em transações de até ORFAOS_LOTE linhas, com uma
+# pausa entre elas, para não segurar o lock de escrita do SQLite por muito tempo.
+LOTE = int(os.environ.get('ORFAOS_LOTE', '500'))
+PAUSA_MS = float(os.environ.get('ORFAOS_PAUSA_MS', '50'))
+# acima desta fração de valores órfãos a reconciliação desiste (ex. Gerenciamento com o banco vazio), salvo --forcar
+MAX_FRACAO = float(os.environ.get('ORFAOS_MAX_FRACAO', '0.5'))
+PAGINA = 1000
+MAX_VALORES_POR_CONSULTA = 500
+
+class ReconciliacaoAbortada(Exception):
+    pass
+
+class ArquivoOrfao(db.Model):
+    __tablename__ = 'arquivo_orfao'
+    __table_args__ = (db.Index('ix_arquivo_orfao_tabela_registro', 'tabela', 'registro_id'),)
+    id = db.Column(db.Integer, primary_key=True)
+    tabela = db.Column(db.String(50), nullable=False)
+    registro_id = db.Column(db.Integer, nullable=False)
+    dados = db.Column(db.Text, nullable=False)
+    motivo = db.Column(db.String(200))
+    arquivado_em = db.Column(db.Float, nullable=False)
+
+def ids_validos(recurso):
+    # todos os ids do recurso no Gerenciamento, paginando por chave só com o campo id
+    ids, after_id = set(), None
+    while True:
+        params = {'fields': 'id', 'limit': PAGINA}
+        if after_id: params['after_id'] = after_id
+        resp = ger.get(f'/{recurso}', params=params)
+        resp.raise_for_status()
+        ids.update(linha['id'] for linha in resp.json())
+        after_id = resp.headers.get('X-Next-After-Id')
+        if not after_id: return ids
+
+def valores_locais(coluna):
+    return set(db.session.scalars(db.select(coluna).where(coluna.isnot(None)).distinct()))
+
+def conferir(locais, orfaos, forcar=False):
+    # locais/orfaos: {nome: conjunto de valores}
+    for nome, valores in locais.items():
+        if forcar or not valores: continue
+        fracao = len(orfaos[nome]) / len(valores)
+        if fracao > MAX_FRACAO:
+            raise ReconciliacaoAbortada(f'{nome}: {len(orfaos[nome])} de {len(valores)} valores seriam órfãos '
+                                        f'({fracao:.0%} > {MAX_FRACAO:.0%}); use --forcar se for isso mesmo')
+
+def processar(model, coluna, valores, motivo, tabelas, antes=None, arquivar=False, simular=False, lote=None, pausa_ms=None):
+    # remove as linhas de `model` com `coluna` em `valores`, em lotes; antes(linhas) roda na mesma transação
+    lote = lote or LOTE
+    pausa = (PAUSA_MS if pausa_ms is None else pausa_ms) / 1000
+    colunas = model.__table__.c
+    valores = sorted(valores)
+    resultado = {'tabela': model.__tablename__, 'coluna': coluna.key, 'motivo': motivo, 'valores_orfaos': len(valores),
+                 'linhas': 0, 'lotes': 0, 'acao': 'simular' if simular else 'arquivar' if arquivar else 'remover'}
+    for i in range(0, len(valores), MAX_VALORES_POR_CONSULTA):
+        grupo = valores[i:i + MAX_VALORES_POR_CONSULTA]
+        ultimo = 0
+        while True:
+            stmt = (db.select(*colunas).where(coluna.in_(grupo), colunas.id > ultimo)
+                    .order_by(colunas.id).limit(lote))
+            linhas = [dict(row._mapping) for row in db.session.execute(stmt)]
+            if not linhas: break
+            ultimo = linhas[-1]['id']
+            resultado['linhas'] += len(linhas)
+            if simular: continue
+            if antes: antes(linhas)
+            if arquivar:
+                agora = time.time()
+                db.session.execute(db.insert(ArquivoOrfao), [
+                    {'tabela': model.__tablename__, 'registro_id': l['id'], 'dados': json.dumps(l, default=str),
+                     'motivo': motivo, 'arquivado_em': agora} for l in linhas])
+            db.session.execute(db.delete(model).where(colunas.id.in_([l['id'] for l in linhas])))
+            versoes.incrementar(*tabelas)
+            db.session.commit()
+            resultado['lotes'] += 1
+            if pausa: time.sleep(pausa)
+    return resultado
@@ -0,0 +1,169 @@
+import logging
+import os
+import socket
+import threading
+import time
+import requests
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from database import db
+import metricas
+
+# Réplica local dos ids de turmas, professores e alunos do Gerenciamento (REPLICA_GERENCIAMENTO=1).
+# Uma thread por worker consome o feed GET /changes do Gerenciamento (long-poll); só o worker que detém o
+# lease em replica_cursor consulta e aplica, os outros esperam para assumir se ele parar. O seq lido fica no
+# banco, então depois de um restart a réplica continua de onde parou.
+# Validar um id vira uma busca pela chave primária; a réplica só responde se estiver em dia (último poll há
+# menos de REPLICA_ATRASO_MAX_S), e um id ausente ainda é confirmado no Gerenciamento (pode ter sido criado
+# depois do último poll).
+ATIVO = os.environ.get('REPLICA_GERENCIAMENTO', '0') == '1'
+GER_URL = os.environ.get('GERENCIAMENTO_URL', 'http://gerenciamento:5000')
+ESPERA = float(os.environ.get('REPLICA_ESPERA_S', '20'))
+ATRASO_MAXIMO = float(os.environ.get('REPLICA_ATRASO_MAX_S', '60'))
+LOTE = 1000
+FONTE = 'gerenciamento'
+RECURSOS = {'turma': 'turmas', 'professor': 'professores', 'aluno': 'alunos'}
+
+logger = logging.getLogger('replica')
+
+class ReplicaId(db.Model):
+    __tablename__ = 'replica_id'
+    recurso = db.Column(db.String(20), primary_key=True)
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
+class ReplicaCursor(db.Model):
+    __tablename__ = 'replica_cursor'
+    fonte = db.Column(db.String(50), primary_key=True)
+    seq = db.Column(db.Integer, nullable=False, default=0)
+    sincronizado_em = db.Column(db.Float)
+    dono = db.Column(db.String(80))
+    lease_ate = db.Column(db.Float)
+
+_lock = threading.Lock()
+_estado = {'pid': None, 'app': None, 'engine': None}
+# chamadas com [(recurso, id), ...] depois de cada lote aplicado com remoções (ex. limpar o cache de validação)
+ao_remover = []
+
+# Consulta (qualquer thread, sem contexto do Flask)
+def _em_dia(conn):
+    sincronizado = conn.execute(db.select(ReplicaCursor.sincronizado_em).where(ReplicaCursor.fonte == FONTE)).scalar()
+    return sincronizado is not None and time.time() - sincronizado <= ATRASO_MAXIMO
+
+def situacao(recurso, ids):
+    # (ids presentes na réplica, réplica em dia); com ela em dia, um id ausente pode ter sido removido no
+    # Gerenciamento, então um "existe" guardado em cache (deste ou de outro worker) não vale mais para ele
+    engine = _estado['engine']
+    ids = list(ids)
+    if engine is None or not ids: return set(), False
+    with engine.connect() as conn:
+        if not _em_dia(conn): return set(), False
+        stmt = db.select(ReplicaId.id).where(ReplicaId.recurso == recurso, ReplicaId.id.in_(ids))
+        return set(conn.execute(stmt).scalars()), True
+
+def existentes(recurso, ids):
+    # ids presentes na réplica; vazio se ela estiver desligada ou atrasada
+    return situacao(recurso, ids)[0]
+
+def contem(recurso, rid):
+    return bool(existentes(recurso, [rid]))
+
+def estado():
+    engine = _estado['engine']
+    if engine is None: return {'ativa': False}
+    with engine.connect() as conn:
+        r = conn.execute(db.select(ReplicaCursor.seq, ReplicaCursor.sincronizado_em, ReplicaCursor.dono)
+                         .where(ReplicaCursor.fonte == FONTE)).first()
+    if r is None: return {'ativa': True, 'seq': 0, 'em_dia': False}
+    atraso = time.time() - r.sincronizado_em if r.sincronizado_em else None
+    return {'ativa': True, 'seq': r.seq, 'em_dia': atraso is not None and atraso <= ATRASO_MAXIMO,
+            'sincronizado_ha_s': round(atraso, 3) if atraso is not None else None, 'consumidor': r.dono}
+
+# Consumo do feed
+def _lider(eu):
+    # lease renovado a cada poll; expira se o worker dono morrer ou travar
+    agora = time.time()
+    cursor = ReplicaCursor.__table__
+    db.session.execute(sqlite_insert(cursor).values(fonte=FONTE, seq=0).on_conflict_do_nothing())
+    resultado = db.session.execute(cursor.update()
+                                   .where(cursor.c.fonte == FONTE, db.or_(cursor.c.dono == eu, cursor.c.dono.is_(None), cursor.c.lease_ate < agora))
+                                   .values(dono=eu, lease_ate=agora + 2 * ESPERA + 10))
+    db.session.commit()
+    return resultado.rowcount == 1
+
+def _aplicar(mudancas):
+    # só a última operação de cada id importa
+    ultima = {}
+    for m in mudancas:
+        if m['tabela'] in RECURSOS: ultima[(RECURSOS[m['tabela']], m['id'])] = m['operacao']
+    presentes = [{'recurso': r, 'id': i} for (r, i), op in ultima.items() if op != 'removido']
+    removidos = [{'r': r, 'i': i} for (r, i), op in ultima.items() if op == 'removido']
+    tabela = ReplicaId.__table__
+    if presentes: db.session.execute(sqlite_insert(tabela).on_conflict_do_nothing(), presentes)
+    if removidos:
+        db.session.execute(tabela.delete().where(tabela.c.recurso == db.bindparam('r'), tabela.c.id == db.bindparam('i')), removidos)
+    return [(r['r'], r['i']) for r in removidos]
+
+def _sincronizar(sessao, eu):
+    cursor = ReplicaCursor.__table__
+    seq = db.session.scalar(db.select(cursor.c.seq).where(cursor.c.fonte == FONTE))
+    resp = sessao.get(f'{GER_URL}/changes', params={'since': seq, 'limit': LOTE, 'wait': ESPERA}, timeout=(1, ESPERA + 5))
+    resp.raise_for_status()
+    dados = resp.json()
+    mudancas = dados['mudancas']
+    valores = {}
+    removidos = []
+    if dados['ultimo_seq'] < seq:
+        # banco do Gerenciamento recriado: a réplica recomeça do zero
+        logger.warning('Réplica: feed voltou de %s para %s, reconstruindo', seq, dados['ultimo_seq'])
+        db.session.execute(ReplicaId.__table__.delete())
+        valores = {'seq': 0, 'sincronizado_em': None}
+    else:
+        removidos = _aplicar(mudancas)
+        if mudancas: valores['seq'] = mudancas[-1]['seq']
+        # em dia só quando o lote não veio cheio
+        if len(mudancas) < LOTE: valores['sincronizado_em'] = time.time()
+    if valores:
+        resultado = db.session.execute(cursor.update().where(cursor.c.fonte == FONTE, cursor.c.dono == eu).values(**valores))
+        # outro worker assumiu o lease durante o poll: ele aplica
+        if resultado.rowcount != 1:
+            db.session.rollback()
+            return
+    db.session.commit()
+    if mudancas: metricas.contar('replica_mudancas_total', len(mudancas))
+    if removidos:
+        for chamada in ao_remover: chamada(removidos)
+
+def _consumir(app):
+    eu = f'{socket.gethostname()}:{os.getpid()}'
+    # sessão própria: o long-poll não ocupa conexões do pool das validações
+    sessao = requests.Session()
+    falhas = 0
+    with app.app_context():
+        while True:
+            try:
+                if _lider(eu):
+                    _sincronizar(sessao, eu)
+                else:
+                    time.sleep(ESPERA)
+                falhas = 0
+            except Exception:
+                db.session.rollback()
+                falhas += 1
+                logger.warning('Réplica: falha ao consumir o feed do Gerenciamento (tentativa %d)', falhas, exc_info=falhas == 1)
+                time.sleep(min(30, 2 ** falhas))
+
+def _iniciar():
+    # depois do fork: uma thread consumidora por worker
+    pid = os.getpid()
+    if _estado['pid'] == pid: return
+    with _lock:
+        if _estado['pid'] == pid: return
+        _estado['pid'] = pid
+    threading.Thread(target=_consumir, args=(_estado['app'],), name='replica', daemon=True).start()
+
+def instalar(app):
+    if not ATIVO: return
+    _estado['app'] = app
+    with app.app_context():
+        _estado['engine'] = db.engine
+    app.before_request(_iniciar)
+    _iniciar()
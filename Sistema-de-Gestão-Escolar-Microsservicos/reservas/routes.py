@@ -1,13 +1,20 @@
 from flask import Blueprint, request, jsonify
 from controllers import reservas_controller as controller
-import os
+import listagem
+import versoes
 import requests
+import gerenciamento_client as ger
+import replica
+import exportacao
 bp = Blueprint('reservas', __name__)
-GER_URL = os.environ.get('GERENCIAMENTO_URL','http://gerenciamento:5000')
 
 def json_error(message, code):
     return jsonify({'error': message}), code
 
+def resumo_lote(resultados):
+    criados = sum(1 for r in resultados if r['status'] == 201)
+    return {'criados': criados, 'rejeitados': len(resultados) - criados, 'resultados': resultados}
+
 @bp.route('/status', methods=['GET'])
 def status():
     """Status do serviço de Reservas
@@ -23,13 +30,210 @@ def status():
             status:
               type: string
               example: ok
+              description: "degradado enquanto o circuito do Gerenciamento não estiver fechado"
+            gerenciamento:
+              type: object
+              description: Estado do circuit breaker das chamadas ao Gerenciamento (neste worker)
+              properties:
+                estado:
+                  type: string
+                  enum: [fechado, aberto, meio-aberto]
+                chamadas_na_janela:
+                  type: integer
+                taxa_erro:
+                  type: number
+                taxa_lentas:
+                  type: number
+                reabre_em_s:
+                  type: number
+                aberturas:
+                  type: integer
+                rejeitadas:
+                  type: integer
+                limites:
+                  type: object
+                politica_degradada:
+                  type: string
+                  enum: [falhar, cache]
+            replica:
+              type: object
+              description: Réplica local dos ids do Gerenciamento (REPLICA_GERENCIAMENTO=1)
+              properties:
+                ativa:
+                  type: boolean
+                seq:
+                  type: integer
+                em_dia:
+                  type: boolean
+                sincronizado_ha_s:
+                  type: number
+                consumidor:
+                  type: string
+    """
+    disjuntor = ger.estado_disjuntor()
+    estado = 'ok' if disjuntor['estado'] == 'fechado' else 'degradado'
+    return jsonify({'service':'reservas','status':estado,'gerenciamento':disjuntor,'replica':replica.estado()}),200
+
+@bp.route('/cache/validacao', methods=['GET'])
+def cache_validacao():
+    """Estatísticas do cache local de ids validados no Gerenciamento
+    ---
+    responses:
+      200:
+        description: Contadores do cache
+        schema:
+          type: object
+          properties:
+            entradas:
+              type: integer
+            hits:
+              type: integer
+            misses:
+              type: integer
+            hit_ratio:
+              type: number
     """
-    return jsonify({'service':'reservas','status':'ok'}),200
+    return jsonify(ger.cache_validacao.stats()),200
+
+@bp.route('/cache/validacao', methods=['DELETE'])
+def purgar_cache_validacao():
+    """Remove entradas do cache local de ids validados
+    ---
+    parameters:
+      - name: recurso
+        in: query
+        type: string
+        enum: [turmas, professores]
+        required: false
+        description: Recurso da entrada a remover (sem ele o cache inteiro é limpo)
+      - name: id
+        in: query
+        type: integer
+        required: false
+        description: ID da entrada a remover
+    responses:
+      200:
+        description: Quantidade de entradas removidas
+      400:
+        description: recurso informado sem id
+    """
+    recurso = request.args.get('recurso'); rid = request.args.get('id')
+    if recurso and not rid: return json_error('id obrigatório quando recurso é informado', 400)
+    return jsonify({'removidas': ger.purgar_cache(recurso, rid)}),200
+
+@bp.route('/salas/disponiveis', methods=['GET'])
+@versoes.condicional('reserva')
+def salas_disponiveis():
+    """Salas com horário livre numa janela de tempo
+    ---
+    parameters:
+      - name: inicio
+        in: query
+        type: string
+        format: date-time
+        required: true
+        description: Início da janela (ISO 8601, horário local)
+        example: "2025-11-20T08:00"
+      - name: fim
+        in: query
+        type: string
+        format: date-time
+        required: true
+        description: Fim da janela (até 31 dias após o início)
+        example: "2025-11-20T18:00"
+      - name: lab
+        in: query
+        type: boolean
+        required: false
+        description: Apenas laboratórios (true) ou apenas salas comuns (false)
+    responses:
+      200:
+        description: Salas com ao menos um intervalo livre na janela (livre=true quando a janela inteira está livre)
+        schema:
+          type: object
+          properties:
+            inicio:
+              type: string
+              format: date-time
+            fim:
+              type: string
+              format: date-time
+            salas:
+              type: array
+              items:
+                type: object
+                properties:
+                  num_sala:
+                    type: string
+                  lab:
+                    type: boolean
+                  livre:
+                    type: boolean
+                  intervalos_livres:
+                    type: array
+                    items:
+                      type: object
+                      properties:
+                        inicio:
+                          type: string
+                          format: date-time
+                        fim:
+                          type: string
+                          format: date-time
+      400:
+        description: Janela ausente ou inválida
+    """
+    inicio = request.args.get('inicio'); fim = request.args.get('fim')
+    if not inicio or not fim: return json_error('inicio e fim obrigatórios', 400)
+    lab = request.args.get('lab')
+    if lab is not None:
+        if lab.lower() not in ('true', 'false', '1', '0'): return json_error('lab deve ser true ou false', 400)
+        lab = lab.lower() in ('true', '1')
+    try:
+        salas = controller.disponibilidade(inicio, fim, lab)
+    except controller.DadosInvalidos as e:
+        return json_error(str(e), 400)
+    return jsonify({'inicio': controller.data_hora(inicio, 'inicio'), 'fim': controller.data_hora(fim, 'fim'), 'salas': salas}),200
 
 @bp.route('/reservas', methods=['GET'])
+@versoes.condicional('reserva')
 def listar():
     """Lista todas as reservas de sala
     ---
+    parameters:
+      - name: after_id
+        in: query
+        type: integer
+        required: false
+        description: Retorna apenas registros com id maior que este (cursor da página anterior)
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Tamanho máximo da página (até 1000); havendo mais registros o cursor vem no header X-Next-After-Id
+      - name: turma_id
+        in: query
+        type: integer
+        required: false
+        description: Filtra pela turma
+      - name: num_sala
+        in: query
+        type: string
+        required: false
+        description: Filtra pela sala
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: Lista de campos separados por vírgula a incluir na resposta (ex. id,nome)
+      - name: stream
+        in: query
+        type: boolean
+        required: false
+        description: Envia todos os registros como NDJSON em blocos (o mesmo que Accept application/x-ndjson)
+    produces:
+      - application/json
+      - application/x-ndjson
     responses:
       200:
         description: Lista de reservas
@@ -47,12 +251,78 @@ def listar():
               data:
                 type: string
                 format: date
+              inicio:
+                type: string
+                format: date-time
+              fim:
+                type: string
+                format: date-time
               turma_id:
                 type: integer
+      400:
+        description: Parâmetros de listagem inválidos
+    """
+    try:
+        params = listagem.parametros(request.args, {'turma_id': int, 'num_sala': str})
+        if listagem.quer_stream(request):
+            return listagem.resposta_stream(controller.stream_reservas(**params)), 200
+        linhas, proximo = controller.listar_reservas(**params)
+    except listagem.ParametroInvalido as e:
+        return json_error(str(e), 400)
+    return listagem.resposta(linhas, proximo), 200
+
+@bp.route('/export/reservas.csv', methods=['GET'])
+def exportar():
+    """Exporta as reservas em CSV, gerado linha a linha (chunked, gzip com Accept-Encoding gzip)
+    ---
+    parameters:
+      - name: de
+        in: query
+        type: string
+        format: date
+        required: false
+        description: Apenas reservas a partir desta data (inclusive)
+        example: "2025-11-01"
+      - name: ate
+        in: query
+        type: string
+        format: date
+        required: false
+        description: Apenas reservas até esta data (inclusive)
+        example: "2025-11-30"
+      - name: num_sala
+        in: query
+        type: string
+        required: false
+        description: Filtra pela sala
+      - name: separador
+        in: query
+        type: string
+        enum: [",", ";"]
+        required: false
+        description: Separador de campos (com ; os decimais usam vírgula)
+      - name: gzip
+        in: query
+        type: string
+        enum: ["0"]
+        required: false
+        description: 0 desliga a compressão mesmo com Accept-Encoding gzip
+    produces:
+      - text/csv
+    responses:
+      200:
+        description: "CSV com as colunas id, num_sala, lab, data, inicio, fim, turma_id, ordenado por data"
+      400:
+        description: Data ou separador inválido
     """
-    return jsonify([r.to_dict() for r in controller.listar_reservas()]),200
+    try:
+        stmt = controller.exportar_reservas(request.args.get('de'), request.args.get('ate'), request.args.get('num_sala'))
+        return exportacao.resposta_csv('reservas.csv', stmt)
+    except (controller.DadosInvalidos, listagem.ParametroInvalido) as e:
+        return json_error(str(e), 400)
 
 @bp.route('/reservas/<int:rid>', methods=['GET'])
+@versoes.condicional('reserva')
 def obter(rid):
     """Obter uma reserva específica pelo ID
     ---
@@ -77,6 +347,12 @@ def obter(rid):
             data:
               type: string
               format: date
+            inicio:
+              type: string
+              format: date-time
+            fim:
+              type: string
+              format: date-time
             turma_id:
               type: integer
       404:
@@ -84,7 +360,7 @@ def obter(rid):
     """
     r = controller.get_reserva_by_id(rid)
     if not r: return json_error('Reserva não encontrada', 404)
-    return jsonify(r.to_dict()),200
+    return jsonify(r),200
 
 @bp.route('/reservas', methods=['POST'])
 def criar():
@@ -97,7 +373,6 @@ def criar():
           type: object
           required:
             - num_sala
-            - data
             - turma_id
           properties:
             num_sala:
@@ -110,6 +385,15 @@ def criar():
               type: string
               format: date
               example: "2025-11-20"
+              description: Opcional quando inicio/fim são informados (é sempre o dia do início; diferente dele responde 400); sem inicio/fim a reserva ocupa o dia todo
+            inicio:
+              type: string
+              format: date-time
+              example: "2025-11-20T08:00"
+            fim:
+              type: string
+              format: date-time
+              example: "2025-11-20T10:00"
             turma_id:
               type: integer
     responses:
@@ -117,6 +401,8 @@ def criar():
         description: Reserva criada com sucesso
       400:
         description: Dados inválidos ou turma não encontrada
+      409:
+        description: Sala já reservada em horário que se sobrepõe ao pedido
       503:
         description: Erro ao contactar serviço de gerenciamento
     """
@@ -124,13 +410,85 @@ def criar():
     turma_id = data.get('turma_id')
     if not turma_id: return json_error('turma_id obrigatório', 400)
     try:
-        resp = requests.get(f"{GER_URL}/turmas/{turma_id}", timeout=3)
+        existe = ger.turma_existe(turma_id)
     except requests.RequestException:
         return json_error('Falha ao contactar gerenciamento', 503)
-    if resp.status_code != 200: return json_error('Turma inexistente', 400)
-    r = controller.criar_reserva(data)
+    if not existe: return json_error('Turma inexistente', 400)
+    try:
+        r = controller.criar_reserva(data)
+    except controller.DadosInvalidos as e:
+        return json_error(str(e), 400)
+    except controller.ConflitoDeReserva as e:
+        return jsonify({'error': str(e), 'conflito_com': e.reserva_id}),409
     return jsonify(r.to_dict()),201
 
+@bp.route('/reservas/bulk', methods=['POST'])
+def criar_lote():
+    """Criar várias reservas de sala numa única transação
+    ---
+    parameters:
+      - in: body
+        name: body
+        schema:
+          type: array
+          maxItems: 5000
+          items:
+            type: object
+            required:
+              - num_sala
+              - turma_id
+            properties:
+              num_sala:
+                type: string
+              lab:
+                type: boolean
+              data:
+                type: string
+              inicio:
+                type: string
+                format: date-time
+              fim:
+                type: string
+                format: date-time
+              turma_id:
+                type: integer
+    responses:
+      200:
+        description: Resultado por item (201 com o id criado, 400 com o erro ou 409 quando a sala já está reservada no horário)
+        schema:
+          type: object
+          properties:
+            criados:
+              type: integer
+            rejeitados:
+              type: integer
+            resultados:
+              type: array
+              items:
+                type: object
+                properties:
+                  indice:
+                    type: integer
+                  status:
+                    type: integer
+                  id:
+                    type: integer
+                  error:
+                    type: string
+      400:
+        description: Corpo não é uma lista ou excede o tamanho máximo
+      503:
+        description: Erro ao contactar serviço de gerenciamento
+    """
+    itens = request.get_json(silent=True)
+    if not isinstance(itens, list) or not itens: return json_error('envie uma lista não vazia', 400)
+    if len(itens) > controller.MAX_ITENS_LOTE: return json_error(f'máximo de {controller.MAX_ITENS_LOTE} itens por lote', 400)
+    try:
+        inexistentes = ger.validar_lote(turmas=[i.get('turma_id') for i in itens if isinstance(i, dict) and isinstance(i.get('turma_id'), int)])
+    except requests.RequestException:
+        return json_error('Falha ao contactar gerenciamento', 503)
+    return jsonify(resumo_lote(controller.criar_reservas_lote(itens, inexistentes['turmas']))),200
+
 @bp.route('/reservas/<int:rid>', methods=['PUT'])
 def atualizar(rid):
     """Atualizar uma reserva existente
@@ -153,6 +511,12 @@ def atualizar(rid):
             data:
               type: string
               format: date
+            inicio:
+              type: string
+              format: date-time
+            fim:
+              type: string
+              format: date-time
             turma_id:
               type: integer
     responses:
@@ -162,6 +526,8 @@ def atualizar(rid):
         description: Dados inválidos ou turma não encontrada
       404:
         description: Reserva não encontrada
+      409:
+        description: Sala já reservada em horário que se sobrepõe ao pedido
       503:
         description: Erro ao contactar serviço de gerenciamento
     """
@@ -169,11 +535,16 @@ def atualizar(rid):
     turma_id = data.get('turma_id')
     if turma_id:
         try:
-            resp = requests.get(f"{GER_URL}/turmas/{turma_id}", timeout=3)
+            existe = ger.turma_existe(turma_id)
         except requests.RequestException:
-            return jsonify({'error':'Falha ao contactar gerenciamento'}),503
-        if resp.status_code != 200: return jsonify({'error':'Turma inexistente'}),400
-    r = controller.atualizar_reserva(rid, data)
+            return json_error('Falha ao contactar gerenciamento', 503)
+        if not existe: return json_error('Turma inexistente', 400)
+    try:
+        r = controller.atualizar_reserva(rid, data)
+    except controller.DadosInvalidos as e:
+        return json_error(str(e), 400)
+    except controller.ConflitoDeReserva as e:
+        return jsonify({'error': str(e), 'conflito_com': e.reserva_id}),409
     if not r: return json_error('Reserva não encontrada', 404)
     return jsonify(r.to_dict()),200
 
@@ -0,0 +1,60 @@
+"""Tempo de boot e memória de um worker por modo de documentação (DOCS_MODO).
+
+Para cada serviço e modo, importa o app num processo novo (o que o gunicorn
+faz em cada worker) e mede o tempo de import, a memória residente máxima, se o
+flasgger foi carregado, o tempo da primeira e das seguintes requisições a
+/apispec_1.json e a latência média de /status.
+
+Uso: python scripts/bench_boot.py [--servico gerenciamento] [--repeticoes 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+SERVICOS = ('gerenciamento', 'reservas', 'atividades')
+MODOS = ('flasgger', 'estatico', 'off')
+
+MEDIR = r"""
+import json, resource, sys, time
+inicio = time.perf_counter()
+import app
+boot = time.perf_counter() - inicio
+cliente = app.app.test_client()
+inicio = time.perf_counter(); primeira = cliente.get('/apispec_1.json').status_code; spec1 = time.perf_counter() - inicio
+inicio = time.perf_counter()
+for _ in range(20): cliente.get('/apispec_1.json')
+spec = (time.perf_counter() - inicio) / 20
+inicio = time.perf_counter()
+for _ in range(200): cliente.get('/status')
+status = (time.perf_counter() - inicio) / 200
+print(json.dumps({'boot': boot, 'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                  'flasgger': 'flasgger' in sys.modules, 'spec_status': primeira, 'spec1': spec1, 'spec': spec, 'status': status}))
+"""
+
+def medir(servico, modo):
+    env = dict(os.environ, DOCS_MODO=modo, DB_FILE=os.path.join(tempfile.mkdtemp(), f'{servico}.db'))
+    saida = subprocess.run([sys.executable, '-c', MEDIR], cwd=os.path.join(AQUI, '..', servico), env=env,
+                           capture_output=True, text=True, check=True).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--servico', choices=SERVICOS)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+    print(f"{'serviço':<14}{'modo':<10}{'boot ms':>9}{'RSS MB':>9}{'flasgger':>10}{'spec 1ª ms':>12}{'spec ms':>9}{'/status ms':>12}")
+    for servico in ([args.servico] if args.servico else SERVICOS):
+        for modo in MODOS:
+            medidas = [medir(servico, modo) for _ in range(args.repeticoes)]
+            mediana = lambda campo: statistics.median(m[campo] for m in medidas)
+            spec = f"{mediana('spec1') * 1000:12.2f}{mediana('spec') * 1000:9.2f}" if medidas[0]['spec_status'] == 200 else f"{'-':>12}{'-':>9}"
+            print(f"{servico:<14}{modo:<10}{mediana('boot') * 1000:9.0f}{mediana('rss'):9.1f}{str(medidas[0]['flasgger']):>10}"
+                  f"{spec}{mediana('status') * 1000:12.3f}")
+
+if __name__ == '__main__':
+    main()
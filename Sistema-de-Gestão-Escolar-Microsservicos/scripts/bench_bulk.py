@@ -0,0 +1,60 @@
+"""Benchmark de carga em massa: POST por linha x endpoint /bulk.
+
+Roda o serviço escolhido em processo (test client do Flask) sobre um SQLite
+temporário, com o stub local no lugar do Gerenciamento, e compara linhas/s.
+
+Uso: python scripts/bench_bulk.py --servico atividades --n 2000 --lote 1000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, AQUI)
+
+import stub_gerenciamento
+
+CENARIOS = {
+    'atividades': ('/notas', lambda i: {'nota': i % 11, 'aluno_id': i % 500 + 1, 'atividade_id': 1}),
+    'gerenciamento': ('/alunos', lambda i: {'nome': f'Aluno {i}', 'idade': 15, 'turma_id': None}),
+    'reservas': ('/reservas', lambda i: {'num_sala': str(100 + i % 30), 'data': '2025-11-20', 'turma_id': i % 500 + 1}),
+}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--servico', choices=sorted(CENARIOS), default='atividades')
+    parser.add_argument('--n', type=int, default=2000)
+    parser.add_argument('--lote', type=int, default=1000)
+    args = parser.parse_args()
+
+    servidor = stub_gerenciamento.iniciar()
+    tmp = tempfile.mkdtemp()
+    os.environ['GERENCIAMENTO_URL'] = servidor.url
+    os.environ['DB_FILE'] = os.path.join(tmp, f'{args.servico}.db')
+    sys.path.insert(0, os.path.join(AQUI, '..', args.servico))
+    import app
+    cliente = app.app.test_client()
+    if args.servico == 'atividades':
+        cliente.post('/atividades', json={'titulo': 'Prova', 'peso_porcento': 100, 'turma_id': 1, 'professor_id': 1})
+
+    rota, item = CENARIOS[args.servico]
+    inicio = time.perf_counter()
+    for i in range(args.n):
+        assert cliente.post(rota, json=item(i)).status_code == 201
+    por_linha = args.n / (time.perf_counter() - inicio)
+
+    itens = [item(i) for i in range(args.n)]
+    inicio = time.perf_counter()
+    for i in range(0, args.n, args.lote):
+        resp = cliente.post(f'{rota}/bulk', json=itens[i:i + args.lote])
+        assert resp.get_json()['rejeitados'] == 0
+    em_lote = args.n / (time.perf_counter() - inicio)
+
+    print(f"{args.servico}: por linha {por_linha:9.0f} linhas/s | bulk (lote {args.lote}) {em_lote:9.0f} linhas/s "
+          f"| {em_lote / por_linha:.1f}x")
+    servidor.shutdown()
+
+if __name__ == '__main__':
+    main()
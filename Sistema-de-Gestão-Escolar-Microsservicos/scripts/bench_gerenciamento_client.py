@@ -0,0 +1,60 @@
+"""Benchmark do cliente de Gerenciamento: requests.get avulso x Session com pool.
+
+Sobe o stub local, faz as mesmas validações de turma pelos dois caminhos e
+mostra latência e quantas conexões TCP o stub aceitou em cada um.
+
+Uso: python scripts/bench_gerenciamento_client.py --n 2000 --threads 4
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, AQUI)
+sys.path.insert(0, os.path.join(AQUI, '..', 'reservas'))
+
+import requests
+import stub_gerenciamento
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+def medir(nome, chamada, n, threads, servidor):
+    servidor.conexoes = 0
+    latencias = []
+    def uma(i):
+        inicio = time.perf_counter()
+        chamada(i % servidor.total + 1)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(uma, range(n)))
+    total = time.perf_counter() - inicio
+    print(f"{nome:<10} req/s={n / total:8.0f}  p50={_percentil(latencias, 50):6.2f}ms  "
+          f"p99={_percentil(latencias, 99):6.2f}ms  media={statistics.mean(latencias):6.2f}ms  "
+          f"conexoes={servidor.conexoes}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--n', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--delay-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    servidor = stub_gerenciamento.iniciar(delay_ms=args.delay_ms)
+    os.environ['GERENCIAMENTO_URL'] = servidor.url
+    os.environ.setdefault('GER_POOL_SIZE', str(args.threads))
+    import gerenciamento_client as ger
+
+    medir('sem pool', lambda tid: requests.get(f"{servidor.url}/turmas/{tid}", timeout=3),
+          args.n, args.threads, servidor)
+    medir('com pool', ger.turma_existe, args.n, args.threads, servidor)
+    print('estatisticas do cliente:', ger.estatisticas())
+    servidor.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark da importação de notas por CSV (POST /notas/import) contra um POST /notas por linha.
+
+Gera um CSV com N linhas (1 milhão por padrão, ~1% com aluno inexistente), sobe o stub do
+Gerenciamento e um banco temporário do Atividades com 100 atividades, envia o arquivo em fluxo
+pelo test client e mede linhas/s e o pico de memória do processo. O caminho antigo (um POST
+/notas por linha) é medido numa amostra de --amostra linhas e extrapolado.
+
+Uso: python scripts/bench_importacao.py --n 1000000 --lote 5000
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+ALUNOS = 5000
+
+def gerar_csv(caminho, n):
+    aleatorio = random.Random(42)
+    with open(caminho, 'w', newline='') as f:
+        f.write('aluno_id,atividade_id,nota\n')
+        for _ in range(n):
+            # ~1% aponta para alunos fora do stub (rejeitados como inexistentes)
+            aluno = aleatorio.randint(1, int(ALUNOS * 1.01))
+            f.write(f'{aluno},{aleatorio.randint(1, 100)},{aleatorio.randint(0, 100) / 10}\n')
+
+def pico_mb():
+    # ru_maxrss em KB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--n', type=int, default=1000000)
+    parser.add_argument('--lote', type=int, default=5000, help='linhas por transação')
+    parser.add_argument('--amostra', type=int, default=2000, help='linhas enviadas uma a uma no caminho antigo')
+    args = parser.parse_args()
+
+    sys.path.insert(0, AQUI)
+    import stub_gerenciamento
+    stub = stub_gerenciamento.iniciar(total=ALUNOS)
+    pasta = tempfile.mkdtemp()
+    os.environ.update(GERENCIAMENTO_URL=stub.url, DB_FILE=os.path.join(pasta, 'atividades.db'), METRICAS_DIR=pasta)
+    sys.path.insert(0, os.path.join(AQUI, '..', 'atividades'))
+    import app
+    cliente = app.app.test_client()
+    for i in range(100):
+        cliente.post('/atividades', json={'titulo': f'Atividade {i}', 'peso_porcento': 10, 'turma_id': i % 20 + 1, 'professor_id': 1})
+
+    csv_path = os.path.join(pasta, 'notas.csv')
+    inicio = time.perf_counter()
+    gerar_csv(csv_path, args.n)
+    print(f'CSV com {args.n} linhas ({os.path.getsize(csv_path) / 1e6:.1f} MB) gerado em {time.perf_counter() - inicio:.1f}s')
+
+    memoria_antes = pico_mb()
+    inicio = time.perf_counter()
+    with open(csv_path, 'rb') as f:
+        resp = cliente.post(f'/notas/import?lote={args.lote}', data=f, content_type='text/csv')
+    segundos = time.perf_counter() - inicio
+    relatorio = resp.get_json()
+    print(f"POST /notas/import: {resp.status_code}, {relatorio['importadas']} importadas, {relatorio['rejeitadas']} rejeitadas "
+          f"em {segundos:.1f}s = {args.n / segundos:.0f} linhas/s; pico de memória {pico_mb():.0f} MB (antes {memoria_antes:.0f} MB); "
+          f"requisições ao Gerenciamento: {stub.requisicoes}")
+
+    linhas = []
+    with open(csv_path) as f:
+        next(f)
+        for _ in range(args.amostra):
+            aluno, atividade, nota = next(f).strip().split(',')
+            linhas.append({'aluno_id': int(aluno), 'atividade_id': int(atividade), 'nota': float(nota)})
+    inicio = time.perf_counter()
+    for linha in linhas:
+        cliente.post('/notas', json=linha)
+    por_linha = (time.perf_counter() - inicio) / args.amostra
+    print(f'POST /notas por linha: {1 / por_linha:.0f} linhas/s na amostra de {args.amostra}; '
+          f'{args.n} linhas levariam ~{args.n * por_linha:.0f}s ({por_linha * args.n / segundos:.0f}x)')
+
+if __name__ == '__main__':
+    main()
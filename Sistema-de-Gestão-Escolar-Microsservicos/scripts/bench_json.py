@@ -0,0 +1,76 @@
+"""Benchmark do caminho de leitura de GET /notas: ORM + to_dict x Core, json da stdlib x orjson.
+
+Cria um banco temporário do Atividades com N notas (500 mil por padrão) e mede,
+para a tabela inteira, o tempo de montar as linhas e serializar a resposta em
+cada combinação, além da rota completa pelo test client com cada provider.
+
+Uso: python scripts/bench_json.py --n 500000 --repeticoes 3
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+
+def popular(caminho, n):
+    conn = sqlite3.connect(caminho)
+    conn.executemany('INSERT INTO atividade (titulo, peso_porcento, turma_id, professor_id) VALUES (?, ?, ?, ?)',
+                     ((f'Atividade {i}', 10, i % 20 + 1, 1) for i in range(100)))
+    conn.executemany('INSERT INTO nota (nota, aluno_id, atividade_id) VALUES (?, ?, ?)',
+                     ((i % 101 / 10, i % 5000 + 1, i % 100 + 1) for i in range(n)))
+    conn.commit()
+    conn.close()
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        tamanho = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos), tamanho
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--n', type=int, default=500000)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ['DB_FILE'] = os.path.join(tempfile.mkdtemp(), 'atividades.db')
+    os.environ['RESPOSTA_CACHE'] = 'off'
+    sys.path.insert(0, os.path.join(AQUI, '..', 'atividades'))
+    import app
+    import json_provider
+    import listagem
+    from models.models import Nota
+    from database import db
+    popular(os.environ['DB_FILE'], args.n)
+
+    stdlib = json_provider.JSONProvider(app.app)
+    rapido = json_provider.JSONProviderRapido(app.app) if json_provider.orjson else None
+    orm = lambda: [n.to_dict() for n in Nota.query.all()]
+    core = lambda: listagem.listar(Nota)[0]
+    cenarios = [('ORM + to_dict + stdlib', orm, stdlib), ('Core + stdlib', core, stdlib)]
+    if rapido: cenarios += [('ORM + to_dict + orjson', orm, rapido), ('Core + orjson', core, rapido)]
+
+    print(f'{args.n} notas, mediana de {args.repeticoes} execuções')
+    with app.app.app_context():
+        for nome, linhas, provider in cenarios:
+            def executar():
+                corpo = provider.response(linhas()).get_data()
+                db.session.expunge_all()
+                return len(corpo)
+            segundos, tamanho = medir(executar, args.repeticoes)
+            print(f'{nome:<26} {segundos * 1000:9.0f} ms  {args.n / segundos:10.0f} linhas/s  {tamanho / 1e6:6.1f} MB')
+    cliente = app.app.test_client()
+    for nome, provider in (('rota GET /notas stdlib', stdlib), ('rota GET /notas orjson', rapido)):
+        if provider is None: continue
+        app.app.json = provider
+        segundos, tamanho = medir(lambda: len(cliente.get('/notas').data), args.repeticoes)
+        print(f'{nome:<26} {segundos * 1000:9.0f} ms  {args.n / segundos:10.0f} linhas/s  {tamanho / 1e6:6.1f} MB')
+
+if __name__ == '__main__':
+    main()
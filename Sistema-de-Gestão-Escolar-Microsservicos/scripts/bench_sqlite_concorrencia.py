@@ -0,0 +1,81 @@
+"""Benchmark de leituras concorrentes com escritas: perfil padrão x perfil de produção do SQLite.
+
+Um processo escritor faz transações longas enquanto N processos leitores
+consultam a mesma tabela. Para cada perfil mostra a latência das leituras e
+quantas falharam com "database is locked".
+
+Uso: python scripts/bench_sqlite_concorrencia.py --leitores 4 --segundos 5
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(AQUI, '..', 'gerenciamento'))
+
+import database
+
+def _conectar(caminho, producao):
+    conn = sqlite3.connect(caminho, timeout=float(database.PRAGMAS['busy_timeout']) / 1000, isolation_level=None)
+    if producao: database.aplicar_pragmas(conn)
+    return conn
+
+def escritor(caminho, producao, fim):
+    conn = _conectar(caminho, producao)
+    while time.time() < fim:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.executemany('INSERT INTO aluno (nome, idade) VALUES (?, ?)', (('x' * 50, i) for i in range(50000)))
+        time.sleep(0.05)
+        conn.execute('COMMIT')
+
+def leitor(caminho, producao, fim, fila):
+    conn = _conectar(caminho, producao)
+    latencias, erros = [], 0
+    while time.time() < fim:
+        inicio = time.perf_counter()
+        try:
+            conn.execute('SELECT nome FROM aluno WHERE id = ?', (random.randint(1, 1000),)).fetchone()
+            latencias.append((time.perf_counter() - inicio) * 1000)
+        except sqlite3.OperationalError:
+            erros += 1
+    fila.put((latencias, erros))
+
+def _percentil(valores, p):
+    if not valores: return float('nan')
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+def rodar(producao, leitores, segundos):
+    caminho = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    conn = _conectar(caminho, producao)
+    conn.execute('CREATE TABLE aluno (id INTEGER PRIMARY KEY, nome TEXT, idade INTEGER)')
+    conn.executemany('INSERT INTO aluno (nome, idade) VALUES (?, ?)', (('x' * 50, i) for i in range(1000)))
+    conn.close()
+    fim = time.time() + segundos
+    fila = multiprocessing.Queue()
+    processos = [multiprocessing.Process(target=escritor, args=(caminho, producao, fim))]
+    processos += [multiprocessing.Process(target=leitor, args=(caminho, producao, fim, fila)) for _ in range(leitores)]
+    for p in processos: p.start()
+    resultados = [fila.get() for _ in range(leitores)]
+    for p in processos: p.join()
+    latencias = [l for r in resultados for l in r[0]]
+    erros = sum(r[1] for r in resultados)
+    nome = 'producao' if producao else 'padrao'
+    print(f"{nome:<9} leituras/s={len(latencias) / segundos:9.0f}  p50={_percentil(latencias, 50):7.2f}ms  "
+          f"p99={_percentil(latencias, 99):7.2f}ms  max={max(latencias, default=float('nan')):8.2f}ms  bloqueadas={erros}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--leitores', type=int, default=4)
+    parser.add_argument('--segundos', type=float, default=5)
+    args = parser.parse_args()
+    rodar(False, args.leitores, args.segundos)
+    rodar(True, args.leitores, args.segundos)
+
+if __name__ == '__main__':
+    main()
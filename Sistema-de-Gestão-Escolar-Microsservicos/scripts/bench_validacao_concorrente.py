@@ -0,0 +1,53 @@
+"""Benchmark da validação de turma + professor em atividades: sequencial x concorrente.
+
+Sobe o stub local com atraso fixo por resposta e mede p50/p99 das duas
+formas de validar, sempre com o cache de validação vazio.
+
+Uso: python scripts/bench_validacao_concorrente.py --n 200 --delay-ms 20
+"""
+import argparse
+import os
+import sys
+import time
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, AQUI)
+sys.path.insert(0, os.path.join(AQUI, '..', 'atividades'))
+
+import stub_gerenciamento
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+def medir(nome, validar, n, ger):
+    latencias = []
+    for i in range(n):
+        ger.purgar_cache()
+        inicio = time.perf_counter()
+        validar(i % 100 + 1)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    print(f"{nome:<12} p50={_percentil(latencias, 50):7.2f}ms  p99={_percentil(latencias, 99):7.2f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--n', type=int, default=200)
+    parser.add_argument('--delay-ms', type=float, default=20)
+    args = parser.parse_args()
+
+    servidor = stub_gerenciamento.iniciar(delay_ms=args.delay_ms)
+    os.environ['GERENCIAMENTO_URL'] = servidor.url
+    import gerenciamento_client as ger
+
+    def sequencial(rid):
+        return ger.turma_existe(rid) and ger.professor_existe(rid)
+
+    def concorrente(rid):
+        return ger.verificar_referencias(turmas=rid, professores=rid) is None
+
+    medir('sequencial', sequencial, args.n, ger)
+    medir('concorrente', concorrente, args.n, ger)
+    servidor.shutdown()
+
+if __name__ == '__main__':
+    main()
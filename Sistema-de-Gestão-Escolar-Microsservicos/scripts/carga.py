@@ -0,0 +1,270 @@
+"""Teste de carga ponta a ponta dos três serviços.
+
+Sobe Gerenciamento, Reservas e Atividades como processos locais (gunicorn, se
+instalado e pedido com --gunicorn, ou o servidor threaded do werkzeug) sobre
+bancos SQLite temporários, popula volumes realistas pelas rotas de lote e roda
+cenários mistos de leitura/escrita com N usuários simultâneos:
+
+  reservas   corrida por salas: cria reservas em horários disputados e consulta salas livres
+  notas      lançamento de notas: notas unitárias e em lote, boletim da turma
+  dashboard  painéis consultando listagens e boletins a cada poucos segundos (com If-None-Match)
+  misto      os três juntos
+
+Mostra throughput e p50/p95/p99 por endpoint e grava o resultado em JSON
+(--saida) para comparar entre commits (--comparar resultado-anterior.json).
+Com --stub o Gerenciamento é substituído por scripts/stub_gerenciamento.py.
+
+Uso: python scripts/carga.py --cenario misto --usuarios 8 --duracao 20 --saida carga.json
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.join(AQUI, '..')
+sys.path.insert(0, AQUI)
+
+import stub_gerenciamento
+
+PORTAS = {'gerenciamento': 5600, 'reservas': 5601, 'atividades': 5602}
+SERVIDOR_WERKZEUG = ("import app, sys; from werkzeug.serving import make_server; "
+                     "make_server('127.0.0.1', int(sys.argv[1]), app.app, threaded=True).serve_forever()")
+
+# Processos dos serviços
+def iniciar_servico(servico, porta, tmp, env_extra, gunicorn, workers):
+    env = dict(os.environ, DB_FILE=os.path.join(tmp, f'{servico}.db'), DOCS_MODO='off',
+               METRICAS_DIR=os.path.join(tmp, f'metricas-{servico}'), **env_extra)
+    if gunicorn:
+        comando = ['gunicorn', 'app:app', '--bind', f'127.0.0.1:{porta}', '--workers', str(workers), '--log-level', 'warning']
+    else:
+        comando = [sys.executable, '-c', SERVIDOR_WERKZEUG, str(porta)]
+    log = open(os.path.join(tmp, f'{servico}.log'), 'w')
+    processo = subprocess.Popen(comando, cwd=os.path.join(RAIZ, servico), env=env, stdout=log, stderr=subprocess.STDOUT)
+    url = f'http://127.0.0.1:{porta}'
+    limite = time.time() + 30
+    while time.time() < limite:
+        if processo.poll() is not None: raise RuntimeError(f'{servico} terminou na inicialização (ver {log.name})')
+        try:
+            if requests.get(f'{url}/status', timeout=1).status_code == 200: return processo, url
+        except requests.RequestException:
+            time.sleep(0.2)
+    processo.kill()
+    raise RuntimeError(f'{servico} não respondeu em 30s (ver {log.name})')
+
+# Massa de dados
+def popular(urls, escala, stub):
+    s = requests.Session()
+    turmas = 20 * escala
+    if stub:
+        ids_turmas, ids_alunos = list(range(1, turmas + 1)), list(range(1, 500 * escala + 1))
+    else:
+        g = urls['gerenciamento']
+        professores = [s.post(f'{g}/professores', json={'nome': f'Professor {i}', 'idade': 40, 'materia': f'Matéria {i % 10}'}).json()['id']
+                       for i in range(5 * escala)]
+        ids_turmas = [s.post(f'{g}/turmas', json={'descricao': f'Turma {i}', 'professor_id': random.choice(professores)}).json()['id']
+                      for i in range(turmas)]
+        ids_alunos = []
+        alunos = [{'nome': f'Aluno {i}', 'idade': 15, 'turma_id': ids_turmas[i % turmas]} for i in range(500 * escala)]
+        for i in range(0, len(alunos), 5000):
+            resp = s.post(f'{g}/alunos/bulk', json=alunos[i:i + 5000]).json()
+            ids_alunos += [r['id'] for r in resp['resultados'] if r['status'] == 201]
+    a = urls['atividades']
+    atividades = {}
+    for turma in ids_turmas:
+        atividades[turma] = [s.post(f'{a}/atividades', json={'titulo': f'Atividade {k}', 'peso_porcento': 25, 'turma_id': turma,
+                                                             'professor_id': 1 if stub else professores[0]}).json()['id'] for k in range(4)]
+    notas = [{'nota': random.randint(0, 100) / 10, 'aluno_id': aluno, 'atividade_id': random.choice(atividades[ids_turmas[i % turmas]])}
+             for i, aluno in enumerate(ids_alunos) for _ in range(2)]
+    for i in range(0, len(notas), 5000):
+        s.post(f'{a}/notas/bulk', json=notas[i:i + 5000])
+    r = urls['reservas']
+    inicio = datetime(2025, 3, 3, 7)
+    reservas = [{'num_sala': f'{100 + k % 40}', 'lab': k % 40 >= 35, 'turma_id': random.choice(ids_turmas),
+                 'inicio': (inicio + timedelta(days=k // 40 // 6, hours=k // 40 % 6 * 2)).isoformat(),
+                 'fim': (inicio + timedelta(days=k // 40 // 6, hours=k // 40 % 6 * 2 + 2)).isoformat()} for k in range(240 * escala)]
+    for i in range(0, len(reservas), 5000):
+        s.post(f'{r}/reservas/bulk', json=reservas[i:i + 5000])
+    return {'turmas': ids_turmas, 'alunos': ids_alunos, 'atividades': atividades, 'salas': [f'{100 + k}' for k in range(40)]}
+
+# Operações: cada uma devolve (endpoint, resposta)
+def reservar(s, urls, dados, estado):
+    dia = datetime(2025, 6, 2) + timedelta(days=random.randint(0, 20))
+    hora = random.randint(7, 20)
+    corpo = {'num_sala': random.choice(dados['salas']), 'turma_id': random.choice(dados['turmas']),
+             'inicio': (dia + timedelta(hours=hora)).isoformat(), 'fim': (dia + timedelta(hours=hora + 1)).isoformat()}
+    return 'POST /reservas', s.post(f"{urls['reservas']}/reservas", json=corpo)
+
+def salas_livres(s, urls, dados, estado):
+    dia = datetime(2025, 6, 2) + timedelta(days=random.randint(0, 20))
+    params = {'inicio': (dia + timedelta(hours=8)).isoformat(), 'fim': (dia + timedelta(hours=12)).isoformat()}
+    return 'GET /salas/disponiveis', s.get(f"{urls['reservas']}/salas/disponiveis", params=params)
+
+def lancar_nota(s, urls, dados, estado):
+    turma = random.choice(dados['turmas'])
+    corpo = {'nota': random.randint(0, 100) / 10, 'aluno_id': random.choice(dados['alunos']), 'atividade_id': random.choice(dados['atividades'][turma])}
+    return 'POST /notas', s.post(f"{urls['atividades']}/notas", json=corpo)
+
+def lancar_notas_lote(s, urls, dados, estado):
+    turma = random.choice(dados['turmas'])
+    corpo = [{'nota': random.randint(0, 100) / 10, 'aluno_id': random.choice(dados['alunos']), 'atividade_id': random.choice(dados['atividades'][turma])}
+             for _ in range(50)]
+    return 'POST /notas/bulk', s.post(f"{urls['atividades']}/notas/bulk", json=corpo)
+
+def _condicional(s, estado, endpoint, url, **kwargs):
+    # painel que guarda a ETag de cada URL e reenvia em If-None-Match
+    etag = estado.get(url)
+    resp = s.get(url, headers={'If-None-Match': etag} if etag else {}, **kwargs)
+    if resp.headers.get('ETag'): estado[url] = resp.headers['ETag']
+    return endpoint, resp
+
+def boletim(s, urls, dados, estado):
+    return _condicional(s, estado, 'GET /turmas/<id>/boletim', f"{urls['atividades']}/turmas/{random.choice(dados['turmas'])}/boletim")
+
+def painel_turmas(s, urls, dados, estado):
+    return _condicional(s, estado, 'GET /turmas', f"{urls['gerenciamento']}/turmas")
+
+def painel_alunos(s, urls, dados, estado):
+    return _condicional(s, estado, 'GET /alunos?turma_id', f"{urls['gerenciamento']}/alunos?turma_id={random.choice(dados['turmas'])}&limit=100")
+
+def painel_reservas(s, urls, dados, estado):
+    return _condicional(s, estado, 'GET /reservas?num_sala', f"{urls['reservas']}/reservas?num_sala={random.choice(dados['salas'])}&limit=100")
+
+def turma(s, urls, dados, estado):
+    return 'GET /turmas/<id>', s.get(f"{urls['gerenciamento']}/turmas/{random.choice(dados['turmas'])}")
+
+CENARIOS = {
+    'reservas': [(reservar, 6), (salas_livres, 3), (painel_reservas, 1)],
+    'notas': [(lancar_nota, 6), (lancar_notas_lote, 1), (boletim, 3)],
+    'dashboard': [(painel_turmas, 2), (painel_alunos, 3), (painel_reservas, 3), (boletim, 3)],
+}
+CENARIOS['misto'] = CENARIOS['reservas'] + CENARIOS['notas'] + CENARIOS['dashboard'] + [(turma, 2)]
+# sem o Gerenciamento real não há listagens dele para consultar
+SO_GERENCIAMENTO = (painel_turmas, painel_alunos, turma)
+
+# Execução
+def usuario(urls, dados, operacoes, pausa, fim, resultados, lock):
+    s = requests.Session()
+    funcoes, pesos = zip(*operacoes)
+    estado, locais = {}, {}
+    while time.time() < fim:
+        funcao = random.choices(funcoes, pesos)[0]
+        inicio = time.perf_counter()
+        try:
+            endpoint, resp = funcao(s, urls, dados, estado)
+            status = resp.status_code
+        except requests.RequestException:
+            endpoint, status = funcao.__name__, None
+        ms = (time.perf_counter() - inicio) * 1000
+        r = locais.setdefault(endpoint, {'latencias': [], 'status': {}})
+        r['latencias'].append(ms)
+        chave = str(status) if status is not None else 'erro'
+        r['status'][chave] = r['status'].get(chave, 0) + 1
+        if pausa: time.sleep(random.uniform(0, 2 * pausa))
+    with lock:
+        for endpoint, r in locais.items():
+            total = resultados.setdefault(endpoint, {'latencias': [], 'status': {}})
+            total['latencias'] += r['latencias']
+            for k, v in r['status'].items(): total['status'][k] = total['status'].get(k, 0) + v
+
+def _percentil(valores, p):
+    if not valores: return float('nan')
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+def resumir(resultados, segundos):
+    resumo = {}
+    for endpoint, r in sorted(resultados.items()):
+        lat = r['latencias']
+        erros = sum(v for k, v in r['status'].items() if k == 'erro' or int(k) >= 500)
+        resumo[endpoint] = {'requisicoes': len(lat), 'rps': round(len(lat) / segundos, 1), 'erros': erros, 'status': r['status'],
+                            'p50_ms': round(_percentil(lat, 50), 2), 'p95_ms': round(_percentil(lat, 95), 2), 'p99_ms': round(_percentil(lat, 99), 2)}
+    return resumo
+
+def imprimir(resumo, anterior=None):
+    print(f"{'endpoint':<28}{'req':>7}{'req/s':>8}{'erros':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  status")
+    for endpoint, r in resumo.items():
+        linha = (f"{endpoint:<28}{r['requisicoes']:>7}{r['rps']:>8}{r['erros']:>7}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}  "
+                 + ' '.join(f'{k}:{v}' for k, v in sorted(r['status'].items())))
+        print(linha)
+        antes = (anterior or {}).get(endpoint)
+        if antes:
+            delta = lambda campo: f"{(r[campo] - antes[campo]) / antes[campo] * 100:+.0f}%" if antes[campo] else '-'
+            print(f"{'  vs anterior':<28}{'':>7}{delta('rps'):>8}{'':>7}{delta('p50_ms'):>9}{delta('p95_ms'):>9}{delta('p99_ms'):>9}")
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cenario', choices=sorted(CENARIOS), default='misto')
+    parser.add_argument('--usuarios', type=int, default=8)
+    parser.add_argument('--duracao', type=float, default=20, help='segundos de carga')
+    parser.add_argument('--pausa', type=float, default=0, help='pausa média entre operações de cada usuário, em segundos')
+    parser.add_argument('--escala', type=int, default=5, help='multiplicador da massa inicial (100 turmas, 2500 alunos e 5000 notas com 5)')
+    parser.add_argument('--stub', action='store_true', help='usa o stub no lugar do Gerenciamento')
+    parser.add_argument('--gunicorn', action='store_true', help='sobe os serviços com gunicorn em vez do werkzeug')
+    parser.add_argument('--workers', type=int, default=2, help='workers do gunicorn por serviço')
+    parser.add_argument('--saida', help='grava o resultado em JSON')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior para comparar')
+    args = parser.parse_args()
+    if args.gunicorn and not shutil.which('gunicorn'): parser.error('gunicorn não encontrado no PATH')
+
+    tmp = tempfile.mkdtemp(prefix='carga-')
+    processos, urls = [], {}
+    try:
+        if args.stub:
+            stub = stub_gerenciamento.iniciar(total=500 * args.escala)
+            urls['gerenciamento'] = stub.url
+        else:
+            p, urls['gerenciamento'] = iniciar_servico('gerenciamento', PORTAS['gerenciamento'], tmp, {}, args.gunicorn, args.workers)
+            processos.append(p)
+        for servico in ('reservas', 'atividades'):
+            p, urls[servico] = iniciar_servico(servico, PORTAS[servico], tmp, {'GERENCIAMENTO_URL': urls['gerenciamento']}, args.gunicorn, args.workers)
+            processos.append(p)
+
+        inicio = time.perf_counter()
+        dados = popular(urls, args.escala, args.stub)
+        print(f'massa: {len(dados["turmas"])} turmas, {len(dados["alunos"])} alunos em {time.perf_counter() - inicio:.1f}s')
+
+        operacoes = [(f, peso) for f, peso in CENARIOS[args.cenario] if not (args.stub and f in SO_GERENCIAMENTO)]
+        resultados, lock = {}, threading.Lock()
+        fim = time.time() + args.duracao
+        threads = [threading.Thread(target=usuario, args=(urls, dados, operacoes, args.pausa, fim, resultados, lock)) for _ in range(args.usuarios)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+
+        resumo = resumir(resultados, args.duracao)
+        anterior = None
+        if args.comparar:
+            with open(args.comparar) as f:
+                anterior = json.load(f)['endpoints']
+        print(f'cenário {args.cenario}, {args.usuarios} usuários, {args.duracao:.0f}s')
+        imprimir(resumo, anterior)
+        if args.saida:
+            saida = {'commit': _commit(), 'data': datetime.now().isoformat(timespec='seconds'),
+                     'parametros': {k: v for k, v in vars(args).items() if k not in ('saida', 'comparar')}, 'endpoints': resumo}
+            with open(args.saida, 'w') as f:
+                json.dump(saida, f, indent=2, ensure_ascii=False)
+            print(f'resultado gravado em {args.saida}')
+    finally:
+        for p in processos:
+            p.terminate()
+        for p in processos:
+            p.wait(timeout=10)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Pré-compila a spec OpenAPI de cada serviço em <servico>/openapi.json.
+
+Sobe o app de cada serviço com DOCS_MODO=flasgger (banco temporário), pede
+/apispec_1.json e grava o resultado. Com DOCS_MODO=estatico os serviços servem
+esse arquivo sem importar o flasgger. Rode de novo sempre que uma docstring de
+rota mudar; --verificar só confere se os arquivos estão atualizados (sai com 1
+se algum estiver desatualizado).
+
+Uso: python scripts/gerar_openapi.py [--servico reservas] [--verificar]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+SERVICOS = ('gerenciamento', 'reservas', 'atividades')
+
+def gerar(servico, verificar):
+    os.environ['DOCS_MODO'] = 'flasgger'
+    os.environ['DB_FILE'] = os.path.join(tempfile.mkdtemp(), f'{servico}.db')
+    pasta = os.path.join(AQUI, '..', servico)
+    sys.path.insert(0, pasta)
+    import app
+    import docs
+    spec = app.app.test_client().get(docs.ROTA_SPEC).get_json()
+    conteudo = json.dumps(spec, indent=2, sort_keys=True, ensure_ascii=False) + '\n'
+    caminho = docs.SPEC
+    atual = open(caminho, encoding='utf-8').read() if os.path.exists(caminho) else None
+    if verificar:
+        ok = atual == conteudo
+        print(f"[{'ok' if ok else 'DESATUALIZADO'}] {os.path.relpath(caminho)}")
+        return 0 if ok else 1
+    with open(caminho, 'w', encoding='utf-8') as f:
+        f.write(conteudo)
+    print(f"{os.path.relpath(caminho)}: {len(spec.get('paths', {}))} rotas")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--servico', choices=SERVICOS)
+    parser.add_argument('--verificar', action='store_true')
+    args = parser.parse_args()
+    if args.servico:
+        sys.exit(gerar(args.servico, args.verificar))
+    # cada serviço tem seus próprios módulos app/models/database: um processo por serviço
+    extra = ['--verificar'] if args.verificar else []
+    codigos = [subprocess.call([sys.executable, __file__, '--servico', s] + extra) for s in SERVICOS]
+    sys.exit(1 if any(codigos) else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Stub local do serviço de Gerenciamento para benchmarks.
+
+Responde GET /turmas/<id>, /professores/<id> e /alunos/<id> com 200 para
+ids entre 1 e o total configurado e 404 para o resto, e POST /validate com
+os ids fora desse intervalo. Atraso opcional em todas as respostas.
+
+Uso: python scripts/stub_gerenciamento.py --port 5000 --delay-ms 20
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RECURSOS = ('turmas', 'professores', 'alunos')
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, endereco, delay_ms=0, total=1000):
+        super().__init__(endereco, StubHandler)
+        self.delay = delay_ms / 1000
+        self.total = total
+        self.conexoes = 0
+        self.requisicoes = 0
+        self._lock = threading.Lock()
+
+    def contar(self, campo):
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + 1)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.contar('conexoes')
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, codigo, corpo):
+        dados = json.dumps(corpo).encode()
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _existe(self, rid):
+        return 1 <= rid <= self.server.total
+
+    def do_GET(self):
+        self.server.contar('requisicoes')
+        if self.server.delay: time.sleep(self.server.delay)
+        partes = self.path.split('?')[0].strip('/').split('/')
+        if partes == ['status']:
+            return self._responder(200, {'service': 'gerenciamento', 'status': 'ok'})
+        if len(partes) == 2 and partes[0] in RECURSOS and partes[1].isdigit():
+            rid = int(partes[1])
+            if self._existe(rid): return self._responder(200, {'id': rid})
+            return self._responder(404, {'error': 'não encontrado'})
+        self._responder(404, {'error': 'rota inexistente'})
+
+    def do_POST(self):
+        self.server.contar('requisicoes')
+        if self.server.delay: time.sleep(self.server.delay)
+        corpo = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if self.path.split('?')[0] != '/validate':
+            return self._responder(404, {'error': 'rota inexistente'})
+        dados = json.loads(corpo or b'{}')
+        inexistentes = {r: sorted({i for i in dados[r] if not self._existe(i)}) for r in RECURSOS if r in dados}
+        self._responder(200, {'valido': not any(inexistentes.values()), 'inexistentes': inexistentes})
+
+def iniciar(port=0, delay_ms=0, total=1000):
+    servidor = StubServer(('127.0.0.1', port), delay_ms=delay_ms, total=total)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--delay-ms', type=float, default=0)
+    parser.add_argument('--total', type=int, default=1000, help='ids válidos por recurso')
+    args = parser.parse_args()
+    servidor = StubServer(('127.0.0.1', args.port), delay_ms=args.delay_ms, total=args.total)
+    print(f"stub gerenciamento em {servidor.url}")
+    servidor.serve_forever()
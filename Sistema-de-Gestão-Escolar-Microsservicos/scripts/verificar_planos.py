@@ -0,0 +1,73 @@
+"""Confere com EXPLAIN QUERY PLAN que os filtros principais usam os índices declarados.
+
+Para cada serviço cria um banco temporário pelo init_db do próprio serviço e
+verifica o plano das consultas de listagem filtradas (paginadas por id) e das
+consultas internas críticas. Sai com código 1 se alguma não usar o índice
+esperado.
+
+Uso: python scripts/verificar_planos.py [--servico atividades]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+SERVICOS = ('gerenciamento', 'reservas', 'atividades')
+
+def consultas(servico):
+    # (descrição, consulta, índice esperado)
+    from models import models as m
+    import listagem
+    lista = lambda model, **filtros: listagem.consulta(model, after_id=0, limit=100, filtros=filtros)
+    if servico == 'gerenciamento':
+        return [('alunos por turma', lista(m.Aluno, turma_id=1), 'ix_aluno_turma_id'),
+                ('turmas por professor', lista(m.Turma, professor_id=1), 'ix_turma_professor_id')]
+    if servico == 'reservas':
+        from datetime import datetime
+        from controllers import reservas_controller
+        return [('reservas por turma', lista(m.Reserva, turma_id=1), 'ix_reserva_turma_id'),
+                ('reservas por sala', lista(m.Reserva, num_sala='101'), 'ix_reserva_num_sala'),
+                ('reservas por sala e data', lista(m.Reserva, num_sala='101', data='2025-11-20'), 'ix_reserva_sala_data'),
+                ('reservas por data', lista(m.Reserva, data='2025-11-20'), 'ix_reserva_data'),
+                ('conflito de horário', reservas_controller.consulta_conflito('101', datetime(2025, 11, 20, 10)), 'ix_reserva_sala_intervalo'),
+                ('catálogo de salas', reservas_controller.SALAS_SQL, 'ix_reserva_sala_lab')]
+    from controllers import atividades_controller as ac
+    boletim = lambda grupo, filtro: ac.db.select(grupo, m.Boletim.soma_pesos).where(filtro).order_by(grupo)
+    return [('boletim da turma', boletim(m.Boletim.aluno_id, m.Boletim.turma_id == 1), 'ix_boletim_turma_aluno'),
+            ('boletim do aluno', boletim(m.Boletim.turma_id, m.Boletim.aluno_id == 1), 'sqlite_autoindex_boletim_1'),
+            ('atividades por turma', lista(m.Atividade, turma_id=1), 'ix_atividade_turma_id'),
+            ('atividades por professor', lista(m.Atividade, professor_id=1), 'ix_atividade_professor_id'),
+            ('notas por aluno', lista(m.Nota, aluno_id=1), 'ix_nota_aluno_id'),
+            ('notas por atividade', lista(m.Nota, atividade_id=1), 'ix_nota_atividade_id'),
+            ('notas por aluno e atividade', lista(m.Nota, aluno_id=1, atividade_id=1), 'ix_nota_aluno_atividade')]
+
+def verificar(servico):
+    os.environ['DB_FILE'] = os.path.join(tempfile.mkdtemp(), f'{servico}.db')
+    sys.path.insert(0, os.path.join(AQUI, '..', servico))
+    import app
+    from database import db
+    falhas = 0
+    with app.app.app_context():
+        for descricao, stmt, indice in consultas(servico):
+            sql = str(stmt.compile(db.engine, compile_kwargs={'literal_binds': True}))
+            plano = ' | '.join(row[-1] for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}')))
+            # nenhuma dessas consultas pode depender de ordenação em B-tree temporária
+            ok = indice in plano and 'TEMP B-TREE' not in plano
+            falhas += not ok
+            print(f"[{'ok' if ok else 'FALHA'}] {servico}: {descricao}: {plano}")
+    return falhas
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--servico', choices=SERVICOS)
+    args = parser.parse_args()
+    if args.servico:
+        sys.exit(1 if verificar(args.servico) else 0)
+    # cada serviço tem seus próprios módulos app/models/database: um processo por serviço
+    codigos = [subprocess.call([sys.executable, __file__, '--servico', s]) for s in SERVICOS]
+    sys.exit(1 if any(codigos) else 0)
+
+if __name__ == '__main__':
+    main()